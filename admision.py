@@ -0,0 +1,130 @@
+"""
+Control de admisión y plazos por petición
+Cada backend admite a lo sumo ADMISION_COLA peticiones a la vez (en curso o
+esperando un trabajador Prolog); las siguientes se rechazan de inmediato con
+429 y Retry-After en lugar de acumular hilos o procesos `swipl` que acabarían
+venciendo todos juntos. El cliente puede enviar su presupuesto en la cabecera
+X-Deadline-Ms (un número finito; otro valor se rechaza con 400): una
+petición que llega sin tiempo suficiente se rechaza con 503
+antes de tocar Prolog, y el tiempo que le queda viaja con la consulta
+(protocolo_json.pl la corta con call_with_time_limit/2), así que el trabajo de
+una petición abandonada se cancela en lugar de terminarse.
+
+ADMISION_COLA=0 desactiva el límite; ADMISION_REINTENTO fija los segundos de
+Retry-After y ADMISION_PLAZO_MINIMO_MS el presupuesto mínimo para empezar.
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metricas
+
+ADMISION_COLA = int(os.environ.get('ADMISION_COLA', '64'))
+ADMISION_REINTENTO = float(os.environ.get('ADMISION_REINTENTO', '1'))
+ADMISION_PLAZO_MINIMO = float(os.environ.get('ADMISION_PLAZO_MINIMO_MS', '5')) / 1000
+
+CABECERA_PLAZO = 'X-Deadline-Ms'
+
+
+class Rechazo(Exception):
+    """La petición no se admite: `estado` HTTP y segundos sugeridos para reintentar"""
+
+    def __init__(self, estado, mensaje, reintentar=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.reintentar = reintentar
+
+    def cabeceras(self):
+        if self.reintentar is None:
+            return {}
+        return {'Retry-After': str(max(math.ceil(self.reintentar), 1))}
+
+
+class Plazo:
+    """Instante límite de una petición (None si el cliente no fijó ninguno)"""
+
+    def __init__(self, segundos=None):
+        self.segundos = segundos
+        self.limite = None if segundos is None else time.monotonic() + segundos
+
+    def restante(self, maximo):
+        """Segundos disponibles, acotados por `maximo` (el timeout del motor)"""
+        if self.limite is None:
+            return maximo
+        return max(min(self.limite - time.monotonic(), maximo), 0)
+
+    def vencido(self, margen=0):
+        return self.limite is not None and self.limite - time.monotonic() <= margen
+
+
+def plazo_cabecera(valor):
+    """
+    Plazo a partir del valor de X-Deadline-Ms (str o bytes). Lanza Rechazo
+    (400) si no es un número finito: NaN dejaría las esperas sin límite.
+    """
+    if valor is None:
+        return Plazo()
+    try:
+        milisegundos = float(valor)
+    except ValueError:
+        milisegundos = math.nan
+    if not math.isfinite(milisegundos):
+        raise Rechazo(400, f'{CABECERA_PLAZO} debe ser un número finito de milisegundos')
+    return Plazo(max(milisegundos, 0) / 1000)
+
+
+class ControlAdmision:
+    """Contador acotado de peticiones admitidas, compartido por los hilos o corrutinas del backend"""
+
+    def __init__(self, maximo=ADMISION_COLA, reintentar=ADMISION_REINTENTO, plazo_minimo=ADMISION_PLAZO_MINIMO):
+        self.maximo = maximo
+        self.reintentar = reintentar
+        self.plazo_minimo = plazo_minimo
+        self.en_curso = 0
+        self.admitidas = 0
+        self.rechazadas = {'cola_llena': 0, 'plazo_vencido': 0}
+        self._lock = threading.Lock()
+
+    def _rechazar(self, motivo, estado, mensaje):
+        with self._lock:
+            self.rechazadas[motivo] += 1
+        metricas.contar_error(motivo)
+        raise Rechazo(estado, mensaje, self.reintentar)
+
+    def admitir(self, plazo):
+        """Reserva un lugar para la petición o lanza Rechazo"""
+        if plazo.vencido(self.plazo_minimo):
+            self._rechazar('plazo_vencido', 503, 'El plazo de la petición venció antes de empezar')
+        with self._lock:
+            lleno = self.maximo > 0 and self.en_curso >= self.maximo
+            if not lleno:
+                self.en_curso += 1
+                self.admitidas += 1
+        if lleno:
+            self._rechazar('cola_llena', 429, f'Servidor ocupado: {self.maximo} peticiones en curso')
+
+    def liberar(self):
+        with self._lock:
+            self.en_curso -= 1
+
+    @contextmanager
+    def entrar(self, plazo):
+        """Ocupa un lugar mientras dure el bloque `with`"""
+        self.admitir(plazo)
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    def estado(self):
+        return {
+            'maximo': self.maximo,
+            'en_curso': self.en_curso,
+            'admitidas': self.admitidas,
+            'rechazadas': dict(self.rechazadas),
+            'reintentar_segundos': self.reintentar,
+            'plazo_minimo_ms': self.plazo_minimo * 1000
+        }
@@ -0,0 +1,284 @@
+"""
+Arranque rápido compartido por ambos backends
+- Localiza el ejecutable de SWI-Prolog una sola vez y guarda el resultado.
+- Precompila asistente_finanzas.pl a QLF (formato de carga rápida de
+  SWI-Prolog) y lo vuelve a compilar solo si cambia la fuente.
+Los trabajadores cargan el .qlf en lugar de analizar el .pl en cada arranque.
+Cada versión es una copia de la fuente y su .qlf en KB_ARTEFACTOS, nombrados
+por el sha256 del contenido (asistente_finanzas.<sha>.pl y .qlf): se compila
+la copia en un directorio temporal y el resultado se mueve con un rename, así
+que editar la fuente nunca cambia el artefacto de una versión ya cargada.
+recarga.py borra el artefacto cuando su versión se retira.
+Ejecutar `python arranque.py` compila la base de conocimiento por adelantado.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from reglas import PROLOG_FILE
+
+# KB_PRECOMPILAR=0 carga siempre la fuente .pl
+KB_PRECOMPILAR = os.environ.get('KB_PRECOMPILAR', '1') != '0'
+# Directorio de las copias y los .qlf de cada versión (por defecto junto a la fuente)
+KB_ARTEFACTOS = os.environ.get('KB_ARTEFACTOS', '')
+
+# Base de conocimiento que cargan los motores: ruta, tipo ('qlf' o 'fuente'),
+# hash del contenido y copia de la fuente de la que salió (la que lee reglas.py)
+Artefacto = namedtuple('Artefacto', ['ruta', 'tipo', 'sha256', 'compilado', 'fuente'])
+
+_lock = threading.Lock()
+
+
+def _swipl_env():
+    env_cmd = os.environ.get('SWIPL_CMD') or os.environ.get('SWI_PROLOG')
+    if env_cmd:
+        # Limpiar posibles comillas y expandir variables de entorno
+        env_cmd = os.path.expandvars(env_cmd.strip().strip('"').strip("'"))
+    return env_cmd
+
+
+@lru_cache(maxsize=None)
+def verificar_swipl():
+    """Verifica que swipl esté disponible (se resuelve una vez por proceso)"""
+    cmd = _swipl_env() or 'swipl'
+
+    # On Windows, try swipl.exe if plain name not found
+    candidates = [cmd]
+    if sys.platform.startswith('win') and not cmd.lower().endswith('.exe'):
+        candidates.append(cmd + '.exe')
+
+    for c in candidates:
+        # If path given, check file exists; otherwise use which
+        if os.path.isabs(c) or os.path.sep in c:
+            if os.path.exists(c) and os.access(c, os.X_OK):
+                return True
+        else:
+            if shutil.which(c):
+                return True
+
+    # Try common executable names as last resort
+    if shutil.which('swipl') or shutil.which('swipl.exe'):
+        return True
+
+    return False
+
+
+@lru_cache(maxsize=None)
+def get_swipl_cmd():
+    """Devuelve el ejecutable de SWI-Prolog (se resuelve una vez por proceso).
+    Permite configurar la ruta con la variable de entorno `SWIPL_CMD`.
+    """
+    env_cmd = _swipl_env()
+    if env_cmd:
+        # Si no existe como ruta, devolver lo que haya (permite nombres como 'swipl')
+        return env_cmd
+
+    # Prefer the system executable found by shutil.which
+    sw = shutil.which('swipl') or shutil.which('swipl.exe')
+    if sw:
+        return sw
+
+    # En Windows, intentar rutas de instalación comunes
+    if sys.platform.startswith('win'):
+        common_paths = [
+            r"C:\Program Files\swipl\bin\swipl.exe",
+            r"C:\Program Files (x86)\swipl\bin\swipl.exe",
+            r"C:\Program Files\swipl\swipl.exe",
+        ]
+        for p in common_paths:
+            if os.path.exists(p) and os.access(p, os.X_OK):
+                print(f"SWI-Prolog encontrado en ruta estándar: {p}")
+                return p
+
+    # Fallback to 'swipl' (will likely fail but caller handles it)
+    return 'swipl'
+
+
+def swipl_detectado():
+    """Ruta del ejecutable si realmente existe, o None"""
+    return get_swipl_cmd() if verificar_swipl() else None
+
+
+# --------- Precompilación de la base de conocimiento ---------
+
+def _sha256(archivo):
+    h = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(65536), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _leer_firma(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_firma(ruta, firma):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(firma, f)
+    os.replace(temporal, ruta)
+
+
+def directorio_artefactos(fuente):
+    return KB_ARTEFACTOS or os.path.join(os.path.dirname(fuente), '.artefactos_kb')
+
+
+def _rutas(fuente, sha256):
+    """Copia .pl y .qlf de la versión con ese contenido"""
+    base = os.path.join(directorio_artefactos(fuente),
+                        f'{os.path.splitext(os.path.basename(fuente))[0]}.{sha256[:12]}')
+    return base + '.pl', base + '.qlf'
+
+
+def _ruta_indice(fuente):
+    return os.path.join(directorio_artefactos(fuente),
+                        os.path.splitext(os.path.basename(fuente))[0] + '.json')
+
+
+def _copiar_fuente(fuente, indice, stat_fuente):
+    """
+    Devuelve (sha256, copia) de la fuente actual. Si la fecha y el tamaño
+    coinciden con el índice se reutiliza la copia; si no, se copia la fuente
+    a un temporal, se calcula el hash de la copia (no del archivo, que puede
+    cambiar mientras tanto) y se mueve a su nombre definitivo.
+    """
+    vista = indice.get('fuente') or {}
+    if vista.get('mtime_ns') == stat_fuente.st_mtime_ns and vista.get('tamano') == stat_fuente.st_size:
+        copia = _rutas(fuente, vista['sha256'])[0]
+        if os.path.exists(copia):
+            return vista['sha256'], copia
+    fd, temporal = tempfile.mkstemp(suffix='.tmp', dir=directorio_artefactos(fuente))
+    try:
+        with os.fdopen(fd, 'wb') as destino, open(fuente, 'rb') as origen:
+            shutil.copyfileobj(origen, destino)
+        sha256 = _sha256(temporal)
+        copia = _rutas(fuente, sha256)[0]
+        os.replace(temporal, copia)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    indice['fuente'] = {'sha256': sha256, 'mtime_ns': stat_fuente.st_mtime_ns, 'tamano': stat_fuente.st_size}
+    return sha256, copia
+
+
+def _compilar_qlf(copia, qlf, swipl_cmd):
+    """
+    Compila `copia` con qcompile/1 en un directorio temporal (qcompile deja
+    el .qlf junto a la fuente) y mueve el resultado a `qlf` con un rename
+    """
+    temporal = tempfile.mkdtemp(prefix='qcompile-', dir=os.path.dirname(qlf))
+    try:
+        fuente_temporal = os.path.join(temporal, os.path.basename(copia))
+        shutil.copyfile(copia, fuente_temporal)
+        objetivo = f"qcompile('{fuente_temporal.replace(chr(92), '/')}')"
+        resultado = subprocess.run(
+            [swipl_cmd, '-q', '-g', objetivo, '-t', 'halt'],
+            capture_output=True,
+            timeout=120
+        )
+        if resultado.returncode != 0:
+            error = (resultado.stderr or b'').decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"qcompile terminó con código {resultado.returncode}: {error}")
+        os.replace(os.path.splitext(fuente_temporal)[0] + '.qlf', qlf)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def preparar_base(archivo=PROLOG_FILE, forzar=False):
+    """
+    Devuelve el Artefacto que deben cargar los motores. Compila el .qlf de
+    la versión si no existe o si se compiló con otro swipl (la fuente se
+    identifica por fecha y tamaño, y en caso de duda por su sha256).
+    Sin swipl, o si la compilación falla, se usa la copia de la fuente .pl.
+    """
+    fuente = os.path.abspath(archivo)
+    ruta_indice = _ruta_indice(fuente)
+
+    with _lock:
+        os.makedirs(directorio_artefactos(fuente), exist_ok=True)
+        stat_fuente = os.stat(fuente)
+        indice = _leer_firma(ruta_indice) or {}
+        anterior = dict(indice.get('fuente') or {})
+        sha256, copia = _copiar_fuente(fuente, indice, stat_fuente)
+        if indice.get('fuente') != anterior:
+            _guardar_firma(ruta_indice, indice)
+
+        swipl_cmd = swipl_detectado()
+        if not KB_PRECOMPILAR or swipl_cmd is None:
+            return Artefacto(copia, 'fuente', sha256, None, copia)
+
+        qlf = _rutas(fuente, sha256)[1]
+        compilados = indice.setdefault('compilados', {})
+        firma = compilados.get(sha256[:12])
+        if not forzar and firma is not None and firma.get('swipl') == swipl_cmd and os.path.exists(qlf):
+            return Artefacto(qlf, 'qlf', sha256, firma['compilado'], copia)
+
+        try:
+            _compilar_qlf(copia, qlf, swipl_cmd)
+        except (OSError, subprocess.SubprocessError, RuntimeError) as e:
+            print(f"⚠️  No se pudo precompilar {os.path.basename(fuente)}, se cargará la fuente: {e}")
+            return Artefacto(copia, 'fuente', sha256, None, copia)
+
+        firma = {'swipl': swipl_cmd, 'compilado': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        compilados[sha256[:12]] = firma
+        _guardar_firma(ruta_indice, indice)
+        print(f"✓ Base de conocimiento precompilada: {qlf}")
+        return Artefacto(qlf, 'qlf', sha256, firma['compilado'], copia)
+
+
+def descartar_artefacto(artefacto, archivo=PROLOG_FILE, rechazado=False):
+    """
+    Borra la copia y el .qlf de una versión retirada, salvo que sea la de la
+    fuente actual (la que usará la próxima versión o otro proceso). Con
+    `rechazado` (la versión no pasó la verificación) se borra igual.
+    """
+    fuente = os.path.abspath(archivo)
+    ruta_indice = _ruta_indice(fuente)
+    with _lock:
+        indice = _leer_firma(ruta_indice) or {}
+        if not rechazado and (indice.get('fuente') or {}).get('sha256') == artefacto.sha256:
+            return
+        for ruta in _rutas(fuente, artefacto.sha256):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+        if indice.get('compilados', {}).pop(artefacto.sha256[:12], None) is not None:
+            _guardar_firma(ruta_indice, indice)
+
+
+def estado_artefacto(artefacto):
+    """Resumen del artefacto cargado para /api/health"""
+    if artefacto is None:
+        return None
+    return {
+        'archivo': os.path.basename(artefacto.ruta),
+        'tipo': artefacto.tipo,
+        'sha256': artefacto.sha256,
+        'compilado': artefacto.compilado
+    }
+
+
+if __name__ == '__main__':
+    forzar = '--forzar' in sys.argv[1:]
+    if not verificar_swipl():
+        print("✗ No se encuentra SWI-Prolog; configura SWIPL_CMD")
+        sys.exit(1)
+    artefacto = preparar_base(forzar=forzar)
+    print(json.dumps(estado_artefacto(artefacto), indent=2))
+    sys.exit(0 if artefacto.tipo == 'qlf' else 1)
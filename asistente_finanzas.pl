@@ -1,16 +1,21 @@
 /*  asistente_finanzas.pl
     SWI-Prolog (7.x/8.x/9.x)
-    Mdulo de recomendaciones financieras basadas en reglas.
-    Fuente de reglas: proyecto del usuario (30+ reglas) con afinaciones prcticas.
+    Módulo de recomendaciones financieras basadas en reglas.
+    Fuente de reglas: proyecto del usuario (30+ reglas) con afinaciones prácticas.
 */
 
 :- module(asistente_finanzas, [
     recomendaciones/2,          % +PerfilDict, -ListaDeRecs
+    recomendaciones_ids/2,      % +PerfilDict, -ListaDeIds
+    recomendaciones_ids_referencia/2, % +PerfilDict, -ListaDeIds (cláusula por cláusula)
+    regla/4,                    % ?Id, ?Categoria, ?Prioridad, ?Texto
     ejemplo_perfil/1            % -PerfilDict
 ]).
 
+:- encoding(utf8).
+
 /* =========================
-   Representacin del Perfil
+   Representación del Perfil
    =========================
    Usamos un dict SWI-Prolog para claridad:
 
@@ -39,7 +44,7 @@
    }.
 */
 
-%% --------- Utilidades numricas ---------
+%% --------- Utilidades numéricas ---------
 safe_div(Num, Den, R) :-
     ( Den =:= 0 -> R = 0 ; R is Num / Den ).
 
@@ -65,131 +70,372 @@ ratio_deuda_pct(Perfil, P) :- ratio_pct(Perfil.deudas_total, Perfil.ingreso, P).
 
 gastos_superan_ingresos(Perfil) :- Perfil.gasto_total > Perfil.ingreso.
 
-%% Clasificacin de metas por plazo (meses)
+%% Clasificación de metas por plazo (meses)
 plazo_tipo(Meses, corto)    :- Meses < 12, !.
 plazo_tipo(Meses, mediano)  :- Meses >= 12, Meses =< 60, !.
 plazo_tipo(_, largo).
 
 %% --------- Motor de reglas: recommend/2 ---------
-% recommend(+Perfil, -RecomendacionAtom)
+% regla(?Id, ?Categoria, ?Prioridad, ?Texto)
+%   Metadatos estables de cada regla; la categoría (ahorro, presupuesto,
+%   deuda, metas, seguro, educacion, general) y la prioridad (high, medium,
+%   low) son las que usa la interfaz web.
+% recommend(+Perfil, -Id)
+%   La regla Id se dispara para Perfil.
+
+:- discontiguous regla/4, recommend/2.
 
 % --- Ahorro y fondo de emergencia ---
-recommend(Perfil, 'Aumenta tu tasa de ahorro al menos al 10% del ingreso neto.') :-
+regla(ahorro_bajo, ahorro, medium,
+    'Aumenta tu tasa de ahorro al menos al 10% del ingreso neto.').
+recommend(Perfil, ahorro_bajo) :-
     tasa_ahorro(Perfil, T), T < 10.
 
-recommend(Perfil, 'Excelente tasa de ahorro (>20%). Considera diversificar una parte en instrumentos de bajo riesgo.') :-
+regla(ahorro_excelente, ahorro, medium,
+    'Excelente tasa de ahorro (>20%). Considera diversificar una parte en instrumentos de bajo riesgo.').
+recommend(Perfil, ahorro_excelente) :-
     tasa_ahorro(Perfil, T), T > 20.
 
-recommend(Perfil, 'Crea un fondo de emergencia de 3 a 6 meses de gastos.') :-
+regla(fondo_inexistente, ahorro, high,
+    'Crea un fondo de emergencia de 3 a 6 meses de gastos.').
+recommend(Perfil, fondo_inexistente) :-
     Perfil.meses_fondo =< 0.
 
-recommend(Perfil, 'Incrementa tu fondo de emergencia a al menos 3 meses de gastos.') :-
+regla(fondo_insuficiente, ahorro, high,
+    'Incrementa tu fondo de emergencia a al menos 3 meses de gastos.').
+recommend(Perfil, fondo_insuficiente) :-
     Perfil.meses_fondo > 0, Perfil.meses_fondo < 3.
 
-recommend(Perfil, 'Tu fondo ya cubre ~3-6 meses. Evala mover el excedente a inversin de bajo riesgo.') :-
+regla(fondo_completo, general, low,
+    'Tu fondo ya cubre ~3-6 meses. Evalúa mover el excedente a inversión de bajo riesgo.').
+recommend(Perfil, fondo_completo) :-
     Perfil.meses_fondo >= 6.
 
 % --- Presupuesto ---
-recommend(Perfil, 'Tus gastos superan tus ingresos. Recorta de inmediato gastos discrecionales y ajusta el presupuesto.') :-
+regla(presupuesto_deficit, presupuesto, high,
+    'Tus gastos superan tus ingresos. Recorta de inmediato gastos discrecionales y ajusta el presupuesto.').
+recommend(Perfil, presupuesto_deficit) :-
     gastos_superan_ingresos(Perfil).
 
-recommend(Perfil, 'Gasto en vivienda alto (>40%). Negocia renta/hipoteca o reubica para acercarte al 30% del ingreso.') :-
+regla(vivienda_alta, presupuesto, medium,
+    'Gasto en vivienda alto (>40%). Negocia renta/hipoteca o reubica para acercarte al 30% del ingreso.').
+recommend(Perfil, vivienda_alta) :-
     ratio_vivienda_pct(Perfil, P), P > 40.
 
-recommend(Perfil, 'Ajusta el gasto en vivienda a ~30% del ingreso; actualmente ests entre 30% y 40%.') :-
+regla(vivienda_moderada, presupuesto, medium,
+    'Ajusta el gasto en vivienda a ~30% del ingreso; actualmente estás entre 30% y 40%.').
+recommend(Perfil, vivienda_moderada) :-
     ratio_vivienda_pct(Perfil, P), betweenf(30, 40, P).
 
-recommend(Perfil, 'Gasto en alimentacin elevado (>35%). Optimiza compras y planifica mens.') :-
+regla(alimentacion_alta, presupuesto, medium,
+    'Gasto en alimentación elevado (>35%). Optimiza compras y planifica menús.').
+recommend(Perfil, alimentacion_alta) :-
     ratio_alimentacion_pct(Perfil, P), P > 35.
 
-recommend(Perfil, 'Gasto en transporte alto (>20%). Considera alternativas ms econmicas o rutas compartidas.') :-
+regla(transporte_alto, presupuesto, medium,
+    'Gasto en transporte alto (>20%). Considera alternativas más económicas o rutas compartidas.').
+recommend(Perfil, transporte_alto) :-
     ratio_transporte_pct(Perfil, P), P > 20.
 
-recommend(Perfil, 'Empieza a registrar gastos con un planificador mensual para mejorar control y seguimiento.') :-
+regla(sin_registro_gastos, presupuesto, medium,
+    'Empieza a registrar gastos con un planificador mensual para mejorar control y seguimiento.').
+recommend(Perfil, sin_registro_gastos) :-
     \+ Perfil.registra_gastos.
 
 % --- Deudas ---
-recommend(Perfil, 'Sobreendeudamiento: pagos de deuda >=40% del ingreso. Construye un plan agresivo de reduccin.') :-
+regla(sobreendeudamiento, deuda, high,
+    'Sobreendeudamiento: pagos de deuda >=40% del ingreso. Construye un plan agresivo de reducción.').
+recommend(Perfil, sobreendeudamiento) :-
     ratio_deuda_pct(Perfil, P), P >= 40.
 
-recommend(Perfil, 'Evita pagar solo el mnimo en la tarjeta; aumenta el pago mensual para reducir intereses.') :-
+regla(pago_minimo_tarjeta, deuda, medium,
+    'Evita pagar solo el mínimo en la tarjeta; aumenta el pago mensual para reducir intereses.').
+recommend(Perfil, pago_minimo_tarjeta) :-
     Perfil.cc_pago_minimo == true.
 
-recommend(Perfil, 'APR alta (>30%). Explora consolidacin o refinanciamiento para bajar intereses.') :-
+regla(apr_alta, deuda, high,
+    'APR alta (>30%). Explora consolidación o refinanciamiento para bajar intereses.').
+recommend(Perfil, apr_alta) :-
     Perfil.tasa_interes_apr > 30.
 
-recommend(Perfil, 'Sin deudas. Mantn buen historial usando crdito responsablemente (bajo uso, pagos completos).') :-
+regla(sin_deudas, deuda, medium,
+    'Sin deudas. Mantén buen historial usando crédito responsablemente (bajo uso, pagos completos).').
+recommend(Perfil, sin_deudas) :-
     Perfil.deudas_total =:= 0.
 
 % --- Metas financieras ---
-recommend(Perfil, 'Define al menos una meta de ahorro SMART (especfica, medible, alcanzable, relevante, temporal).') :-
+regla(sin_metas, ahorro, medium,
+    'Define al menos una meta de ahorro SMART (específica, medible, alcanzable, relevante, temporal).').
+recommend(Perfil, sin_metas) :-
     ( var(Perfil.metas) ; Perfil.metas == [] ).
 
-recommend(Perfil, 'Meta a corto plazo: prioriza liquidez (cuentas de ahorro de fcil acceso).') :-
+regla(meta_corto_plazo, ahorro, medium,
+    'Meta a corto plazo: prioriza liquidez (cuentas de ahorro de fácil acceso).').
+recommend(Perfil, meta_corto_plazo) :-
     member(meta(_, Meses), Perfil.metas),
     plazo_tipo(Meses, corto).
 
-recommend(Perfil, 'Meta a mediano plazo: usa instrumentos de bajo riesgo y horizontes 15 aos.') :-
+regla(meta_mediano_plazo, metas, medium,
+    'Meta a mediano plazo: usa instrumentos de bajo riesgo y horizontes 1–5 años.').
+recommend(Perfil, meta_mediano_plazo) :-
     member(meta(_, Meses), Perfil.metas),
     plazo_tipo(Meses, mediano).
 
-recommend(Perfil, 'Meta a largo plazo: diversifica el portafolio gradualmente.') :-
+regla(meta_largo_plazo, metas, medium,
+    'Meta a largo plazo: diversifica el portafolio gradualmente.').
+recommend(Perfil, meta_largo_plazo) :-
     member(meta(_, Meses), Perfil.metas),
     plazo_tipo(Meses, largo).
 
-recommend(Perfil, 'Calcula y define tu aporte mensual para jubilacin (no lo tienes definido).') :-
+regla(jubilacion_sin_definir, metas, medium,
+    'Calcula y define tu aporte mensual para jubilación (no lo tienes definido).').
+recommend(Perfil, jubilacion_sin_definir) :-
     Perfil.jubilacion_definida == false.
 
-% --- Educacin y conocimiento financiero ---
-recommend(Perfil, 'Nivel bsico: toma un curso introductorio y ejercicios prcticos de presupuesto.') :-
+% --- Educación y conocimiento financiero ---
+regla(nivel_basico, presupuesto, medium,
+    'Nivel básico: toma un curso introductorio y ejercicios prácticos de presupuesto.').
+recommend(Perfil, nivel_basico) :-
     Perfil.nivel_conocimiento == basic.
 
-recommend(Perfil, 'Nivel intermedio: practica con simuladores de inversin y seguimiento de metas.') :-
+regla(nivel_intermedio, metas, medium,
+    'Nivel intermedio: practica con simuladores de inversión y seguimiento de metas.').
+recommend(Perfil, nivel_intermedio) :-
     Perfil.nivel_conocimiento == intermediate.
 
-recommend(Perfil, 'Nivel avanzado: diversifica ms tu portafolio y evala rebalanceos peridicos.') :-
+regla(nivel_avanzado, educacion, low,
+    'Nivel avanzado: diversifica más tu portafolio y evalúa rebalanceos periódicos.').
+recommend(Perfil, nivel_avanzado) :-
     Perfil.nivel_conocimiento == advanced.
 
-% --- Seguros y proteccin ---
-recommend(Perfil, 'No cuentas con seguro de salud: evala adquirir un plan bsico cuanto antes.') :-
+% --- Seguros y protección ---
+regla(sin_seguro_salud, seguro, high,
+    'No cuentas con seguro de salud: evalúa adquirir un plan básico cuanto antes.').
+recommend(Perfil, sin_seguro_salud) :-
     Perfil.tiene_seguro_salud == false.
 
-recommend(Perfil, 'Con dependientes y sin seguro de vida: considera contratar cobertura de vida.') :-
+regla(dependientes_sin_seguro_vida, seguro, medium,
+    'Con dependientes y sin seguro de vida: considera contratar cobertura de vida.').
+recommend(Perfil, dependientes_sin_seguro_vida) :-
     Perfil.dependientes == true, Perfil.tiene_seguro_vida == false.
 
-recommend(Perfil, 'Posees auto sin seguro: contrata por obligacin legal y proteccin financiera.') :-
+regla(auto_sin_seguro, seguro, medium,
+    'Posees auto sin seguro: contrata por obligación legal y protección financiera.').
+recommend(Perfil, auto_sin_seguro) :-
     Perfil.posee_auto == true, Perfil.tiene_seguro_auto == false.
 
-recommend(Perfil, 'Gasto mdico >15% del ingreso: un seguro de salud puede reducir volatilidad y riesgo.') :-
+regla(gasto_medico_alto, presupuesto, medium,
+    'Gasto médico >15% del ingreso: un seguro de salud puede reducir volatilidad y riesgo.').
+recommend(Perfil, gasto_medico_alto) :-
     Perfil.gasto_medico_ratio > 0.15.
 
-recommend(Perfil, 'No tienes testamento: busca asesora bsica en sucesin para proteger a tu familia.') :-
+regla(sin_testamento, seguro, medium,
+    'No tienes testamento: busca asesoría básica en sucesión para proteger a tu familia.').
+recommend(Perfil, sin_testamento) :-
     Perfil.tiene_testamento == false.
 
 % --- Reglas adicionales (sin usar Perfil directamente) ---
-recommend(_Perfil, 'Automatiza tu ahorro: programa una transferencia automtica el da de pago.') :-
+regla(automatizar_ahorro, ahorro, medium,
+    'Automatiza tu ahorro: programa una transferencia automática el día de pago.').
+recommend(_Perfil, automatizar_ahorro) :-
     true.
 
-recommend(_Perfil, 'Evita compras impulsivas: usa la regla de las 24 horas para gastos no esenciales.') :-
+regla(regla_24_horas, presupuesto, medium,
+    'Evita compras impulsivas: usa la regla de las 24 horas para gastos no esenciales.').
+recommend(_Perfil, regla_24_horas) :-
     true.
 
-recommend(_Perfil, 'Construye historial: mantn utilizacin de crdito <30% y pagos puntuales.') :-
+regla(historial_credito, deuda, medium,
+    'Construye historial: mantén utilización de crédito <30% y pagos puntuales.').
+recommend(_Perfil, historial_credito) :-
     true.
 
-recommend(_Perfil, 'Haz revisin mensual del presupuesto y trimestral de metas.') :-
+regla(revision_periodica, presupuesto, medium,
+    'Haz revisión mensual del presupuesto y trimestral de metas.').
+recommend(_Perfil, revision_periodica) :-
     true.
 
-recommend(Perfil, 'Prioriza eliminar deudas de alto inters antes de invertir agresivamente.') :-
+regla(priorizar_deuda_cara, deuda, medium,
+    'Prioriza eliminar deudas de alto interés antes de invertir agresivamente.').
+recommend(Perfil, priorizar_deuda_cara) :-
     Perfil.tasa_interes_apr > 0.
 
-recommend(_Perfil, 'Si recibes un ingreso extra (bono/devolucin), destina una parte al fondo de emergencia o a deuda.') :-
+regla(ingreso_extra, ahorro, medium,
+    'Si recibes un ingreso extra (bono/devolución), destina una parte al fondo de emergencia o a deuda.').
+recommend(_Perfil, ingreso_extra) :-
     true.
 
 %% --------- Agregador ---------
+% recommend/2 es la definición de referencia de cada regla (la leen
+% reglas.py y el motor vectorizado). Para consultar se evalúa en una sola
+% pasada: rasgos/2 lee cada campo y calcula cada derivado una vez,
+% disparadas//2 prueba cada grupo de reglas solo contra su rasgo, y las
+% reglas de cuerpo `true` llegan ya resueltas en reglas_constantes/1.
+% disparadas//2 repite los umbrales de recommend/2: si se cambia un umbral
+% solo en recommend/2, recarga.py (verificar_artefacto) compara ambas
+% evaluaciones sobre perfiles de prueba y rechaza la versión.
+
 recomendaciones(Perfil, RecsUnicos) :-
-    findall(R, recommend(Perfil, R), Recs),
+    recomendaciones_ids(Perfil, Ids),
+    findall(R, (member(Id, Ids), regla(Id, _, _, R)), Recs),
     sort(Recs, RecsUnicos).
 
+recomendaciones_ids(Perfil, IdsUnicos) :-
+    rasgos(Perfil, Rasgos),
+    reglas_constantes(Constantes),
+    reglas_sin_indice(SinIndice),
+    (   SinIndice == []
+    ->  Cola = Constantes
+    ;   findall(Id, (member(Id, SinIndice), once(recommend(Perfil, Id))), Extra),
+        append(Constantes, Extra, Cola)
+    ),
+    phrase(disparadas(Perfil, Rasgos), Ids, Cola),
+    sort(Ids, IdsUnicos).
+
+recomendaciones_ids_referencia(Perfil, IdsUnicos) :-
+    findall(Id, recommend(Perfil, Id), Ids),
+    sort(Ids, IdsUnicos).
+
+%% --------- Evaluación en una pasada ---------
+rasgos(Perfil, rasgos(TasaAhorro, MesesFondo, Deficit, PctVivienda,
+                      PctAlimentacion, PctTransporte, RegistraGastos,
+                      PctDeuda, Deudas, PagoMinimo, Apr, Metas, Plazos,
+                      Jubilacion, Nivel, Salud, Dependientes, Auto,
+                      GastoMedico, Testamento)) :-
+    Ingreso = Perfil.ingreso,
+    porcentaje(Perfil.ahorro_mensual, Ingreso, TasaAhorro),
+    MesesFondo = Perfil.meses_fondo,
+    (   Perfil.gasto_total > Ingreso -> Deficit = true ; Deficit = false ),
+    ratio_pct(Perfil.vivienda, Ingreso, PctVivienda),
+    ratio_pct(Perfil.alimentacion, Ingreso, PctAlimentacion),
+    ratio_pct(Perfil.transporte, Ingreso, PctTransporte),
+    RegistraGastos = Perfil.registra_gastos,
+    Deudas = Perfil.deudas_total,
+    ratio_pct(Deudas, Ingreso, PctDeuda),
+    PagoMinimo = Perfil.cc_pago_minimo,
+    Apr = Perfil.tasa_interes_apr,
+    Metas = Perfil.metas,
+    plazos_metas(Metas, Plazos),
+    Jubilacion = Perfil.jubilacion_definida,
+    Nivel = Perfil.nivel_conocimiento,
+    Salud = Perfil.tiene_seguro_salud,
+    Dependientes = Perfil.dependientes,
+    Auto = Perfil.posee_auto,
+    GastoMedico = Perfil.gasto_medico_ratio,
+    Testamento = Perfil.tiene_testamento.
+
+%% Tipos de plazo presentes en las metas, en un solo recorrido.
+%  recommend/2 consulta plazo_tipo/2 con el tipo ya fijado, así que toda
+%  meta cuenta además como de largo plazo; plazo_meta/2 conserva eso.
+plazos_metas(Metas, Plazos) :-
+    findall(Plazo, (member(meta(_, Meses), Metas), plazo_meta(Meses, Plazo)), Plazos0),
+    sort(Plazos0, Plazos).
+
+plazo_meta(Meses, corto)   :- Meses < 12.
+plazo_meta(Meses, mediano) :- Meses >= 12, Meses =< 60.
+plazo_meta(_, largo).
+
+nivel_regla(basic, nivel_basico).
+nivel_regla(intermediate, nivel_intermedio).
+nivel_regla(advanced, nivel_avanzado).
+
+%% Campos que recommend/2 solo lee si la condición anterior se cumple
+%  (un perfil sin dependientes puede omitir tiene_seguro_vida).
+campo(Perfil, Campo, Valor) :-
+    Valor = Perfil.Campo.
+
+%% Cada grupo prueba su rasgo una vez; las cadenas de if-then-else
+%  reúnen reglas mutuamente excluyentes.
+disparadas(Perfil, rasgos(TasaAhorro, MesesFondo, Deficit, PctVivienda,
+                          PctAlimentacion, PctTransporte, RegistraGastos,
+                          PctDeuda, Deudas, PagoMinimo, Apr, Metas, Plazos,
+                          Jubilacion, Nivel, Salud, Dependientes, Auto,
+                          GastoMedico, Testamento)) -->
+    % Ahorro y fondo de emergencia
+    (   { TasaAhorro < 10 } -> [ahorro_bajo]
+    ;   { TasaAhorro > 20 } -> [ahorro_excelente]
+    ;   []
+    ),
+    (   { MesesFondo =< 0 } -> [fondo_inexistente]
+    ;   { MesesFondo < 3 }  -> [fondo_insuficiente]
+    ;   { MesesFondo >= 6 } -> [fondo_completo]
+    ;   []
+    ),
+    % Presupuesto
+    (   { Deficit == true } -> [presupuesto_deficit] ; [] ),
+    (   { PctVivienda > 40 }  -> [vivienda_alta]
+    ;   { PctVivienda >= 30 } -> [vivienda_moderada]
+    ;   []
+    ),
+    (   { PctAlimentacion > 35 } -> [alimentacion_alta] ; [] ),
+    (   { PctTransporte > 20 } -> [transporte_alto] ; [] ),
+    (   { \+ RegistraGastos } -> [sin_registro_gastos] ; [] ),
+    % Deudas
+    (   { PctDeuda >= 40 } -> [sobreendeudamiento] ; [] ),
+    (   { PagoMinimo == true } -> [pago_minimo_tarjeta] ; [] ),
+    (   { Apr > 30 } -> [apr_alta, priorizar_deuda_cara]
+    ;   { Apr > 0 }  -> [priorizar_deuda_cara]
+    ;   []
+    ),
+    (   { Deudas =:= 0 } -> [sin_deudas] ; [] ),
+    % Metas
+    (   { var(Metas) ; Metas == [] } -> [sin_metas] ; [] ),
+    (   { memberchk(corto, Plazos) } -> [meta_corto_plazo] ; [] ),
+    (   { memberchk(mediano, Plazos) } -> [meta_mediano_plazo] ; [] ),
+    (   { memberchk(largo, Plazos) } -> [meta_largo_plazo] ; [] ),
+    (   { Jubilacion == false } -> [jubilacion_sin_definir] ; [] ),
+    % Educación: indexado por el primer argumento de nivel_regla/2
+    (   { nonvar(Nivel), nivel_regla(Nivel, IdNivel) } -> [IdNivel] ; [] ),
+    % Seguros y protección
+    (   { Salud == false } -> [sin_seguro_salud] ; [] ),
+    (   { Dependientes == true,
+          campo(Perfil, tiene_seguro_vida, Vida), Vida == false }
+    ->  [dependientes_sin_seguro_vida]
+    ;   []
+    ),
+    (   { Auto == true,
+          campo(Perfil, tiene_seguro_auto, SeguroAuto), SeguroAuto == false }
+    ->  [auto_sin_seguro]
+    ;   []
+    ),
+    (   { GastoMedico > 0.15 } -> [gasto_medico_alto] ; [] ),
+    (   { Testamento == false } -> [sin_testamento] ; [] ).
+
+%% Reglas condicionales que resuelve disparadas//2
+regla_indexada(Id) :-
+    memberchk(Id, [ahorro_bajo, ahorro_excelente, fondo_inexistente,
+                   fondo_insuficiente, fondo_completo, presupuesto_deficit,
+                   vivienda_alta, vivienda_moderada, alimentacion_alta,
+                   transporte_alto, sin_registro_gastos, sobreendeudamiento,
+                   pago_minimo_tarjeta, apr_alta, priorizar_deuda_cara,
+                   sin_deudas, sin_metas, meta_corto_plazo, meta_mediano_plazo,
+                   meta_largo_plazo, jubilacion_sin_definir, nivel_basico,
+                   nivel_intermedio, nivel_avanzado, sin_seguro_salud,
+                   dependientes_sin_seguro_vida, auto_sin_seguro,
+                   gasto_medico_alto, sin_testamento]).
+
+%% Al cargar: ids de las reglas de cuerpo `true` y de las reglas nuevas que
+%  disparadas//2 aún no cubre (se evalúan con recommend/2 directamente).
+:- dynamic reglas_constantes/1, reglas_sin_indice/1.
+
+precalcular_reglas :-
+    findall(Id, clause(recommend(_, Id), true), Constantes),
+    findall(Id, ( clause(recommend(_, Id), Cuerpo),
+                  Cuerpo \== true,
+                  \+ regla_indexada(Id) ),
+            SinIndice0),
+    sort(SinIndice0, SinIndice),
+    retractall(reglas_constantes(_)),
+    retractall(reglas_sin_indice(_)),
+    assertz(reglas_constantes(Constantes)),
+    assertz(reglas_sin_indice(SinIndice)),
+    (   SinIndice == []
+    ->  true
+    ;   print_message(warning, format('Reglas sin indexar (se evalúan con recommend/2): ~w', [SinIndice]))
+    ).
+
+:- initialization(precalcular_reglas).
+
 %% --------- Ejemplo de uso ---------
 ejemplo_perfil(_{
     ingreso: 15000,
@@ -220,7 +466,7 @@ ejemplo_perfil(_{
 %% =========================
 
 run_asistente :-
-    writeln('--- Asistente de Planificacin Financiera ---'),
+    writeln('--- Asistente de Planificación Financiera ---'),
 
     % Pedir datos al usuario
     write('Ingreso mensual neto: '), read(Ingreso),
@@ -231,19 +477,19 @@ run_asistente :-
     write('Gasto mensual en alimentacion: '), read(Alimentacion),
     write('Gasto mensual en transporte: '), read(Transporte),
     write('Pago mensual de deudas: '), read(DeudaTotal),
-    write('Paga solo el mnimo en TDC? (true/false): '), read(Minimo),
+    write('¿Paga solo el mínimo en TDC? (true/false): '), read(Minimo),
     write('APR promedio de sus deudas (%): '), read(APR),
-    write('Tiene metas financieras? (ej: [meta(casa,24), meta(jubilacion,120)] o []): '), read(Metas),
-    write('Ha definido aporte a jubilacin? (true/false): '), read(Jub),
+    write('¿Tiene metas financieras? (ej: [meta(casa,24), meta(jubilacion,120)] o []): '), read(Metas),
+    write('¿Ha definido aporte a jubilación? (true/false): '), read(Jub),
     write('Nivel de conocimiento financiero (basic|intermediate|advanced): '), read(Nivel),
-    write('Tiene seguro de salud? (true/false): '), read(Salud),
-    write('Tiene seguro de vida? (true/false): '), read(Vida),
-    write('Tiene dependientes? (true/false): '), read(Dep),
-    write('Posee auto? (true/false): '), read(Auto),
-    write('Tiene seguro de auto? (true/false): '), read(SegAuto),
+    write('¿Tiene seguro de salud? (true/false): '), read(Salud),
+    write('¿Tiene seguro de vida? (true/false): '), read(Vida),
+    write('¿Tiene dependientes? (true/false): '), read(Dep),
+    write('¿Posee auto? (true/false): '), read(Auto),
+    write('¿Tiene seguro de auto? (true/false): '), read(SegAuto),
     write('Gasto medico / ingreso (ej: 0.10 para 10%): '), read(RatioMed),
-    write('Tiene testamento? (true/false): '), read(Testamento),
-    write('Registra sus gastos? (true/false): '), read(Registra),
+    write('¿Tiene testamento? (true/false): '), read(Testamento),
+    write('¿Registra sus gastos? (true/false): '), read(Registra),
 
     % Crear el dict Perfil
     Perfil = _{
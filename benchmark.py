@@ -0,0 +1,389 @@
+"""
+Banco de pruebas de rendimiento reproducible (todo local)
+- Perfiles sintéticos que recorren todas las reglas de asistente_finanzas.pl
+  (cada regla debe dispararse y también dejar de dispararse al menos una vez).
+- Carga a concurrencia fija contra los backends y los motores en proceso:
+    vectorizado              motor NumPy (motor_vectorizado.py)
+    pool                     PoolSwipl directo (pool_swipl.py)
+    backend                  backend.py con el cliente de pruebas de Flask
+    backend_alternativo      backend_alternativo.py con el cliente de pruebas
+    http:<nombre>=<url>      un servidor ya en marcha (Flask o servidor_async.py)
+- Informa throughput, latencias p50/p95/p99 y RSS máximo en JSON.
+- Modo --micro: serialización de la petición, tiempo de motor y categorización;
+  con --micro-prolog, además el pool Prolog y las inferencias por perfil de
+  la evaluación en una pasada frente a recommend/2 cláusula por cláusula.
+
+Ejemplos:
+    python benchmark.py --objetivos vectorizado,pool --concurrencia 1,8,32
+    python benchmark.py --objetivos http:async=http://localhost:5000 --pid 1234
+    python benchmark.py --micro --salida micro.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    resource = None
+    RESOURCE_AVAILABLE = False
+
+from perfiles import perfiles_aleatorios
+from pool_swipl import codificar_peticion
+from reglas import cargar_reglas, evaluar_condicion
+
+RUTA_RECOMENDACIONES = '/api/recomendaciones'
+MEDIR_REGLAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medir_reglas.pl')
+
+
+# --------- Perfiles y cobertura ---------
+
+def disparos_regla(reglas, perfil):
+    """Ids de las reglas que se disparan para un perfil (evaluación escalar)"""
+    disparadas = set()
+    for regla in reglas:
+        try:
+            if all(evaluar_condicion(cond, perfil) for cond in regla.condiciones):
+                disparadas.add(regla.id)
+        except ValueError:
+            continue
+    return disparadas
+
+
+def perfiles_cobertura(n, semilla=0, reglas=None):
+    """
+    Genera `n` perfiles y comprueba que cada regla se dispare y, si tiene
+    condiciones, que también deje de dispararse. Devuelve (perfiles, cobertura).
+    """
+    reglas = reglas or cargar_reglas()
+    perfiles = perfiles_aleatorios(n, semilla)
+    ids = list(dict.fromkeys(regla.id for regla in reglas))
+    condicionales = {regla.id for regla in reglas if regla.condiciones}
+    veces = dict.fromkeys(ids, 0)
+    for perfil in perfiles:
+        for regla_id in disparos_regla(reglas, perfil):
+            veces[regla_id] += 1
+    cobertura = {
+        'reglas': len(ids),
+        'disparadas': sum(1 for v in veces.values() if v),
+        'nunca': [r for r, v in veces.items() if v == 0],
+        'siempre': [r for r, v in veces.items() if v == len(perfiles) and r in condicionales],
+        'veces': veces
+    }
+    return perfiles, cobertura
+
+
+# --------- Medición ---------
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def rss_pico_kb(pid=None):
+    """RSS máximo en KB: del proceso `pid` (Linux) o de este proceso y sus hijos"""
+    if pid is not None:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for linea in f:
+                    if linea.startswith('VmHWM:'):
+                        return int(linea.split()[1])
+        except OSError:
+            return None
+        return None
+    if not RESOURCE_AVAILABLE:
+        return None
+    escala = 1024 if sys.platform == 'darwin' else 1
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // escala
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // escala
+    return max(propio, hijos)
+
+
+def cargar(objetivo, perfiles, concurrencia, peticiones):
+    """Envía `peticiones` perfiles con `concurrencia` hilos y mide cada latencia"""
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+
+    def una(i):
+        perfil = perfiles[i % len(perfiles)]
+        inicio = time.perf_counter()
+        try:
+            objetivo(perfil)
+            ok = None
+        except Exception as e:
+            ok = f'{type(e).__name__}: {e}'
+        fin = time.perf_counter() - inicio
+        with lock:
+            if ok is None:
+                latencias.append(fin)
+            else:
+                errores.append(ok)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        list(ejecutor.map(una, range(peticiones)))
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    ms = lambda s: None if s is None else round(s * 1000, 3)
+    return {
+        'concurrencia': concurrencia,
+        'peticiones': peticiones,
+        'errores': len(errores),
+        'primer_error': errores[0] if errores else None,
+        'duracion_s': round(duracion, 4),
+        'throughput_rps': round(len(latencias) / duracion, 2) if duracion else None,
+        'p50_ms': ms(percentil(latencias, 50)),
+        'p95_ms': ms(percentil(latencias, 95)),
+        'p99_ms': ms(percentil(latencias, 99)),
+        'max_ms': ms(latencias[-1] if latencias else None)
+    }
+
+
+# --------- Objetivos ---------
+
+def objetivo_vectorizado():
+    from motor_vectorizado import obtener_motor
+    motor = obtener_motor()
+
+    def evaluar(perfil):
+        recomendaciones, error = motor.evaluar_bloque([perfil])[0]
+        if error:
+            raise ValueError(error)
+        return recomendaciones
+    return evaluar, None
+
+
+def objetivo_pool(tamano):
+    from arranque import get_swipl_cmd, preparar_base
+    from pool_swipl import PoolSwipl
+    pool = PoolSwipl(get_swipl_cmd(), preparar_base().ruta, tamano=tamano)
+    pool.iniciar()
+    return pool.consultar, pool.cerrar
+
+
+def objetivo_flask(modulo):
+    app = __import__(modulo).app
+    locales = threading.local()
+
+    def evaluar(perfil):
+        if not hasattr(locales, 'cliente'):
+            locales.cliente = app.test_client()
+        respuesta = locales.cliente.post(RUTA_RECOMENDACIONES, json=perfil)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'HTTP {respuesta.status_code}: {respuesta.get_data(as_text=True)[:200]}')
+        return respuesta.get_json()
+    return evaluar, None
+
+
+def objetivo_http(url):
+    destino = url.rstrip('/') + RUTA_RECOMENDACIONES
+
+    def evaluar(perfil):
+        peticion = urllib.request.Request(
+            destino,
+            data=json.dumps(perfil).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+            return json.loads(respuesta.read())
+    return evaluar, None
+
+
+def crear_objetivo(nombre, args):
+    """Devuelve (etiqueta, evaluar(perfil), cerrar) para un nombre de --objetivos"""
+    if nombre.startswith('http:'):
+        etiqueta, _, url = nombre[len('http:'):].partition('=')
+        return f'http:{etiqueta}', *objetivo_http(url or etiqueta)
+    if nombre == 'vectorizado':
+        return nombre, *objetivo_vectorizado()
+    if nombre == 'pool':
+        return nombre, *objetivo_pool(args.pool)
+    if nombre in ('backend', 'backend_alternativo'):
+        return nombre, *objetivo_flask(nombre)
+    raise ValueError(f'Objetivo desconocido: {nombre}')
+
+
+# --------- Microbenchmarks ---------
+
+def cronometrar(funcion, elementos, repeticiones):
+    """Tiempo por operación (µs): mediana y p95 de `repeticiones` pasadas"""
+    por_pasada = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for elemento in elementos:
+            funcion(elemento)
+        por_pasada.append((time.perf_counter() - inicio) / len(elementos) * 1e6)
+    por_pasada.sort()
+    return {
+        'operaciones': len(elementos) * repeticiones,
+        'mediana_us': round(percentil(por_pasada, 50), 3),
+        'p95_us': round(percentil(por_pasada, 95), 3)
+    }
+
+
+def inferencias_prolog(perfiles, repeticiones):
+    """Ejecuta medir_reglas.pl: inferencias y CPU por perfil de ambas evaluaciones de la base"""
+    from arranque import get_swipl_cmd, preparar_base
+    entrada = b''.join(codificar_peticion(p) for p in perfiles)
+    proceso = subprocess.run(
+        [get_swipl_cmd(), '-q', MEDIR_REGLAS_FILE, '--', preparar_base().ruta, str(repeticiones)],
+        input=entrada, capture_output=True, timeout=600
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.decode('utf-8', 'replace').strip() or 'medir_reglas.pl falló')
+    resultado = json.loads(proceso.stdout)
+    if resultado['diferencias']:
+        print(f"✗ La evaluación en una pasada difiere de recommend/2 en {len(resultado['diferencias'])} perfiles",
+              file=sys.stderr)
+    return resultado
+
+
+def micro(perfiles, args):
+    from categorias import categorizar_recomendaciones, tabla
+    reglas = cargar_reglas()
+    resultados = {
+        'serializacion_peticion': cronometrar(lambda p: codificar_peticion({'perfil': p}), perfiles, args.repeticiones),
+        'motor_escalar': cronometrar(lambda p: disparos_regla(reglas, p), perfiles, args.repeticiones),
+    }
+
+    listas = [tabla.textos(disparos_regla(reglas, p)) for p in perfiles]
+    resultados['categorizacion'] = cronometrar(categorizar_recomendaciones, listas, args.repeticiones)
+
+    try:
+        from motor_vectorizado import obtener_motor
+        motor = obtener_motor()
+        resultados['motor_vectorizado_por_perfil'] = cronometrar(
+            lambda p: motor.evaluar_bloque([p]), perfiles, args.repeticiones
+        )
+        bloque = cronometrar(motor.evaluar_bloque, [perfiles], args.repeticiones)
+        bloque['mediana_us_por_perfil'] = round(bloque['mediana_us'] / len(perfiles), 3)
+        resultados['motor_vectorizado_bloque'] = bloque
+    except RuntimeError as e:
+        resultados['motor_vectorizado_por_perfil'] = {'omitido': str(e)}
+
+    if args.micro_prolog:
+        try:
+            evaluar, cerrar = objetivo_pool(1)
+            try:
+                muestra = perfiles[:min(len(perfiles), 200)]
+                resultados['motor_prolog_pool'] = cronometrar(evaluar, muestra, 1)
+            finally:
+                cerrar()
+        except Exception as e:
+            resultados['motor_prolog_pool'] = {'omitido': str(e)}
+        try:
+            resultados['inferencias_prolog'] = inferencias_prolog(perfiles, args.repeticiones)
+        except Exception as e:
+            resultados['inferencias_prolog'] = {'omitido': str(e)}
+    return resultados
+
+
+# --------- Entrada ---------
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los motores y backends del sistema experto')
+    parser.add_argument('--objetivos', default='vectorizado',
+                        help='lista separada por comas: vectorizado, pool, backend, backend_alternativo, http:<nombre>=<url>')
+    parser.add_argument('--concurrencia', default='1,8,32', help='niveles de concurrencia, separados por comas')
+    parser.add_argument('--peticiones', type=int, default=2000, help='peticiones por nivel de concurrencia')
+    parser.add_argument('--perfiles', type=int, default=1000, help='perfiles sintéticos distintos')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--calentamiento', type=int, default=50, help='peticiones previas no medidas')
+    parser.add_argument('--pool', type=int, default=4, help='trabajadores del objetivo pool')
+    parser.add_argument('--pid', type=int, help='PID del servidor http para leer su RSS máximo')
+    parser.add_argument('--cache', action='store_true', help='usar la caché de recomendaciones (desactivada por defecto)')
+    parser.add_argument('--micro', action='store_true', help='microbenchmarks en lugar de carga')
+    parser.add_argument('--micro-prolog', action='store_true', help='incluir el pool Prolog en los microbenchmarks')
+    parser.add_argument('--repeticiones', type=int, default=5, help='pasadas de cada microbenchmark')
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto, la salida estándar)')
+    args = parser.parse_args()
+
+    # Los backends buscan asistente_finanzas.pl en el directorio actual
+    salida = os.path.abspath(args.salida) if args.salida else None
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if not args.cache:
+        # Antes de importar los backends: la caché se crea al importar el módulo
+        os.environ['CACHE_TAMANO'] = '0'
+
+    perfiles, cobertura = perfiles_cobertura(args.perfiles, args.semilla)
+    if cobertura['nunca'] or cobertura['siempre']:
+        print(f"⚠️  Cobertura incompleta: nunca {cobertura['nunca']}, siempre {cobertura['siempre']}", file=sys.stderr)
+    else:
+        print(f"✓ {len(perfiles)} perfiles cubren las {cobertura['reglas']} reglas", file=sys.stderr)
+
+    informe = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'semilla': args.semilla,
+        'perfiles': len(perfiles),
+        'cache': args.cache,
+        'cobertura': cobertura
+    }
+
+    if args.micro:
+        informe['micro'] = micro(perfiles, args)
+    else:
+        niveles = [int(c) for c in args.concurrencia.split(',') if c.strip()]
+        informe['resultados'] = []
+        for nombre in [o.strip() for o in args.objetivos.split(',') if o.strip()]:
+            try:
+                etiqueta, evaluar, cerrar = crear_objetivo(nombre, args)
+            except Exception as e:
+                print(f"✗ {nombre}: {e}", file=sys.stderr)
+                informe['resultados'].append({'objetivo': nombre, 'error': str(e)})
+                continue
+            try:
+                cargar(evaluar, perfiles, 1, args.calentamiento)
+                for concurrencia in niveles:
+                    resultado = cargar(evaluar, perfiles, concurrencia, args.peticiones)
+                    resultado['objetivo'] = etiqueta
+                    resultado['rss_pico_kb'] = rss_pico_kb(args.pid if etiqueta.startswith('http:') else None)
+                    informe['resultados'].append(resultado)
+                    print(f"  {etiqueta:<24} c={concurrencia:<4} {resultado['throughput_rps']} req/s  "
+                          f"p50={resultado['p50_ms']}ms p99={resultado['p99_ms']}ms errores={resultado['errores']}",
+                          file=sys.stderr)
+            finally:
+                if cerrar is not None:
+                    cerrar()
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+        print(f"✓ Resultados guardados en {salida}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Bitácora estructurada, con búfer y muestreo
+Reemplaza los print() de cada petición: un evento es una línea JSON
+({"ts", "nivel", "evento", ...campos}) que el hilo de la petición solo
+encola; un hilo aparte las escribe por tandas en stderr o en
+BITACORA_ARCHIVO. Los eventos "info" se muestrean (BITACORA_MUESTREO,
+fracción entre 0 y 1); las advertencias y los errores se escriben siempre.
+Con la cola llena (BITACORA_COLA) el evento se descarta en lugar de frenar
+la petición. Si la petición está trazada (trazas.py), el evento se agrega
+también a su traza, con o sin muestreo.
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+import trazas
+
+BITACORA_MUESTREO = float(os.environ.get('BITACORA_MUESTREO', '0.1'))
+BITACORA_COLA = int(os.environ.get('BITACORA_COLA', '10000'))
+BITACORA_ARCHIVO = os.environ.get('BITACORA_ARCHIVO', '')
+
+NIVELES_SIEMPRE = ('advertencia', 'error')
+# Eventos por escritura: el hilo escritor vacía la cola de a tandas
+TANDA = 256
+
+
+class Bitacora:
+    def __init__(self, muestreo=BITACORA_MUESTREO, capacidad=BITACORA_COLA, archivo=BITACORA_ARCHIVO):
+        self.muestreo = muestreo
+        self.archivo = archivo
+        self.escritos = 0
+        self.omitidos = 0
+        self.descartados = 0
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _arrancar(self):
+        # El hilo escritor nace con el primer evento (importar el módulo no crea hilos)
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escribir, name='bitacora', daemon=True)
+                self._hilo.start()
+                atexit.register(self.cerrar)
+
+    def evento(self, nivel, nombre, **campos):
+        traza = trazas.actual()
+        if traza is not None:
+            traza.evento(nivel, nombre, campos)
+        if nivel not in NIVELES_SIEMPRE and random.random() >= self.muestreo:
+            self.omitidos += 1
+            return
+        registro = {'ts': round(time.time(), 3), 'nivel': nivel, 'evento': nombre}
+        if traza is not None:
+            registro['traza'] = traza.id
+        registro.update(campos)
+        if self._hilo is None:
+            self._arrancar()
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+    def info(self, nombre, **campos):
+        self.evento('info', nombre, **campos)
+
+    def advertencia(self, nombre, **campos):
+        self.evento('advertencia', nombre, **campos)
+
+    def error(self, nombre, **campos):
+        self.evento('error', nombre, **campos)
+
+    def _abrir(self):
+        if self.archivo:
+            return open(self.archivo, 'a', encoding='utf-8')
+        return sys.stderr
+
+    def _escribir(self):
+        salida = self._abrir()
+        while True:
+            registros = [self._cola.get()]
+            while len(registros) < TANDA:
+                try:
+                    registros.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            fin = None in registros
+            lineas = [json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in registros if r is not None]
+            try:
+                salida.writelines(lineas)
+                salida.flush()
+            except (OSError, ValueError):
+                pass
+            self.escritos += len(lineas)
+            for _ in registros:
+                self._cola.task_done()
+            if fin:
+                if salida is not sys.stderr:
+                    salida.close()
+                return
+
+    def cerrar(self, timeout=2):
+        """Escribe lo pendiente y detiene el hilo escritor"""
+        if self._hilo is None or not self._hilo.is_alive():
+            return
+        try:
+            self._cola.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    def estado(self):
+        return {
+            'muestreo': self.muestreo,
+            'escritos': self.escritos,
+            'omitidos': self.omitidos,
+            'descartados': self.descartados,
+            'pendientes': self._cola.qsize()
+        }
+
+
+# Instancia compartida por el proceso
+bitacora = Bitacora()
@@ -0,0 +1,284 @@
+"""
+Caché de recomendaciones compartida entre procesos (SQLite)
+Con varios procesos de Flask por máquina cada uno tiene su propia caché en
+memoria y solo ve una parte de los aciertos. Este segundo nivel guarda los
+resultados en un archivo SQLite local (modo WAL) que leen y escriben todos
+los procesos del host y que sobrevive a los reinicios. La clave es un hash
+del perfil canonizado (el vector de verdad de cache_recomendaciones.py) y de
+la versión de la base, así que una versión nueva nunca lee resultados de la
+anterior. El tamaño se acota en entradas y se desalojan las menos usadas.
+
+CACHE_COMPARTIDA es la ruta del archivo (vacía = desactivada) y
+CACHE_COMPARTIDA_MAX el máximo de entradas.
+
+Precalentar con los perfiles más comunes (ejemplo_perfil y los de un archivo
+JSON o NDJSON):
+    python cache_compartida.py --precalentar
+    python cache_compartida.py --precalentar frecuentes.ndjson --motor vectorizado
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from bitacora import bitacora
+
+CACHE_COMPARTIDA = os.environ.get('CACHE_COMPARTIDA', '')
+CACHE_COMPARTIDA_MAX = int(os.environ.get('CACHE_COMPARTIDA_MAX', '100000'))
+PROLOG_TIMEOUT = float(os.environ.get('SWIPL_TIMEOUT', '15'))
+
+# Cada cuántas escrituras se revisa el tamaño (como mucho), y cuánto se
+# desaloja de más para no volver a podar en la escritura siguiente
+REVISAR_CADA = 256
+HOLGURA = 0.1
+# Aciertos cuya fecha de uso se escribe de una vez (el desalojo solo
+# necesita un orden aproximado)
+USADOS_TANDA = 64
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recomendaciones (
+    clave TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recomendaciones_usado ON recomendaciones (usado);
+"""
+
+
+def clave_hash(firma, bits):
+    """Hash estable entre procesos de la clave (versión, vector de verdad)"""
+    return hashlib.sha256(f'{firma}:{bits:x}'.encode()).hexdigest()
+
+
+class CacheCompartida:
+    """
+    Almacén SQLite de listas de recomendaciones. Cualquier error de SQLite
+    se trata como un fallo de caché: la petición sigue por el motor.
+    """
+
+    def __init__(self, ruta, maximo=CACHE_COMPARTIDA_MAX):
+        self.ruta = os.path.abspath(ruta)
+        self.maximo = maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.desalojos = 0
+        self.errores = 0
+        # El exceso posible entre revisiones queda en la holgura
+        self._revisar_cada = max(1, min(REVISAR_CADA, int(maximo * HOLGURA)))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._usados = {}
+        self._conexion().executescript(ESQUEMA)
+
+    def _conexion(self):
+        # sqlite3 no comparte conexiones entre hilos: una por hilo
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None, check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+        return conexion
+
+    def _error(self, e):
+        with self._lock:
+            self.errores += 1
+        bitacora.advertencia('cache_compartida', error=str(e))
+
+    def buscar(self, firma, bits):
+        """
+        Lista de recomendaciones guardada por cualquier proceso, o None. La
+        fecha de uso de los aciertos se actualiza por tandas (USADOS_TANDA),
+        no con una escritura por acierto.
+        """
+        clave = clave_hash(firma, bits)
+        try:
+            fila = self._conexion().execute('SELECT valor FROM recomendaciones WHERE clave = ?', (clave,)).fetchone()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None
+        with self._lock:
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._usados[clave] = time.time()
+            escribir = len(self._usados) >= USADOS_TANDA
+        if escribir:
+            self.escribir_usados()
+        return json.loads(fila[0])
+
+    def escribir_usados(self):
+        """Escribe la fecha de uso de los aciertos pendientes"""
+        with self._lock:
+            usados, self._usados = self._usados, {}
+        if not usados:
+            return
+        try:
+            self._conexion().executemany(
+                'UPDATE recomendaciones SET usado = ? WHERE clave = ?',
+                [(usado, clave) for clave, usado in usados.items()]
+            )
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def guardar(self, firma, bits, recomendaciones):
+        try:
+            self._conexion().execute(
+                'INSERT OR REPLACE INTO recomendaciones (clave, version, valor, usado) VALUES (?, ?, ?, ?)',
+                (clave_hash(firma, bits), str(firma), json.dumps(list(recomendaciones), ensure_ascii=False), time.time())
+            )
+        except sqlite3.Error as e:
+            self._error(e)
+            return
+        with self._lock:
+            self.escrituras += 1
+            podar = self.escrituras % self._revisar_cada == 0
+        if podar:
+            self.podar()
+
+    def podar(self):
+        """Desaloja las entradas menos usadas si se superó el máximo"""
+        self.escribir_usados()
+        try:
+            conexion = self._conexion()
+            total = conexion.execute('SELECT COUNT(*) FROM recomendaciones').fetchone()[0]
+            if total <= self.maximo:
+                return 0
+            sobrantes = total - int(self.maximo * (1 - HOLGURA))
+            conexion.execute(
+                'DELETE FROM recomendaciones WHERE clave IN '
+                '(SELECT clave FROM recomendaciones ORDER BY usado LIMIT ?)',
+                (sobrantes,)
+            )
+        except sqlite3.Error as e:
+            self._error(e)
+            return 0
+        with self._lock:
+            self.desalojos += sobrantes
+        return sobrantes
+
+    def vaciar(self):
+        try:
+            self._conexion().execute('DELETE FROM recomendaciones')
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def estadisticas(self):
+        try:
+            entradas = self._conexion().execute('SELECT COUNT(*) FROM recomendaciones').fetchone()[0]
+        except sqlite3.Error:
+            entradas = None
+        return {
+            'archivo': self.ruta,
+            'maximo': self.maximo,
+            'entradas': entradas,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'escrituras': self.escrituras,
+            'desalojos': self.desalojos,
+            'errores': self.errores
+        }
+
+
+def abrir_compartida(ruta=CACHE_COMPARTIDA, maximo=CACHE_COMPARTIDA_MAX):
+    """CacheCompartida en `ruta`, o None si está desactivada o no se pudo abrir"""
+    if not ruta:
+        return None
+    try:
+        return CacheCompartida(ruta, maximo)
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo abrir la caché compartida {ruta}: {e}")
+        return None
+
+
+# --------- Precalentamiento ---------
+
+def leer_archivo_perfiles(ruta):
+    """Perfiles de un archivo JSON (arreglo) o NDJSON"""
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    if texto.lstrip().startswith('['):
+        return json.loads(texto)
+    return [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+
+
+def precalentar(perfiles, motor='prolog', bloque=100):
+    """Evalúa los perfiles con la versión actual de la base y guarda sus resultados"""
+    from cache_recomendaciones import cache
+    from categorias import recomendaciones_de_ids
+    from perfiles import validar_perfil
+    from recarga import BaseConocimiento
+
+    if cache.compartida is None:
+        raise SystemExit('✗ CACHE_COMPARTIDA no está configurada')
+    version = BaseConocimiento(intervalo=0).actual()
+    validos = [perfil for perfil in perfiles if not validar_perfil(perfil)]
+
+    trabajador = None
+    if motor == 'vectorizado':
+        evaluar = version.vectorizado().evaluar_bloque
+    else:
+        from arranque import get_swipl_cmd
+        from pool_swipl import TrabajadorSwipl
+        trabajador = TrabajadorSwipl(get_swipl_cmd(), version.artefacto.ruta)
+
+        def evaluar(pendientes):
+            return [
+                (None if ids is None else recomendaciones_de_ids(ids, version.tabla), error)
+                for ids, error in trabajador.consultar_lote(pendientes, PROLOG_TIMEOUT)
+            ]
+
+    errores = 0
+    try:
+        for inicio in range(0, len(validos), bloque):
+            resultados = cache.evaluar_bloque(validos[inicio:inicio + bloque], evaluar, version=version)
+            errores += sum(1 for _, error in resultados if error is not None)
+    finally:
+        if trabajador is not None:
+            trabajador.detener()
+    return {
+        'version': version.id,
+        'perfiles': len(perfiles),
+        'invalidos': len(perfiles) - len(validos),
+        'errores': errores,
+        'cache': cache.compartida.estadisticas()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Caché de recomendaciones compartida entre procesos')
+    parser.add_argument('--precalentar', nargs='*', metavar='PERFILES',
+                        help='evaluar ejemplo_perfil y los perfiles de estos archivos JSON/NDJSON')
+    parser.add_argument('--motor', choices=('prolog', 'vectorizado'), default='prolog')
+    parser.add_argument('--vaciar', action='store_true', help='descartar todas las entradas')
+    parser.add_argument('--estado', action='store_true', help='mostrar el tamaño y los contadores')
+    args = parser.parse_args(argv)
+
+    from cache_recomendaciones import cache
+    if cache.compartida is None:
+        print('✗ Define CACHE_COMPARTIDA con la ruta del archivo SQLite', file=sys.stderr)
+        return 1
+    if args.vaciar:
+        cache.compartida.vaciar()
+        print(f"✓ Caché compartida vaciada: {cache.compartida.ruta}", file=sys.stderr)
+    if args.precalentar is not None:
+        from perfiles import EJEMPLO_PERFIL
+        perfiles = [dict(EJEMPLO_PERFIL)]
+        for ruta in args.precalentar:
+            perfiles.extend(leer_archivo_perfiles(ruta))
+        print(json.dumps(precalentar(perfiles, args.motor), ensure_ascii=False, indent=2))
+    elif args.estado or not args.vaciar:
+        print(json.dumps(cache.compartida.estadisticas(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
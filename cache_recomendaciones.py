@@ -0,0 +1,212 @@
+"""
+Caché de recomendaciones canonizada por umbrales
+El resultado de recomendaciones/2 depende solo de qué lado de cada umbral
+cae el perfil. La clave de la caché es el vector de verdad de todas las
+condiciones de las reglas (ver reglas.py), de modo que dos perfiles que
+difieren en unos pesos comparten entrada. Tamaño acotado con desalojo LRU.
+Las condiciones y la firma salen de la versión de la base que atiende la
+petición (recarga.VersionBase): la clave incluye su id, así una respuesta de
+la versión anterior nunca se sirve con la nueva, y no hace falta revisar el
+archivo .pl en cada consulta.
+Si CACHE_COMPARTIDA apunta a un archivo, los fallos de esta caché consultan
+además la caché SQLite compartida por todos los procesos del host
+(cache_compartida.py), y cada resultado nuevo se escribe en ambas.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+
+from reglas import condiciones_evaluadas
+from cache_compartida import abrir_compartida
+
+
+class CacheRecomendaciones:
+    """Caché LRU de listas de recomendaciones indexada por el vector de verdad del perfil"""
+
+    def __init__(self, capacidad=4096, compartida=None):
+        self.capacidad = capacidad
+        self.compartida = compartida
+        self.aciertos = 0
+        self.fallos = 0
+        self.omitidos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clave(self, perfil, version):
+        """
+        Vector de verdad empaquetado en un entero, o None si el perfil no es
+        cacheable. Se usan las reglas de `version` (recarga.VersionBase) y su
+        id como firma.
+        Las condiciones se evalúan como en Prolog, en el orden de cada
+        cláusula: las que ningún perfil llega a evaluar (tiene_seguro_vida sin
+        dependientes) ocupan un bit aparte, por encima de los de verdad.
+        """
+        if self.capacidad <= 0 or version is None or not isinstance(perfil, dict):
+            return None
+        condiciones = version.condiciones
+        try:
+            valores = condiciones_evaluadas(version.reglas, perfil)
+        except (ValueError, TypeError, ArithmeticError):
+            # Prolog respondería con un error (o el valor no cabe en un float): se deja al motor
+            return None
+        bits = 0
+        for i, cond in enumerate(condiciones):
+            if cond not in valores:
+                bits |= 1 << (len(condiciones) + i)
+            elif valores[cond]:
+                bits |= 1 << i
+        return (version.id, bits)
+
+    def _omitir(self):
+        with self._lock:
+            self.omitidos += 1
+
+    def _buscar_local(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return list(self._datos[clave])
+            self.fallos += 1
+        return None
+
+    def _buscar_compartida(self, clave):
+        # Segundo nivel: lo que ya calculó otro proceso (o este antes de reiniciarse)
+        recomendaciones = self.compartida.buscar(*clave)
+        if recomendaciones is not None:
+            self._guardar_local(clave, recomendaciones)
+        return recomendaciones
+
+    def _buscar(self, clave):
+        recomendaciones = self._buscar_local(clave)
+        if recomendaciones is None and self.compartida is not None:
+            recomendaciones = self._buscar_compartida(clave)
+        return recomendaciones
+
+    def _guardar_local(self, clave, recomendaciones):
+        with self._lock:
+            self._datos[clave] = tuple(recomendaciones)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def _guardar(self, clave, recomendaciones):
+        self._guardar_local(clave, recomendaciones)
+        if self.compartida is not None:
+            self.compartida.guardar(*clave, recomendaciones)
+
+    def obtener(self, perfil, calcular, version=None):
+        """
+        Devuelve las recomendaciones del perfil desde la caché o con
+        `calcular(perfil)`. Las excepciones de `calcular` no se guardan.
+        Sin `version` (recarga.VersionBase) no se usa la caché.
+        """
+        clave = self.clave(perfil, version)
+        if clave is None:
+            self._omitir()
+            return calcular(perfil)
+        recomendaciones = self._buscar(clave)
+        if recomendaciones is None:
+            recomendaciones = calcular(perfil)
+            self._guardar(clave, recomendaciones)
+        return recomendaciones
+
+    async def obtener_async(self, perfil, calcular, version=None):
+        """
+        Como obtener(), con `calcular` asíncrona (servidor_async.py). Las
+        consultas a la caché compartida (SQLite, bloqueantes) corren en un
+        hilo para no detener el bucle de eventos.
+        """
+        clave = self.clave(perfil, version)
+        if clave is None:
+            self._omitir()
+            return await calcular(perfil)
+        recomendaciones = self._buscar_local(clave)
+        if recomendaciones is None and self.compartida is not None:
+            recomendaciones = await asyncio.to_thread(self._buscar_compartida, clave)
+        if recomendaciones is None:
+            recomendaciones = await calcular(perfil)
+            self._guardar_local(clave, recomendaciones)
+            if self.compartida is not None:
+                await asyncio.to_thread(self.compartida.guardar, *clave, recomendaciones)
+        return recomendaciones
+
+    def evaluar_bloque(self, perfiles, evaluar, version=None):
+        """
+        Como `evaluar(perfiles)` (una tupla (recomendaciones, error) por perfil),
+        pero solo envía al motor los perfiles que no están en la caché.
+        """
+        claves = [self.clave(perfil, version) for perfil in perfiles]
+        resultados, pendientes = self._separar(claves)
+        evaluados = evaluar([perfiles[i] for i in pendientes]) if pendientes else []
+        self._completar(claves, resultados, pendientes, evaluados)
+        return resultados
+
+    async def evaluar_bloque_async(self, perfiles, evaluar, version=None):
+        """
+        Como evaluar_bloque(), con `evaluar` asíncrona (servidor_async.py); la
+        caché compartida se consulta y se escribe en un hilo.
+        """
+        claves = [self.clave(perfil, version) for perfil in perfiles]
+        if self.compartida is None:
+            resultados, pendientes = self._separar(claves)
+        else:
+            resultados, pendientes = await asyncio.to_thread(self._separar, claves)
+        evaluados = await evaluar([perfiles[i] for i in pendientes]) if pendientes else []
+        if self.compartida is None:
+            self._completar(claves, resultados, pendientes, evaluados)
+        else:
+            await asyncio.to_thread(self._completar, claves, resultados, pendientes, evaluados)
+        return resultados
+
+    def _separar(self, claves):
+        """Resultados de las claves que ya están en la caché y los índices que faltan"""
+        resultados = [None] * len(claves)
+        pendientes = []
+        for i, clave in enumerate(claves):
+            recomendaciones = self._buscar(clave) if clave is not None else None
+            if recomendaciones is None:
+                if clave is None:
+                    self._omitir()
+                pendientes.append(i)
+            else:
+                resultados[i] = (recomendaciones, None)
+        return resultados, pendientes
+
+    def _completar(self, claves, resultados, pendientes, evaluados):
+        for i, (recomendaciones, error) in zip(pendientes, evaluados):
+            resultados[i] = (recomendaciones, error)
+            if error is None and claves[i] is not None:
+                self._guardar(claves[i], recomendaciones)
+
+    def vaciar(self, *_):
+        """Descarta todas las entradas (al publicarse una nueva versión de la base)"""
+        with self._lock:
+            if self._datos:
+                self.invalidaciones += 1
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            datos = {
+                'capacidad': self.capacidad,
+                'entradas': len(self._datos),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'omitidos': self.omitidos,
+                'desalojos': self.desalojos,
+                'invalidaciones': self.invalidaciones
+            }
+        consultas = datos['aciertos'] + datos['fallos']
+        datos['tasa_aciertos'] = round(datos['aciertos'] / consultas, 4) if consultas else None
+        datos['compartida'] = self.compartida.estadisticas() if self.compartida is not None else None
+        return datos
+
+
+# Instancia compartida por el proceso (CACHE_TAMANO=0 la desactiva)
+cache = CacheRecomendaciones(int(os.environ.get('CACHE_TAMANO', '4096')), compartida=abrir_compartida())
@@ -0,0 +1,111 @@
+"""
+Categorización de recomendaciones compartida por ambos backends
+La categoría y prioridad de cada regla están declaradas en regla/4 dentro de
+asistente_finanzas.pl; la tabla se construye una sola vez al arrancar y cada
+petición se reduce a búsquedas por id (o por texto) en un índice.
+El formato compacto de las respuestas envía solo [id, prioridad]; el
+diccionario id -> texto y categoría se sirve una vez por versión (/api/reglas).
+"""
+
+import metricas
+from reglas import cargar_reglas, PROLOG_FILE
+
+CATEGORIAS = ['ahorro', 'presupuesto', 'deuda', 'metas', 'seguro', 'educacion', 'general']
+
+
+class TablaReglas:
+    """Índice id/texto -> metadatos de las reglas de la base de conocimiento"""
+
+    def __init__(self, reglas):
+        self.reglas = {}
+        self.por_texto = {}
+        for regla in reglas:
+            # Una regla puede tener varias cláusulas; basta con la primera
+            self.reglas.setdefault(regla.id, regla)
+            self.por_texto.setdefault(regla.texto, regla.id)
+        # Entradas ya construidas para `categorizadas`
+        self._entradas = {
+            regla_id: (regla.categoria, {'text': regla.texto, 'priority': regla.prioridad})
+            for regla_id, regla in self.reglas.items()
+        }
+
+    @classmethod
+    def desde_archivo(cls, archivo=PROLOG_FILE):
+        return cls(cargar_reglas(archivo))
+
+    def ids(self, recomendaciones):
+        """Traduce textos de recomendaciones a ids (None si el texto no está en la tabla)"""
+        return [self.por_texto.get(texto) for texto in recomendaciones]
+
+    def textos(self, ids):
+        """Textos de las reglas, ordenados como los devuelve recomendaciones/2"""
+        return sorted({self.reglas[regla_id].texto for regla_id in ids})
+
+    def categorizar_ids(self, ids):
+        categorias = {categoria: [] for categoria in CATEGORIAS}
+        for regla_id in ids:
+            categoria, entrada = self._entradas[regla_id]
+            categorias.setdefault(categoria, []).append(entrada)
+        return categorias
+
+    def compactar(self, recomendaciones):
+        """Pares [id, prioridad] de las recomendaciones (textos), en el mismo orden"""
+        pares = []
+        for texto in recomendaciones:
+            regla_id = self.por_texto.get(texto)
+            if regla_id is not None:
+                pares.append([regla_id, self.reglas[regla_id].prioridad])
+        return pares
+
+    def diccionario(self, version=None):
+        """Textos, categoría y prioridad de cada regla, para resolver el formato compacto"""
+        return {
+            'version': version,
+            'categorias': CATEGORIAS,
+            'reglas': {
+                regla_id: {'text': regla.texto, 'category': regla.categoria, 'priority': regla.prioridad}
+                for regla_id, regla in self.reglas.items()
+            }
+        }
+
+    def categorizar(self, recomendaciones):
+        """Agrupa las recomendaciones (textos) por categoría, con su prioridad"""
+        categorias = {categoria: [] for categoria in CATEGORIAS}
+        for texto in recomendaciones:
+            regla_id = self.por_texto.get(texto)
+            if regla_id is None:
+                categorias['general'].append({'text': texto, 'priority': 'low'})
+                continue
+            categoria, entrada = self._entradas[regla_id]
+            categorias.setdefault(categoria, []).append(entrada)
+        return categorias
+
+
+tabla = TablaReglas.desde_archivo()
+metricas.inicializar_reglas(tabla.reglas)
+
+
+def categorizar_recomendaciones(recomendaciones, tabla_version=None):
+    """
+    Categoriza las recomendaciones según los metadatos declarados en regla/4
+    (los de `tabla_version` si la petición fijó una versión de la base)
+    """
+    tabla_reglas = tabla_version or tabla
+    with metricas.etapa('categorizacion'):
+        categorizadas = tabla_reglas.categorizar(recomendaciones)
+    metricas.contar_reglas(tabla_reglas.ids(recomendaciones))
+    return categorizadas
+
+
+def recomendaciones_compactas(recomendaciones, tabla_version=None):
+    """Formato compacto ([id, prioridad] por recomendación) en lugar de textos y categorías"""
+    tabla_reglas = tabla_version or tabla
+    with metricas.etapa('categorizacion'):
+        pares = tabla_reglas.compactar(recomendaciones)
+    metricas.contar_reglas([regla_id for regla_id, _ in pares])
+    return pares
+
+
+def recomendaciones_de_ids(ids, tabla_version=None):
+    """Textos de las reglas disparadas, como los devuelve recomendaciones/2"""
+    return (tabla_version or tabla).textos(ids)
@@ -0,0 +1,125 @@
+"""
+Recomendaciones por streaming (Server-Sent Events)
+recomendaciones/2 junta todo con findall/sort y el motor responde la lista
+completa de una vez. Para que la interfaz muestre algo cuanto antes, el
+flujo evalúa primero las reglas en Python (las condiciones compiladas de
+reglas.py, las mismas del motor vectorizado y de las sesiones) en orden de
+prioridad: alta, media y baja, y dentro de cada una por categoría. Cada regla
+que se dispara sale de inmediato como evento `recomendacion`.
+
+Después se consulta el motor (a través de la caché) y su resultado manda:
+si difiere de lo ya enviado, se emiten `retirada` y las recomendaciones que
+faltaban. El evento final `resumen` tiene la misma respuesta que
+/api/recomendaciones, así que el conjunto final no cambia.
+
+    event: recomendacion  data: {"id", "text", "category", "priority"}
+    event: retirada       data: {"id"}
+    event: resumen        data: {"success", "total", "recomendaciones", "categorizadas", "version_reglas", "corregidas"}
+    event: error          data: {"error", "estado"}
+"""
+
+import json
+import time
+
+import metricas
+from categorias import CATEGORIAS, categorizar_recomendaciones
+from reglas import evaluar_condicion
+from sesiones import indice_dependencias, ids_disparadas
+
+MIMETYPE_SSE = 'text/event-stream'
+# Sin esta cabecera nginx junta el flujo en su búfer y lo entrega al final
+CABECERAS_SSE = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+PRIORIDADES = ('high', 'medium', 'low')
+
+
+def evento_sse(nombre, datos):
+    """Un evento SSE con `datos` en JSON"""
+    return f'event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+def _rango(regla):
+    prioridad = PRIORIDADES.index(regla.prioridad) if regla.prioridad in PRIORIDADES else len(PRIORIDADES)
+    categoria = CATEGORIAS.index(regla.categoria) if regla.categoria in CATEGORIAS else len(CATEGORIAS)
+    return prioridad, categoria, regla.indice
+
+
+class OrdenDisparo:
+    """Cláusulas de cada regla en el orden en que se evalúan para el flujo"""
+
+    def __init__(self):
+        self._indice = (None, None)
+
+    def de(self, version):
+        version_id, orden = self._indice
+        if version_id != version.id:
+            clausulas, _ = indice_dependencias(version.reglas)
+            reglas = version.tabla.reglas
+            orden = [(regla_id, clausulas[regla_id])
+                     for regla_id in sorted(reglas, key=lambda regla_id: _rango(reglas[regla_id]))]
+            self._indice = (version.id, orden)
+        return orden
+
+
+orden_disparo = OrdenDisparo()
+
+
+def disparar(perfil, version):
+    """
+    Itera los ids de las reglas que dispara `perfil`, de mayor a menor
+    prioridad. Lanza ValueError si Prolog rechazaría el perfil.
+    """
+    for regla_id, clausulas in orden_disparo.de(version):
+        if any(all(evaluar_condicion(cond, perfil) for cond in condiciones) for condiciones in clausulas):
+            yield regla_id
+
+
+def _recomendacion(regla):
+    return {'id': regla.id, 'text': regla.texto, 'category': regla.categoria, 'priority': regla.prioridad}
+
+
+def previa(perfil, version, enviadas):
+    """
+    Eventos `recomendacion` de la evaluación en Python, a medida que se
+    disparan; agrega a `enviadas` los ids emitidos. Si Prolog rechazaría el
+    perfil se detiene sin error: el motor dará el error exacto.
+    """
+    reglas = version.tabla.reglas
+    inicio = time.perf_counter()
+    try:
+        for regla_id in disparar(perfil, version):
+            if not enviadas:
+                metricas.observar_etapa('flujo_primera_recomendacion', time.perf_counter() - inicio)
+            enviadas.append(regla_id)
+            yield evento_sse('recomendacion', _recomendacion(reglas[regla_id]))
+    except ValueError:
+        pass
+
+
+def cierre(recomendaciones, version, enviadas):
+    """
+    Concilia lo enviado con las recomendaciones (textos) del motor y termina
+    con el evento `resumen`
+    """
+    reglas = version.tabla.reglas
+    definitivas = ids_disparadas(recomendaciones, version.tabla)
+    retiradas = [regla_id for regla_id in enviadas if regla_id not in definitivas]
+    faltantes = sorted(definitivas.difference(enviadas), key=lambda regla_id: _rango(reglas[regla_id]))
+    for regla_id in retiradas:
+        yield evento_sse('retirada', {'id': regla_id})
+    for regla_id in faltantes:
+        yield evento_sse('recomendacion', _recomendacion(reglas[regla_id]))
+
+    yield evento_sse('resumen', {
+        'success': True,
+        'total': len(recomendaciones),
+        'recomendaciones': recomendaciones,
+        'categorizadas': categorizar_recomendaciones(recomendaciones, version.tabla),
+        'version_reglas': version.id,
+        'corregidas': len(retiradas) + len(faltantes)
+    })
+
+
+def evento_error(mensaje, estado):
+    """Evento `error` con el estado HTTP que tendría /api/recomendaciones"""
+    return evento_sse('error', {'error': mensaje, 'estado': estado})
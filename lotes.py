@@ -0,0 +1,157 @@
+"""
+Procesamiento por lotes de perfiles
+Lectura de la entrada (arreglo JSON o NDJSON), división en bloques y formato
+de salida NDJSON compartidos por ambos backends. La entrada NDJSON se lee de
+forma incremental para no mantener todo el portafolio en memoria; en
+servidor_async.py las líneas llegan como un iterable asíncrono a medida que
+se recibe el cuerpo (`leer_ndjson_async`, `en_bloques_async`).
+"""
+
+import json
+import os
+from itertools import islice
+
+from perfiles import validar_perfil
+
+# Perfiles evaluados por cada sesión del motor Prolog
+LOTE_TAMANO = int(os.environ.get('LOTE_TAMANO', '100'))
+
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+MIMETYPE_NDJSON = 'application/x-ndjson'
+
+
+class ErrorEntradaLote(ValueError):
+    """El cuerpo de la petición no es un lote reconocible"""
+
+
+def leer_perfiles(req):
+    """
+    Itera los perfiles del lote como tuplas (indice, perfil, error).
+    Acepta un arreglo JSON, un objeto {"perfiles": [...]} o NDJSON
+    (un perfil por línea). `error` es None si el perfil es válido.
+    """
+    if req.mimetype in TIPOS_NDJSON:
+        return _leer_ndjson(req.stream)
+    return _perfiles_json(req.get_json(silent=True))
+
+
+def es_ndjson(tipo):
+    """Si un Content-Type (con o sin parámetros) es NDJSON"""
+    return (tipo or '').split(';', 1)[0].strip().lower() in TIPOS_NDJSON
+
+
+def perfiles_cuerpo(cuerpo):
+    """Como leer_perfiles() para un cuerpo JSON ya leído (bytes), en servidor_async.py"""
+    try:
+        data = json.loads(cuerpo) if cuerpo else None
+    except ValueError:
+        data = None
+    return _perfiles_json(data)
+
+
+def _perfiles_json(data):
+    if isinstance(data, dict):
+        data = data.get('perfiles')
+    if not isinstance(data, list):
+        raise ErrorEntradaLote('Se esperaba un arreglo JSON de perfiles, {"perfiles": [...]} o NDJSON')
+    return ((indice, perfil, validar_perfil(perfil)) for indice, perfil in enumerate(data))
+
+
+def _perfil_linea(linea):
+    try:
+        perfil = json.loads(linea)
+        return perfil, validar_perfil(perfil)
+    except ValueError as e:
+        return None, f'JSON inválido: {e}'
+
+
+def _leer_ndjson(stream):
+    indice = 0
+    for linea in stream:
+        linea = linea.strip()
+        if not linea:
+            continue
+        yield (indice, *_perfil_linea(linea))
+        indice += 1
+
+
+async def leer_ndjson_async(lineas):
+    """Como la lectura NDJSON de leer_perfiles() para un iterable asíncrono de líneas"""
+    indice = 0
+    async for linea in lineas:
+        linea = linea.strip()
+        if not linea:
+            continue
+        yield (indice, *_perfil_linea(linea))
+        indice += 1
+
+
+def en_bloques(iterable, tamano=LOTE_TAMANO):
+    """Agrupa un iterable en listas de hasta `tamano` elementos"""
+    iterador = iter(iterable)
+    while True:
+        bloque = list(islice(iterador, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+async def en_bloques_async(iterable, tamano=LOTE_TAMANO):
+    """Como en_bloques() para un iterable asíncrono o uno normal"""
+    if not hasattr(iterable, '__aiter__'):
+        for bloque in en_bloques(iterable, tamano):
+            yield bloque
+        return
+    bloque = []
+    async for elemento in iterable:
+        bloque.append(elemento)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def resultado_lote(indice, perfil, recomendaciones, categorizadas):
+    resultado = {
+        'indice': indice,
+        'success': True,
+        'total': len(recomendaciones),
+        'recomendaciones': recomendaciones,
+        'categorizadas': categorizadas
+    }
+    if isinstance(perfil, dict) and 'id' in perfil:
+        resultado['id'] = perfil['id']
+    return resultado
+
+
+def error_lote(indice, perfil, error):
+    resultado = {
+        'indice': indice,
+        'success': False,
+        'error': error
+    }
+    if isinstance(perfil, dict) and 'id' in perfil:
+        resultado['id'] = perfil['id']
+    return resultado
+
+
+def linea_ndjson(obj):
+    return json.dumps(obj, ensure_ascii=False) + '\n'
+
+
+def lineas_bloque(bloque, evaluar, categorizar):
+    """
+    Evalúa los perfiles válidos de un bloque con `evaluar(perfiles)`, que
+    devuelve una tupla (recomendaciones, error) por perfil, y genera las
+    líneas NDJSON en el orden de entrada.
+    """
+    validos = [perfil for _, perfil, error in bloque if not error]
+    resultados = iter(evaluar(validos))
+    for indice, perfil, error in bloque:
+        if not error:
+            recomendaciones, error = next(resultados)
+        if error:
+            yield linea_ndjson(error_lote(indice, perfil, error))
+            continue
+        yield linea_ndjson(resultado_lote(indice, perfil, recomendaciones, categorizar(recomendaciones)))
@@ -0,0 +1,72 @@
+/*  medir_reglas.pl
+    SWI-Prolog (7.x/8.x/9.x)
+    Compara recomendaciones_ids/2 (una pasada) con
+    recomendaciones_ids_referencia/2 (cláusula por cláusula) sobre los
+    perfiles JSON de la entrada estándar, uno por línea. Escribe un objeto
+    JSON con inferencias y tiempo de CPU por perfil de cada evaluación y los
+    perfiles en los que difieren. Lo usa `python benchmark.py --micro --micro-prolog`.
+
+    Uso: swipl -q medir_reglas.pl -- asistente_finanzas.pl [repeticiones] < perfiles.ndjson
+*/
+
+:- encoding(utf8).
+:- use_module(library(http/json)).
+:- use_module(protocolo_json).
+:- initialization(main, main).
+
+main :-
+    current_prolog_flag(argv, Argv),
+    (   Argv = [Archivo, Texto|_]
+    ->  atom_number(Texto, Repeticiones)
+    ;   Argv = [Archivo|_], Repeticiones = 5
+    ),
+    use_module(Archivo),
+    set_stream(user_input, encoding(utf8)),
+    leer_perfiles(Perfiles),
+    length(Perfiles, N),
+    medir(asistente_finanzas:recomendaciones_ids, Perfiles, Repeticiones, UnaPasada),
+    medir(asistente_finanzas:recomendaciones_ids_referencia, Perfiles, Repeticiones, Referencia),
+    findall(I, ( nth0(I, Perfiles, Perfil),
+                 \+ mismas_reglas(Perfil) ),
+            Diferencias),
+    json_write_dict(user_output,
+                    _{perfiles: N, repeticiones: Repeticiones,
+                      una_pasada: UnaPasada, referencia: Referencia,
+                      diferencias: Diferencias},
+                    [width(0)]),
+    nl(user_output).
+
+leer_perfiles(Perfiles) :-
+    json_read_dict(user_input, Json, [value_string_as(atom), end_of_file(end_of_file)]),
+    (   Json == end_of_file
+    ->  Perfiles = []
+    ;   perfil_json(Json, Perfil),
+        Perfiles = [Perfil|Resto],
+        leer_perfiles(Resto)
+    ).
+
+%% Inferencias y µs de CPU por perfil; los perfiles con error cuentan igual
+medir(Evaluar, Perfiles, Repeticiones, _{inferencias_por_perfil: Inferencias,
+                                         cpu_us_por_perfil: Us}) :-
+    length(Perfiles, N),
+    statistics(inferences, I0),
+    statistics(cputime, T0),
+    forall(between(1, Repeticiones, _),
+           forall(member(Perfil, Perfiles),
+                  catch(ignore(call(Evaluar, Perfil, _)), _, true))),
+    statistics(cputime, T1),
+    statistics(inferences, I1),
+    Total is max(1, N * Repeticiones),
+    Inferencias is (I1 - I0) / Total,
+    Us is (T1 - T0) * 1.0e6 / Total.
+
+%% Mismos ids, o error en ambas evaluaciones
+mismas_reglas(Perfil) :-
+    resultado(asistente_finanzas:recomendaciones_ids, Perfil, A),
+    resultado(asistente_finanzas:recomendaciones_ids_referencia, Perfil, B),
+    A = B.
+
+resultado(Evaluar, Perfil, Resultado) :-
+    catch(( call(Evaluar, Perfil, Ids) -> Resultado = ids(Ids) ; Resultado = falla ),
+          _,
+          Resultado = error).
@@ -0,0 +1,262 @@
+"""
+Métricas en formato de texto de Prometheus para /api/metrics
+Histogramas de latencia por etapa, contadores de errores y de reglas
+disparadas, y medidores leídos en el momento de exponer (estado del pool).
+Registrar una observación cuesta una búsqueda binaria y un lock, así que la
+instrumentación puede quedar activa en producción (METRICAS=0 la apaga).
+En una petición trazada (trazas.py) cada etapa va además a su línea de tiempo.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import trazas
+
+METRICAS = os.environ.get('METRICAS', '1') != '0'
+PREFIJO = 'sistema_experto_'
+MIMETYPE_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites en segundos: de decenas de microsegundos (categorizar) al timeout de Prolog
+BUCKETS_SEGUNDOS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    pares = []
+    for nombre, valor in zip(nombres, valores):
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monótono con etiquetas"""
+
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores, cantidad=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def inicializar(self, *valores):
+        """Crea la serie en 0 para que aparezca antes del primer evento"""
+        with self._lock:
+            self._valores.setdefault(valores, 0)
+
+    def lineas(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for clave, valor in valores:
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+class Histograma:
+    """Histograma acumulativo con etiquetas (buckets fijos)"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores):
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    def lineas(self):
+        with self._lock:
+            series = sorted((clave, list(cuentas), suma) for clave, (cuentas, suma) in self._series.items())
+        nombres = self.etiquetas + ('le',)
+        for clave, cuentas, suma in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float('inf'),), cuentas):
+                acumulado += cuenta
+                yield f'{self.nombre}_bucket{_etiquetas(nombres, clave + (_numero(limite),))} {acumulado}'
+            yield f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(round(suma, 9))}'
+            yield f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}'
+
+
+class Medidor:
+    """Valor instantáneo calculado al exponer: `leer()` devuelve {valores_etiquetas: valor}"""
+
+    def __init__(self, nombre, ayuda, leer, etiquetas=(), tipo='gauge'):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.tipo = tipo
+        self._leer = leer
+
+    def lineas(self):
+        try:
+            valores = self._leer() or {}
+        except Exception:
+            return
+        for clave, valor in sorted(valores.items()):
+            if valor is None:
+                continue
+            clave = clave if isinstance(clave, tuple) else (clave,) if self.etiquetas else ()
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        """Agrega la métrica; si ya existe una con ese nombre se reemplaza"""
+        with self._lock:
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exponer(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            lineas.extend(metrica.lineas())
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+etapas = registro.registrar(Histograma(
+    'etapa_segundos', 'Duración de cada etapa de una petición', ('etapa',)))
+peticiones = registro.registrar(Contador(
+    'peticiones_total', 'Peticiones atendidas por endpoint y código HTTP', ('endpoint', 'codigo')))
+errores = registro.registrar(Contador(
+    'errores_total', 'Errores del motor por tipo (timeout, prolog, pool, cola_llena...)', ('tipo',)))
+reglas_disparadas = registro.registrar(Contador(
+    'regla_disparada_total', 'Veces que cada regla recommend/2 aparece en una respuesta', ('regla',)))
+
+
+@contextmanager
+def etapa(nombre):
+    """Mide el bloque `with` como una observación de la etapa `nombre`"""
+    traza = trazas.actual()
+    if not METRICAS and traza is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        if METRICAS:
+            etapas.observar(duracion, nombre)
+        if traza is not None:
+            traza.etapa(nombre, inicio, duracion)
+
+
+def observar_etapa(nombre, segundos):
+    if METRICAS:
+        etapas.observar(segundos, nombre)
+    traza = trazas.actual()
+    if traza is not None:
+        traza.etapa(nombre, time.perf_counter() - segundos, segundos)
+
+
+def contar_error(tipo):
+    if METRICAS:
+        errores.inc(tipo)
+
+
+def contar_peticion(endpoint, codigo):
+    if METRICAS:
+        peticiones.inc(endpoint, codigo)
+
+
+def contar_reglas(ids):
+    """Incrementa el contador de cada regla presente en una respuesta"""
+    if not METRICAS:
+        return
+    for regla_id in ids:
+        reglas_disparadas.inc(regla_id or 'desconocida')
+
+
+def inicializar_reglas(ids):
+    for regla_id in ids:
+        reglas_disparadas.inicializar(regla_id)
+
+
+def registrar_medidor(nombre, ayuda, leer, etiquetas=(), tipo='gauge'):
+    return registro.registrar(Medidor(nombre, ayuda, leer, etiquetas, tipo))
+
+
+def registrar_pool(obtener_estado):
+    """
+    Medidores de utilización y cola a partir de un `estado()` de pool
+    (PoolSwipl, PoolAsync o GestorMotores); `obtener_estado` devuelve None
+    mientras el pool no exista.
+    """
+    def campos(*nombres):
+        def leer():
+            estado = obtener_estado() or {}
+            return {nombre: estado[nombre] for nombre in nombres if nombre in estado}
+        return leer
+
+    def campo(*nombres):
+        # El primero de `nombres` que exista en el estado (cada pool usa el suyo)
+        def leer():
+            estado = obtener_estado() or {}
+            return {(): next((estado[n] for n in nombres if n in estado), None)}
+        return leer
+
+    registrar_medidor('pool_trabajadores', 'Trabajadores del motor Prolog por estado',
+                      campos('tamano', 'libres', 'vivos', 'motores'), ('estado',))
+    registrar_medidor('pool_cola', 'Consultas esperando un trabajador libre',
+                      campo('en_espera', 'pendientes'))
+    registrar_medidor('pool_reciclados_total', 'Trabajadores reiniciados por caída, timeout o límite de peticiones',
+                      campo('reciclados'), tipo='counter')
+
+
+def registrar_cache(cache):
+    registrar_medidor('cache_eventos_total', 'Aciertos, fallos y desalojos de la caché de recomendaciones',
+                      lambda: {k: v for k, v in cache.estadisticas().items()
+                               if k in ('aciertos', 'fallos', 'omitidos', 'desalojos', 'invalidaciones')},
+                      ('evento',), tipo='counter')
+    registrar_medidor('cache_entradas', 'Entradas en la caché de recomendaciones',
+                      lambda: {(): cache.estadisticas()['entradas']})
+    if cache.compartida is not None:
+        compartida = cache.compartida
+        registrar_medidor('cache_compartida_eventos_total',
+                          'Aciertos, fallos, escrituras, desalojos y errores de este proceso en la caché compartida',
+                          lambda: {k: getattr(compartida, k)
+                                   for k in ('aciertos', 'fallos', 'escrituras', 'desalojos', 'errores')},
+                          ('evento',), tipo='counter')
+
+
+def registrar_admision(control):
+    registrar_medidor('admision_en_curso', 'Peticiones admitidas por el control de admisión que siguen en curso',
+                      lambda: {(): control.en_curso})
@@ -0,0 +1,363 @@
+"""
+Motor de reglas vectorizado (NumPy)
+Compila las cláusulas recommend/2 de asistente_finanzas.pl (ver reglas.py) en
+un evaluador columnar: para N perfiles produce en una sola pasada una matriz
+booleana N×R con las reglas disparadas. Pensado para puntuación masiva;
+Prolog sigue siendo la referencia (ver verificar_contra_prolog).
+Verificar contra SWI-Prolog: python motor_vectorizado.py --verificar 2000
+"""
+
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from reglas import cargar_reglas, atomo_prolog, es_numero, PORCENTAJES, BOOLEANAS, COMPARADORES, PROLOG_FILE
+
+_PLAZOS = ('meta_corto', 'meta_mediano', 'meta_largo')
+
+
+class MotorVectorizado:
+    """Evaluador columnar de un conjunto de reglas compiladas"""
+
+    def __init__(self, reglas):
+        self.reglas = reglas
+        self.textos = [regla.texto for regla in reglas]
+
+        numericos, atomicos = set(), set()
+        for regla in reglas:
+            for cond in regla.condiciones:
+                if cond.caracteristica in PORCENTAJES:
+                    numericos.update(PORCENTAJES[cond.caracteristica])
+                elif cond.caracteristica == 'gastos_superan_ingresos':
+                    numericos.update(BOOLEANAS['gastos_superan_ingresos'])
+                elif cond.caracteristica in BOOLEANAS:
+                    continue
+                elif cond.operador in COMPARADORES:
+                    numericos.add(cond.caracteristica)
+                else:
+                    atomicos.add(cond.caracteristica)
+        self.campos_numericos = sorted(numericos)
+        self.campos_atomicos = sorted(atomicos)
+        self.usa_metas = any(
+            cond.caracteristica in BOOLEANAS and cond.caracteristica != 'gastos_superan_ingresos'
+            for regla in reglas for cond in regla.condiciones
+        )
+
+        # Mismo orden de salida que sort/2 en recomendaciones/2
+        self._orden = np.array(sorted(range(len(reglas)), key=lambda i: self.textos[i]), dtype=np.intp)
+        self._textos_ordenados = [self.textos[i] for i in self._orden]
+        # Y el de recomendaciones_ids/2 (sort/2 sobre los ids)
+        self._orden_ids = np.array(sorted(range(len(reglas)), key=lambda i: reglas[i].id), dtype=np.intp)
+        self._ids_ordenados = [reglas[i].id for i in self._orden_ids]
+
+    @classmethod
+    def desde_archivo(cls, archivo=PROLOG_FILE):
+        return cls(cargar_reglas(archivo))
+
+    # --------- Perfiles -> columnas ---------
+
+    def columnas(self, perfiles):
+        """
+        Convierte una lista de perfiles (dicts) en columnas NumPy.
+        Devuelve (columnas, errores, invalidos): `errores` asocia el índice de
+        cada perfil que Prolog rechaza de entrada (no es un objeto o tiene una
+        meta sin "tipo" o "meses") con su mensaje, e `invalidos` da por campo
+        las máscaras 'faltante' y 'tipo' (presente pero no numérico, o fuera
+        del rango de float64). Esos perfiles solo fallan si una regla llega a
+        leer el campo (ver `matriz`).
+        """
+        n = len(perfiles)
+        errores = {}
+        columnas = {}
+        invalidos = {}
+
+        for i, perfil in enumerate(perfiles):
+            if not isinstance(perfil, dict):
+                errores[i] = 'El perfil debe ser un objeto JSON'
+
+        for campo in self.campos_numericos:
+            valores = []
+            faltante = np.zeros(n, dtype=bool)
+            tipo = np.zeros(n, dtype=bool)
+            for i, perfil in enumerate(perfiles):
+                v = perfil.get(campo, 0) if i not in errores else 0
+                if i not in errores and campo not in perfil:
+                    faltante[i] = True
+                elif not es_numero(v):
+                    # También un entero que no cabe en float64: falla solo ese perfil
+                    tipo[i] = True
+                    v = 0
+                valores.append(v)
+            columnas[campo] = np.array(valores, dtype=np.float64)
+            invalidos[campo] = {'faltante': faltante, 'tipo': tipo}
+
+        for campo in self.campos_atomicos:
+            valores = []
+            faltante = np.zeros(n, dtype=bool)
+            for i, perfil in enumerate(perfiles):
+                if i in errores:
+                    valores.append(None)
+                elif campo not in perfil:
+                    faltante[i] = True
+                    valores.append(None)
+                else:
+                    valores.append(atomo_prolog(perfil[campo]))
+            columna = np.empty(n, dtype=object)
+            columna[:] = valores
+            columnas[campo] = columna
+            invalidos[campo] = {'faltante': faltante}
+
+        if self.usa_metas:
+            columnas.update(self._columnas_metas(perfiles, errores, invalidos))
+
+        return columnas, errores, invalidos
+
+    def _columnas_metas(self, perfiles, errores, invalidos):
+        n = len(perfiles)
+        vacias = np.zeros(n, dtype=bool)
+        longitudes = np.zeros(n, dtype=np.intp)
+        faltante = np.zeros(n, dtype=bool)
+        tipo = np.zeros(n, dtype=bool)
+        meses = []
+        for i, perfil in enumerate(perfiles):
+            if i in errores:
+                continue
+            if 'metas' not in perfil:
+                faltante[i] = True
+                continue
+            metas = perfil['metas']
+            if not isinstance(metas, list):
+                continue
+            vacias[i] = metas == []
+            # Las metas que no son objetos no son meta/2: member/2 no las encuentra
+            metas = [m for m in metas if isinstance(m, dict)]
+            if any('tipo' not in m or 'meses' not in m for m in metas):
+                errores[i] = 'Cada meta debe tener "tipo" y "meses"'
+                continue
+            plazos = [m['meses'] for m in metas]
+            if not all(es_numero(m) for m in plazos):
+                tipo[i] = True
+                continue
+            longitudes[i] = len(plazos)
+            meses.extend(plazos)
+        invalidos['metas'] = {'faltante': faltante, 'tipo': tipo}
+
+        # member/2 + plazo_tipo/2: existe al menos una meta de cada plazo.
+        # plazo_tipo(M, largo) no llega a los cortes de las otras cláusulas
+        # (sus cabezas no unifican), así que es cierto para cualquier meta.
+        meses = np.array(meses, dtype=np.float64)
+        duenos = np.repeat(np.arange(n), longitudes)
+        corto = meses < 12
+        mediano = (meses >= 12) & (meses <= 60)
+        largo = np.ones(len(meses), dtype=bool)
+        columnas = {'metas_vacias': vacias}
+        for nombre, mascara in zip(_PLAZOS, (corto, mediano, largo)):
+            columna = np.zeros(n, dtype=bool)
+            columna[duenos[mascara]] = True
+            columnas[nombre] = columna
+        return columnas
+
+    def _rechazos(self, cond, columnas, invalidos):
+        """Pares (máscara, mensaje) de los perfiles que fallan al evaluar `cond`"""
+        def de(campo, tipo=True):
+            mascaras = invalidos.get(campo, {})
+            if 'faltante' in mascaras:
+                yield mascaras['faltante'], f'Campo faltante: {campo}'
+            if tipo is not False and 'tipo' in mascaras:
+                mascara = mascaras['tipo'] if tipo is True else mascaras['tipo'] & tipo
+                yield mascara, f'Campo numérico inválido: {campo}'
+
+        nombre = cond.caracteristica
+        if nombre in PORCENTAJES:
+            # safe_div/3: con total 0 la parte no se evalúa
+            parte, total = PORCENTAJES[nombre]
+            yield from de(total)
+            yield from de(parte, columnas[total] != 0)
+        elif nombre in BOOLEANAS:
+            for campo in BOOLEANAS[nombre]:
+                yield from de(campo)
+        elif cond.operador == '\\+':
+            yield from de(nombre)
+            valores = columnas[nombre]
+            booleano = _igual_atomo(valores, 'true') | _igual_atomo(valores, 'false')
+            yield ~booleano & ~invalidos[nombre]['faltante'], f'Valor no booleano: {nombre}'
+        else:
+            yield from de(nombre)
+
+    # --------- Evaluación ---------
+
+    def matriz(self, columnas, invalidos=None, errores=None):
+        """
+        Evalúa todas las reglas sobre columnas ya preparadas (ver `columnas`).
+        Las columnas atómicas pueden ser arreglos de átomos o de booleanos.
+        Devuelve una matriz booleana N×R (R = número de reglas, en orden del archivo).
+        Con `invalidos`, cada condición que un perfil alcanza (las anteriores
+        de su cláusula se cumplen, como en Prolog) y que lee un campo faltante
+        o inválido agrega el perfil a `errores`.
+        """
+        n = len(next(iter(columnas.values()))) if columnas else 0
+        caracteristicas = {}
+        condiciones = {}
+
+        def caracteristica(nombre):
+            if nombre not in caracteristicas:
+                if nombre in PORCENTAJES:
+                    parte, total = (columnas[c] for c in PORCENTAJES[nombre])
+                    r = np.zeros(n, dtype=np.float64)
+                    np.divide(parte, total, out=r, where=total != 0)
+                    caracteristicas[nombre] = r * 100
+                elif nombre == 'gastos_superan_ingresos':
+                    caracteristicas[nombre] = columnas['gasto_total'] > columnas['ingreso']
+                else:
+                    caracteristicas[nombre] = columnas[nombre]
+            return caracteristicas[nombre]
+
+        def evaluar(cond):
+            if cond not in condiciones:
+                valores = caracteristica(cond.caracteristica)
+                if cond.operador in COMPARADORES:
+                    resultado = COMPARADORES[cond.operador](valores, cond.valor)
+                elif cond.caracteristica in BOOLEANAS:
+                    resultado = valores if cond.valor is True else ~valores
+                elif cond.operador == '\\+':
+                    resultado = ~_igual_atomo(valores, 'true')
+                else:
+                    resultado = _igual_atomo(valores, cond.valor)
+                condiciones[cond] = np.asarray(resultado, dtype=bool)
+            return condiciones[cond]
+
+        disparos = np.ones((n, len(self.reglas)), dtype=bool)
+        for regla in self.reglas:
+            for cond in regla.condiciones:
+                if invalidos is not None:
+                    alcanzada = disparos[:, regla.indice]
+                    for mascara, mensaje in self._rechazos(cond, columnas, invalidos):
+                        for i in np.flatnonzero(alcanzada & mascara):
+                            errores.setdefault(int(i), mensaje)
+                disparos[:, regla.indice] &= evaluar(cond)
+        return disparos
+
+    def recomendaciones(self, disparos):
+        """Listas de recomendaciones por perfil, ordenadas y sin duplicados como recomendaciones/2"""
+        ordenada = disparos[:, self._orden]
+        textos = self._textos_ordenados
+        return [list(dict.fromkeys(textos[j] for j in np.flatnonzero(fila))) for fila in ordenada]
+
+    def ids(self, disparos):
+        """Ids de las reglas disparadas por perfil, como recomendaciones_ids/2"""
+        ordenada = disparos[:, self._orden_ids]
+        ids = self._ids_ordenados
+        return [list(dict.fromkeys(ids[j] for j in np.flatnonzero(fila))) for fila in ordenada]
+
+    def evaluar_ids(self, perfiles):
+        """Como evaluar_bloque, pero con los ids de las reglas en lugar de los textos"""
+        if not perfiles:
+            return []
+        columnas, errores, invalidos = self.columnas(perfiles)
+        ids = self.ids(self.matriz(columnas, invalidos, errores))
+        return [(None, errores[i]) if i in errores else (fila, None) for i, fila in enumerate(ids)]
+
+    def evaluar_bloque(self, perfiles):
+        """Devuelve una tupla (recomendaciones, error) por perfil, en el mismo orden"""
+        if not perfiles:
+            return []
+        columnas, errores, invalidos = self.columnas(perfiles)
+        recomendaciones = self.recomendaciones(self.matriz(columnas, invalidos, errores))
+        return [
+            (None, errores[i]) if i in errores else (recs, None)
+            for i, recs in enumerate(recomendaciones)
+        ]
+
+
+def _igual_atomo(columna, atomo):
+    if columna.dtype == bool:
+        if atomo == 'true':
+            return columna
+        if atomo == 'false':
+            return ~columna
+        return np.zeros(len(columna), dtype=bool)
+    return columna == atomo
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def obtener_motor():
+    """Compila las reglas una sola vez y reutiliza el motor"""
+    global _motor
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('NumPy no está instalado: el motor vectorizado no está disponible')
+    if _motor is None:
+        with _motor_lock:
+            if _motor is None:
+                _motor = MotorVectorizado.desde_archivo()
+    return _motor
+
+
+def verificar_contra_prolog(motor, perfiles, consultar):
+    """
+    Compara el motor con la referencia Prolog. `consultar(perfil)` debe
+    devolver la lista de recomendaciones de recomendaciones/2.
+    Devuelve la lista de discrepancias encontradas.
+    """
+    discrepancias = []
+    for indice, (obtenido, error) in enumerate(motor.evaluar_bloque(perfiles)):
+        try:
+            esperado = consultar(perfiles[indice])
+        except Exception as e:
+            esperado = None
+            if error is None:
+                discrepancias.append({'indice': indice, 'error_prolog': str(e)})
+            continue
+        if error is not None or obtenido != esperado:
+            discrepancias.append({
+                'indice': indice,
+                'perfil': perfiles[indice],
+                'esperado': esperado,
+                'obtenido': obtenido if error is None else error
+            })
+    return discrepancias
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import time
+    from arranque import get_swipl_cmd
+    from perfiles import perfiles_aleatorios
+    from categorias import recomendaciones_de_ids
+    from pool_swipl import PoolSwipl
+
+    parser = argparse.ArgumentParser(description='Motor de reglas vectorizado')
+    parser.add_argument('--verificar', type=int, metavar='N', default=1000,
+                        help='número de perfiles sintéticos a comparar con SWI-Prolog')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    motor = obtener_motor()
+    print(f"✓ {len(motor.reglas)} reglas compiladas desde {PROLOG_FILE}")
+    perfiles = perfiles_aleatorios(args.verificar, args.semilla)
+
+    inicio = time.perf_counter()
+    motor.evaluar_bloque(perfiles)
+    print(f"Motor vectorizado: {len(perfiles)} perfiles en {time.perf_counter() - inicio:.4f}s")
+
+    pool = PoolSwipl(get_swipl_cmd(), PROLOG_FILE, tamano=1)
+    try:
+        discrepancias = verificar_contra_prolog(
+            motor, perfiles, lambda p: recomendaciones_de_ids(pool.consultar(p))
+        )
+    finally:
+        pool.cerrar()
+
+    if discrepancias:
+        print(f"✗ {len(discrepancias)} discrepancias con Prolog; primera:")
+        print(json.dumps(discrepancias[0], indent=2, ensure_ascii=False))
+        raise SystemExit(1)
+    print(f"✓ Resultados idénticos a recomendaciones/2 en {len(perfiles)} perfiles")
@@ -0,0 +1,509 @@
+"""
+Motores de evaluación intercambiables y elección automática del más rápido
+Todos los motores cumplen la misma interfaz (`Motor`): reciben perfiles
+(dicts) y devuelven los ids de las reglas disparadas, como
+recomendaciones_ids/2. Implementaciones:
+    pyswip       SWI-Prolog embebido en procesos trabajadores (motores_pyswip.py)
+    subproceso   pool de procesos `swipl` persistentes (pool_swipl.py)
+    vectorizado  motor nativo NumPy compilado de las reglas (motor_vectorizado.py)
+servidor_async.py usa los mismos motores, con MotorAsync (pool_async.py) en
+lugar de `subproceso`; los motores síncronos se esperan en un hilo
+(`consultar_async`) para no bloquear el bucle de eventos.
+
+Al arrancar, SelectorMotor construye cada motor disponible, lo pasa por una
+prueba de conformidad (el perfil de ejemplo y perfiles sintéticos, con
+campos opcionales omitidos y metas que no son objetos, deben dar los mismos
+ids que Prolog, la referencia; sin ningún motor Prolog disponible la
+referencia es el evaluador de reglas.py) y un benchmark corto, y se queda
+con el más rápido de los conformes; los demás se cierran. Las versiones
+nuevas de la base (recarga en caliente) reutilizan el tipo elegido.
+
+MOTOR fija el motor (pyswip, subproceso o vectorizado) en lugar de elegirlo;
+MOTOR_MUESTRAS y MOTOR_RONDAS ajustan el tamaño de la prueba.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import metricas
+import trazas
+from arranque import get_swipl_cmd
+from perfiles import EJEMPLO_PERFIL, perfiles_muestra
+from pool_async import PoolAsync
+from reglas import evaluar_reglas
+from pool_swipl import (
+    PoolSwipl, TrabajadorSwipl, ErrorPool, ErrorProlog, TimeoutConsulta, MARGEN_LIMITE, WORKER_FILE,
+    codificar_peticion, decodificar_respuesta, ids_respuesta, resultados_lote
+)
+try:
+    import pyswip
+    from motores_pyswip import GestorMotores, ColaLlena
+    PYSWIP_AVAILABLE = True
+except Exception:
+    GestorMotores = ColaLlena = None
+    PYSWIP_AVAILABLE = False
+
+MOTOR = os.environ.get('MOTOR', 'auto')
+MOTOR_MUESTRAS = int(os.environ.get('MOTOR_MUESTRAS', '20'))
+MOTOR_RONDAS = int(os.environ.get('MOTOR_RONDAS', '3'))
+PROLOG_TIMEOUT = float(os.environ.get('SWIPL_TIMEOUT', '15'))
+
+# Pool de trabajadores SWI-Prolog (SWIPL_POOL_SIZE=0 vuelve a un proceso por consulta)
+POOL_TAMANO = int(os.environ.get('SWIPL_POOL_SIZE', '4'))
+POOL_MAX_PETICIONES = int(os.environ.get('SWIPL_POOL_MAX_PETICIONES', '1000'))
+# Motores pyswip: cada uno en su propio proceso, con una cola acotada de consultas
+PYSWIP_MOTORES = int(os.environ.get('PYSWIP_MOTORES', str(os.cpu_count() or 2)))
+PYSWIP_COLA = int(os.environ.get('PYSWIP_COLA', '64'))
+
+
+class MotorOcupado(ErrorPool):
+    """El motor rechazó la consulta porque su cola está llena"""
+
+
+class Motor:
+    """
+    Interfaz común. `consultar` devuelve la lista de ids o lanza
+    TimeoutConsulta, ErrorProlog (perfil rechazado) o ErrorPool;
+    `consultar_lote` devuelve una tupla (ids, error) por perfil. Sus
+    versiones `_async` son las que usa servidor_async.py.
+    """
+
+    nombre = None
+    # Los motores Prolog son la referencia de la prueba de conformidad
+    prolog = True
+
+    def consultar(self, perfil, timeout=None):
+        raise NotImplementedError
+
+    def consultar_lote(self, perfiles, timeout=None):
+        resultados = []
+        for perfil in perfiles:
+            try:
+                resultados.append((self.consultar(perfil, timeout), None))
+            except ErrorProlog as e:
+                resultados.append((None, f'Error ejecutando Prolog: {e}'))
+        return resultados
+
+    async def consultar_async(self, perfil, timeout=None):
+        # Un motor síncrono espera en un hilo, fuera del bucle de eventos
+        return await asyncio.to_thread(self.consultar, perfil, timeout)
+
+    async def consultar_lote_async(self, perfiles, timeout=None):
+        return await asyncio.to_thread(self.consultar_lote, perfiles, timeout)
+
+    def estado(self):
+        return {}
+
+    def cerrar(self):
+        pass
+
+
+def atomo_json(peticion):
+    """
+    Serializa la petición como JSON dentro de un átomo Prolog entre comillas.
+    Solo se escapan la barra invertida y la comilla simple, así que ningún
+    valor del perfil puede romper la consulta.
+    """
+    peticion = trazas.con_perfilado(peticion)
+    with metricas.etapa('serializacion'):
+        texto = json.dumps(peticion, separators=(',', ':'))
+        return "'" + texto.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+class MotorPyswip(Motor):
+    """SWI-Prolog embebido con pyswip, un proceso por motor"""
+
+    nombre = 'pyswip'
+
+    def __init__(self, version, motores=PYSWIP_MOTORES, profundidad=PYSWIP_COLA, timeout=PROLOG_TIMEOUT):
+        if not PYSWIP_AVAILABLE:
+            raise RuntimeError('pyswip no está instalado')
+        self.timeout = timeout
+        self.gestor = GestorMotores(version.artefacto.ruta, motores=motores, profundidad=profundidad, timeout=timeout)
+
+    def intercambiar(self, peticion, timeout=None):
+        """
+        Envía una petición de protocolo_json.pl y devuelve la respuesta
+        decodificada. Prolog recibe `timeout` como límite propio y abandona
+        la consulta al vencer; la espera en Python añade un margen.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        consulta = f"atender_json_texto({atomo_json(dict(peticion, limite=round(timeout, 3)))}, Respuesta)"
+        try:
+            with metricas.etapa('consulta'):
+                resultado = self.gestor.consultar(consulta, timeout + MARGEN_LIMITE)
+        except ColaLlena as e:
+            metricas.contar_error('cola_llena')
+            raise MotorOcupado(str(e))
+        except FutureTimeoutError:
+            metricas.contar_error('timeout')
+            raise TimeoutConsulta('La consulta Prolog superó el plazo de la petición')
+        except BrokenProcessPool as e:
+            # GestorMotores ya reemplazó el pool: solo falla esta consulta
+            metricas.contar_error('proceso_caido')
+            raise ErrorPool(f'El proceso pyswip terminó inesperadamente: {e}')
+        except Exception as e:
+            metricas.contar_error('prolog')
+            raise ErrorPool(str(e))
+        if not resultado:
+            raise ErrorPool('Prolog no devolvió respuesta')
+        return decodificar_respuesta(resultado[0]['Respuesta'])
+
+    def consultar(self, perfil, timeout=None):
+        return ids_respuesta(self.intercambiar({'perfil': perfil}, timeout))
+
+    def consultar_lote(self, perfiles, timeout=None):
+        if not perfiles:
+            return []
+        return resultados_lote(self.intercambiar({'perfiles': perfiles}, timeout))
+
+    def estado(self):
+        return self.gestor.estado()
+
+    def cerrar(self):
+        self.gestor.cerrar()
+
+
+class MotorSubproceso(Motor):
+    """Procesos `swipl` con el protocolo JSON: un pool caliente o, sin pool, uno por consulta"""
+
+    nombre = 'subproceso'
+
+    def __init__(self, version, tamano=POOL_TAMANO, max_peticiones=POOL_MAX_PETICIONES, timeout=PROLOG_TIMEOUT):
+        self.ruta = version.artefacto.ruta
+        self.timeout = timeout
+        self.pool = None
+        if tamano > 0:
+            self.pool = PoolSwipl(get_swipl_cmd(), self.ruta, tamano=tamano,
+                                  max_peticiones=max_peticiones, timeout=timeout)
+            self.pool.iniciar()
+
+    def consultar(self, perfil, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.pool is not None:
+            return self.pool.consultar(perfil, timeout)
+        return self.ejecutar(perfil, timeout)
+
+    def ejecutar(self, perfil, timeout):
+        """Evalúa un perfil en un proceso SWI-Prolog nuevo; lanza ErrorPool si falla"""
+        cmd = [get_swipl_cmd(), '-q', WORKER_FILE, '--', self.ruta]
+        try:
+            # Popen + communicate en lugar de run() para medir por separado el arranque del proceso
+            with metricas.etapa('arranque_proceso'):
+                proceso = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                with metricas.etapa('consulta'):
+                    stdout_bytes, stderr_bytes = proceso.communicate(
+                        codificar_peticion({'perfil': perfil, 'limite': round(timeout, 3)}),
+                        timeout=timeout + MARGEN_LIMITE
+                    )
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+                proceso.communicate()
+                raise
+        except subprocess.TimeoutExpired:
+            metricas.contar_error('timeout')
+            raise TimeoutConsulta(f"La consulta superó {timeout}s")
+        except OSError as e:
+            metricas.contar_error('pool')
+            raise ErrorPool(str(e))
+
+        # El trabajador responde una línea JSON (UTF-8) y termina al cerrarse su entrada
+        linea = (stdout_bytes or b'').split(b'\n', 1)[0]
+        if proceso.returncode != 0 or not linea.strip():
+            metricas.contar_error('prolog')
+            stderr_text = (stderr_bytes or b'').decode('utf-8', errors='replace')
+            raise ErrorProlog(f"exit {proceso.returncode}: {stderr_text}")
+        return ids_respuesta(decodificar_respuesta(linea))
+
+    @contextmanager
+    def trabajador(self, timeout=None):
+        """Reserva un único trabajador (esperando hasta `timeout`) para evaluar un bloque completo"""
+        if self.pool is not None:
+            with self.pool.trabajador(timeout) as trabajador:
+                yield trabajador
+            return
+        trabajador = TrabajadorSwipl(get_swipl_cmd(), self.ruta)
+        try:
+            yield trabajador
+        finally:
+            trabajador.detener()
+
+    def consultar_lote(self, perfiles, timeout=None):
+        # Un solo intercambio JSON por bloque
+        if not perfiles:
+            return []
+        timeout = self.timeout if timeout is None else timeout
+        with self.trabajador(timeout) as trabajador:
+            return trabajador.consultar_lote(perfiles, timeout)
+
+    def estado(self):
+        return self.pool.estado() if self.pool is not None else {'tamano': 0}
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.cerrar()
+
+
+class MotorAsync(Motor):
+    """
+    Pool asíncrono de procesos `swipl` (pool_async.py) que vive en el bucle
+    de eventos de servidor_async.py. Las peticiones usan `consultar_async`;
+    `consultar` (la prueba de conformidad, desde otro hilo) espera en `bucle`.
+    """
+
+    nombre = 'subproceso'
+
+    def __init__(self, version, bucle, tamano=POOL_TAMANO, max_peticiones=POOL_MAX_PETICIONES, timeout=PROLOG_TIMEOUT):
+        self.bucle = bucle
+        self.timeout = timeout
+        self.pool = PoolAsync(get_swipl_cmd(), version.artefacto.ruta, tamano=max(tamano, 1),
+                              max_peticiones=max_peticiones, timeout=timeout)
+        # Los trabajadores arrancan antes de la primera consulta
+        self._esperar(self.pool.iniciar(), timeout)
+
+    def _esperar(self, corrutina, timeout):
+        """Ejecuta `corrutina` en el bucle del servidor y espera su resultado desde otro hilo"""
+        try:
+            en_bucle = asyncio.get_running_loop() is self.bucle
+        except RuntimeError:
+            en_bucle = False
+        if self.bucle is None or not self.bucle.is_running() or en_bucle:
+            corrutina.close()
+            raise ErrorPool('El pool asíncrono solo se consulta desde su bucle de eventos (consultar_async)')
+        futuro = asyncio.run_coroutine_threadsafe(corrutina, self.bucle)
+        try:
+            return futuro.result(timeout + 2 * MARGEN_LIMITE)
+        except FutureTimeoutError:
+            futuro.cancel()
+            metricas.contar_error('timeout')
+            raise TimeoutConsulta(f'La consulta superó {timeout}s')
+        except OSError as e:
+            raise ErrorPool(f'No se pudo iniciar SWI-Prolog: {e}')
+
+    def consultar(self, perfil, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        return self._esperar(self.pool.consultar(perfil, timeout), timeout)
+
+    async def consultar_async(self, perfil, timeout=None):
+        return await self.pool.consultar(perfil, timeout)
+
+    async def consultar_lote_async(self, perfiles, timeout=None):
+        # Un solo intercambio con un trabajador por bloque, como PoolSwipl
+        return await self.pool.consultar_lote(perfiles, timeout)
+
+    def estado(self):
+        return self.pool.estado()
+
+    def cerrar(self):
+        if self.bucle is not None and not self.bucle.is_closed():
+            # La recarga cierra la versión anterior desde su propio hilo
+            self.bucle.call_soon_threadsafe(self.pool.cerrar)
+        else:
+            self.pool.cerrar()
+
+
+class MotorNativo(Motor):
+    """Motor nativo: las reglas compiladas a operaciones NumPy, sin procesos"""
+
+    nombre = 'vectorizado'
+    prolog = False
+
+    def __init__(self, version):
+        self.motor = version.vectorizado()
+        self.consultas = 0
+
+    def consultar(self, perfil, timeout=None):
+        with metricas.etapa('consulta'):
+            ids, error = self.motor.evaluar_ids([perfil])[0]
+        self.consultas += 1
+        if error is not None:
+            metricas.contar_error('prolog')
+            raise ErrorProlog(error)
+        return ids
+
+    def consultar_lote(self, perfiles, timeout=None):
+        with metricas.etapa('consulta'):
+            resultados = self.motor.evaluar_ids(perfiles)
+        self.consultas += len(perfiles)
+        return [(ids, None if error is None else f'Error ejecutando Prolog: {error}') for ids, error in resultados]
+
+    def estado(self):
+        return {'reglas': len(self.motor.reglas), 'consultas': self.consultas}
+
+
+# En este orden se prueban; el primer motor Prolog que responde es la referencia
+MOTORES = {
+    'pyswip': MotorPyswip,
+    'subproceso': MotorSubproceso,
+    'vectorizado': MotorNativo,
+}
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p / 100), len(ordenados) - 1)]
+
+
+def resultados_python(reglas, perfiles):
+    """Ids de cada perfil según reglas.py (None si Prolog lo rechazaría), como `medir`"""
+    def resultado(perfil):
+        try:
+            return evaluar_reglas(reglas, perfil)
+        except (ValueError, TypeError, ArithmeticError):
+            return None
+    return [resultado(perfil) for perfil in perfiles]
+
+
+def medir(motor, perfiles, rondas=MOTOR_RONDAS, timeout=PROLOG_TIMEOUT):
+    """
+    Resultados del motor para cada perfil (ids ordenados, o None si lo
+    rechaza) y latencias por consulta en ms de `rondas` pasadas más. La
+    primera pasada sirve además de calentamiento.
+    """
+    def resultado(perfil):
+        try:
+            return sorted(motor.consultar(perfil, timeout))
+        except ErrorProlog:
+            return None
+
+    resultados = [resultado(perfil) for perfil in perfiles]
+    latencias = []
+    for _ in range(rondas):
+        for perfil in perfiles:
+            inicio = time.perf_counter()
+            resultado(perfil)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    return resultados, latencias
+
+
+class SelectorMotor:
+    """
+    Crea el motor de cada versión de la base (el `crear_motor` de
+    BaseConocimiento). La primera vez elige el tipo; después lo reutiliza.
+    `motores` reemplaza la tabla MOTORES (nombre -> constructor).
+    """
+
+    def __init__(self, preferido=MOTOR, muestras=MOTOR_MUESTRAS, rondas=MOTOR_RONDAS, motores=None):
+        self.motores = MOTORES if motores is None else motores
+        if preferido not in self.motores and preferido != 'auto':
+            print(f"⚠️  MOTOR={preferido} desconocido; se elige automáticamente entre {', '.join(self.motores)}")
+            preferido = 'auto'
+        self.preferido = preferido
+        self.muestras = muestras
+        self.rondas = rondas
+        self.elegido = None
+        self.referencia = None
+        self.seleccion = None
+        self.latencia = None
+        self.candidatos = {}
+        self.elegido_en = None
+
+    def perfiles_prueba(self):
+        # Con campos opcionales omitidos y metas que no son objetos, donde los motores pueden divergir
+        return [dict(EJEMPLO_PERFIL)] + perfiles_muestra(self.muestras, semilla=0)
+
+    def _probar(self, nombre, version, perfiles):
+        """(motor, resultados, latencias) o None si no se pudo construir o no respondió"""
+        try:
+            motor = self.motores[nombre](version)
+        except Exception as e:
+            self.candidatos[nombre] = {'disponible': False, 'error': str(e)}
+            return None
+        try:
+            resultados, latencias = medir(motor, perfiles, self.rondas)
+        except Exception as e:
+            motor.cerrar()
+            self.candidatos[nombre] = {'disponible': False, 'error': str(e)}
+            return None
+        self.candidatos[nombre] = {
+            'disponible': True,
+            'p50_ms': round(_percentil(latencias, 50), 3) if latencias else None,
+            'p95_ms': round(_percentil(latencias, 95), 3) if latencias else None
+        }
+        return motor, resultados, latencias
+
+    def elegir(self, version):
+        """Prueba los motores, elige uno y devuelve su instancia para `version` (o None)"""
+        perfiles = self.perfiles_prueba()
+        nombres = list(self.motores) if self.preferido == 'auto' else [self.preferido]
+        self.candidatos = {}
+        probados = {}
+        with metricas.etapa('eleccion_motor'):
+            for nombre in nombres:
+                probado = self._probar(nombre, version, perfiles)
+                if probado is not None:
+                    probados[nombre] = probado
+            if not probados and self.preferido != 'auto':
+                print(f"⚠️  El motor configurado ({self.preferido}) no está disponible; se elige automáticamente")
+                for nombre in self.motores:
+                    if nombre != self.preferido:
+                        probado = self._probar(nombre, version, perfiles)
+                        if probado is not None:
+                            probados[nombre] = probado
+
+        self.referencia = next((n for n, (m, _, _) in probados.items() if m.prolog), None)
+        if self.referencia is not None:
+            referencia = probados[self.referencia][1]
+        else:
+            # Sin Prolog los candidatos se comparan con el evaluador de reglas.py
+            referencia = resultados_python(version.reglas, perfiles)
+            self.referencia = 'reglas.py' if probados else None
+        conformes = {}
+        for nombre, (motor, resultados, latencias) in probados.items():
+            diferencias = sum(1 for a, b in zip(resultados, referencia) if a != b)
+            self.candidatos[nombre]['conforme'] = diferencias == 0
+            self.candidatos[nombre]['diferencias'] = diferencias
+            if diferencias == 0:
+                conformes[nombre] = latencias
+            else:
+                print(f"✗ Motor {nombre}: {diferencias} de {len(perfiles)} perfiles difieren de la referencia "
+                      f"({self.referencia}); descartado")
+
+        elegido = min(conformes, key=lambda n: _percentil(conformes[n], 50) if conformes[n] else 0, default=None)
+        for nombre, (motor, _, _) in probados.items():
+            if nombre != elegido:
+                motor.cerrar()
+        self.elegido_en = time.strftime('%Y-%m-%dT%H:%M:%S')
+        if elegido is None:
+            self.elegido = self.seleccion = self.latencia = None
+            print("✗ Ningún motor disponible superó la prueba de conformidad")
+            return None
+
+        self.elegido = elegido
+        self.seleccion = 'configuracion' if elegido == self.preferido else 'automatica'
+        self.latencia = {
+            'p50_ms': self.candidatos[elegido]['p50_ms'],
+            'p95_ms': self.candidatos[elegido]['p95_ms']
+        }
+        print(f"✓ Motor elegido: {elegido} ({self.seleccion}, p50 {self.latencia['p50_ms']} ms "
+              f"en {len(perfiles)} perfiles de prueba)")
+        return probados[elegido][0]
+
+    def __call__(self, version):
+        if self.elegido is None:
+            return self.elegir(version)
+        try:
+            return self.motores[self.elegido](version)
+        except Exception as e:
+            print(f"⚠️  No se pudo crear el motor {self.elegido} para la versión {version.id}: {e}")
+            return self.elegir(version)
+
+    def estado(self, motor=None):
+        """Resumen para /api/health"""
+        return {
+            'nombre': self.elegido,
+            'seleccion': self.seleccion,
+            'configurado': self.preferido,
+            'referencia': self.referencia,
+            'latencia': self.latencia,
+            'elegido_en': self.elegido_en,
+            'candidatos': self.candidatos,
+            'detalle': motor.estado() if motor is not None else None
+        }
@@ -0,0 +1,137 @@
+"""
+Gestor de motores SWI-Prolog embebidos (pyswip) para backend.py
+pyswip no admite consultas concurrentes desde los hilos de Flask, así que
+cada motor vive en su propio proceso trabajador con su instancia de Prolog.
+Las consultas se despachan por una cola acotada y los resultados vuelven
+como futures, lo que permite atender peticiones en paralelo en varios núcleos.
+Si un proceso muere (un fallo de SWI-Prolog, falta de memoria) el pool queda
+roto; se reemplaza por uno nuevo y solo fallan las consultas que estaban en él.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Protocolo JSON compartido con worker_swipl.pl
+PROTOCOLO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protocolo_json.pl')
+
+# Instancia Prolog del proceso trabajador (una por proceso)
+_prolog = None
+
+
+class ColaLlena(Exception):
+    """Se alcanzó el máximo de consultas pendientes"""
+
+
+def _inicializar(archivo_prolog):
+    """Se ejecuta una vez en cada proceso trabajador: carga la base de conocimiento"""
+    global _prolog
+    from pyswip import Prolog
+    _prolog = Prolog()
+    _prolog.consult(archivo_prolog)
+    _prolog.consult(PROTOCOLO_FILE)
+
+
+def _normalizar(valor):
+    """Convierte los términos devueltos por pyswip en valores serializables"""
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    return str(valor)
+
+
+def _consultar(query):
+    """Ejecuta la consulta en el motor del proceso y devuelve todas las soluciones"""
+    return [_normalizar(solucion) for solucion in _prolog.query(query)]
+
+
+class GestorMotores:
+    """Conjunto de `motores` procesos pyswip con una cola de hasta `profundidad` consultas"""
+
+    def __init__(self, archivo_prolog, motores=2, profundidad=64, timeout=15):
+        self.archivo_prolog = os.path.abspath(archivo_prolog)
+        self.motores = motores
+        self.profundidad = profundidad
+        self.timeout = timeout
+        self.pendientes = 0
+        self.rechazadas = 0
+        self.reciclados = 0
+        self._lock = threading.Lock()
+        self._cupos = threading.BoundedSemaphore(profundidad)
+        self._executor = self._crear_executor()
+
+    def _crear_executor(self):
+        # 'spawn': pyswip inicializa SWI-Prolog al importarse y no sobrevive a fork()
+        return ProcessPoolExecutor(
+            max_workers=self.motores,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar,
+            initargs=(self.archivo_prolog,)
+        )
+
+    def _reemplazar(self, roto):
+        """Reemplaza el pool `roto` (si sigue siendo el actual) y devuelve el vigente"""
+        with self._lock:
+            if self._executor is roto:
+                self._executor = self._crear_executor()
+                self.reciclados += 1
+                roto.shutdown(wait=False, cancel_futures=True)
+            return self._executor
+
+    def enviar(self, query):
+        """Encola una consulta y devuelve un Future con la lista de soluciones"""
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self.rechazadas += 1
+            raise ColaLlena(f'Hay {self.profundidad} consultas Prolog pendientes')
+        with self._lock:
+            self.pendientes += 1
+            executor = self._executor
+        try:
+            try:
+                future = executor.submit(_consultar, query)
+            except BrokenProcessPool:
+                # Un proceso murió después de la última consulta: se reintenta una vez en un pool nuevo
+                executor = self._reemplazar(executor)
+                future = executor.submit(_consultar, query)
+        except Exception:
+            self._terminada(None, None)
+            raise
+        future.add_done_callback(lambda f: self._terminada(f, executor))
+        return future
+
+    def _terminada(self, future, executor):
+        with self._lock:
+            self.pendientes -= 1
+        self._cupos.release()
+        if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # Esta consulta falla; las siguientes van a un pool nuevo
+            self._reemplazar(executor)
+
+    def consultar(self, query, timeout=None):
+        """Ejecuta la consulta y espera sus soluciones; si vence, la retira de la cola si aún no empezó"""
+        future = self.enviar(query)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def estado(self):
+        return {
+            'motores': self.motores,
+            'profundidad': self.profundidad,
+            'pendientes': self.pendientes,
+            'rechazadas': self.rechazadas,
+            'reciclados': self.reciclados
+        }
+
+    def cerrar(self):
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=False, cancel_futures=True)
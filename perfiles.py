@@ -0,0 +1,127 @@
+"""
+Esquema del perfil financiero compartido por ambos backends
+"""
+
+import random
+
+# Campos que toda petición debe incluir; el resto (metas, booleanos,
+# nivel_conocimiento...) se envía tal cual a Prolog
+CAMPOS_REQUERIDOS = [
+    'ingreso', 'gasto_total', 'ahorro_mensual', 'meses_fondo',
+    'vivienda', 'alimentacion', 'transporte', 'deudas_total',
+    'tasa_interes_apr', 'gasto_medico_ratio'
+]
+
+# Campos booleanos: protocolo_json.pl solo acepta true o false (la cadena
+# "true" llega a Prolog como el mismo átomo) y rechaza cualquier otro valor
+CAMPOS_BOOLEANOS = [
+    'registra_gastos', 'cc_pago_minimo', 'jubilacion_definida', 'tiene_seguro_salud',
+    'tiene_seguro_vida', 'dependientes', 'posee_auto', 'tiene_seguro_auto', 'tiene_testamento'
+]
+
+# Perfil de ejemplo para /api/ejemplo en los servidores sin pyswip
+EJEMPLO_PERFIL = {
+    'ingreso': 15000,
+    'gasto_total': 16500,
+    'ahorro_mensual': 800,
+    'meses_fondo': 0.5,
+    'vivienda': 6000,
+    'alimentacion': 5800,
+    'transporte': 3500,
+    'deudas_total': 5200,
+    'cc_pago_minimo': True,
+    'tasa_interes_apr': 42.0,
+    'jubilacion_definida': False,
+    'nivel_conocimiento': 'basic',
+    'tiene_seguro_salud': False,
+    'tiene_seguro_vida': False,
+    'dependientes': True,
+    'posee_auto': True,
+    'tiene_seguro_auto': False,
+    'gasto_medico_ratio': 0.18,
+    'tiene_testamento': False,
+    'registra_gastos': False,
+    'metas': []
+}
+
+
+def validar_perfil(data):
+    """Devuelve el mensaje de error del perfil, o None si es válido"""
+    if not isinstance(data, dict):
+        return 'El perfil debe ser un objeto JSON'
+    for field in CAMPOS_REQUERIDOS:
+        if field not in data:
+            return f'Campo requerido faltante: {field}'
+    for field in CAMPOS_BOOLEANOS:
+        if field in data and not es_booleano(data[field]):
+            return f'Campo booleano inválido: {field} (se esperaba true o false)'
+    return None
+
+
+def es_booleano(valor):
+    """Valor que protocolo_json.pl acepta en un campo booleano"""
+    return isinstance(valor, bool) or (isinstance(valor, str) and valor in ('true', 'false'))
+
+
+def perfiles_aleatorios(n, semilla=0):
+    """
+    Genera `n` perfiles sintéticos reproducibles. Los valores se eligen a ambos
+    lados (y justo sobre) cada umbral de las reglas para recorrer todas las ramas.
+    """
+    rnd = random.Random(semilla)
+    booleano = lambda: rnd.random() < 0.5
+    perfiles = []
+    for _ in range(n):
+        ingreso = rnd.choice([0, 8000, 15000, 20000, 35000, 52000])
+        porcion = lambda *pcts: round(ingreso * rnd.choice(pcts) / 100)
+        perfiles.append({
+            'ingreso': ingreso,
+            'gasto_total': porcion(60, 90, 100, 110, 130),
+            'ahorro_mensual': porcion(0, 5, 10, 15, 20, 25),
+            'meses_fondo': rnd.choice([0, 0.5, 1, 2.9, 3, 4, 6, 9]),
+            'vivienda': porcion(15, 29, 30, 35, 40, 41, 55),
+            'alimentacion': porcion(10, 20, 35, 36, 45),
+            'transporte': porcion(5, 15, 20, 21, 30),
+            'deudas_total': rnd.choice([0, 0, porcion(10, 25, 39, 40, 55)]),
+            'cc_pago_minimo': booleano(),
+            'tasa_interes_apr': rnd.choice([0, 0.0, 12.5, 30, 30.5, 42.0]),
+            'metas': [
+                {'tipo': rnd.choice(['fondo_emergencia', 'auto', 'casa', 'jubilacion']),
+                 'meses': rnd.choice([3, 11, 12, 24, 60, 61, 120])}
+                for _ in range(rnd.choice([0, 0, 1, 2, 3]))
+            ],
+            'jubilacion_definida': booleano(),
+            'nivel_conocimiento': rnd.choice(['basic', 'intermediate', 'advanced']),
+            'tiene_seguro_salud': booleano(),
+            'tiene_seguro_vida': booleano(),
+            'dependientes': booleano(),
+            'posee_auto': booleano(),
+            'tiene_seguro_auto': booleano(),
+            'gasto_medico_ratio': rnd.choice([0, 0.05, 0.15, 0.16, 0.3]),
+            'tiene_testamento': booleano(),
+            'registra_gastos': booleano()
+        })
+    return perfiles
+
+
+# Metas que no son objetos: Prolog las deja tal cual y recommend/2 no las encuentra
+METAS_NO_OBJETO = [5, 'casa', None, True, [12]]
+
+
+def perfiles_muestra(n, semilla=0):
+    """
+    Perfiles para comparar motores o versiones de la base. Son los de
+    perfiles_aleatorios con variantes que Prolog también acepta: sin
+    tiene_seguro_vida o tiene_seguro_auto cuando no hay dependientes o auto
+    (no se consultan) y con metas que no son objetos (se ignoran).
+    """
+    rnd = random.Random(semilla + 1)
+    perfiles = perfiles_aleatorios(n, semilla)
+    for perfil in perfiles:
+        if not perfil['dependientes'] and rnd.random() < 0.5:
+            del perfil['tiene_seguro_vida']
+        if not perfil['posee_auto'] and rnd.random() < 0.5:
+            del perfil['tiene_seguro_auto']
+        if rnd.random() < 0.25:
+            perfil['metas'] = perfil['metas'] + [rnd.choice(METAS_NO_OBJETO)]
+    return perfiles
@@ -0,0 +1,189 @@
+"""
+Pool asíncrono de procesos SWI-Prolog para servidor_async.py
+Mismo protocolo que pool_swipl.py (worker_swipl.pl), pero con pipes no
+bloqueantes de asyncio: miles de peticiones pueden esperar un trabajador sin
+ocupar un hilo cada una. Prolog recibe el tiempo que le queda a la petición y
+abandona la consulta al vencer; si la petición se cancela (o Prolog no
+contesta dentro del margen) el proceso que la atendía se termina y se
+reemplaza, así Prolog no sigue trabajando en una respuesta que nadie va a leer.
+"""
+
+import asyncio
+import os
+import time
+
+import metricas
+from pool_swipl import (
+    WORKER_FILE, MARGEN_LIMITE, ErrorPool, TimeoutConsulta,
+    codificar_peticion, decodificar_respuesta, ids_respuesta, resultados_lote
+)
+
+# Longitud máxima de una línea de respuesta (la de un bloque de lote es larga)
+LIMITE_LINEA = 16 * 1024 * 1024
+
+
+class TrabajadorAsync:
+    """Un proceso `swipl` de larga duración manejado desde el bucle de eventos"""
+
+    def __init__(self, swipl_cmd, archivo_prolog):
+        self.swipl_cmd = swipl_cmd
+        self.archivo_prolog = archivo_prolog
+        self.proceso = None
+        self.peticiones = 0
+
+    async def iniciar(self):
+        inicio = time.perf_counter()
+        self.proceso = await asyncio.create_subprocess_exec(
+            self.swipl_cmd, '-q', WORKER_FILE, '--', self.archivo_prolog,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=LIMITE_LINEA
+        )
+        metricas.observar_etapa('arranque_proceso', time.perf_counter() - inicio)
+        self.peticiones = 0
+
+    def vivo(self):
+        return self.proceso is not None and self.proceso.returncode is None
+
+    def detener(self):
+        """Mata el proceso sin esperar; el bucle de eventos recoge su estado"""
+        proceso, self.proceso = self.proceso, None
+        if proceso is None or proceso.returncode is not None:
+            return
+        try:
+            proceso.kill()
+        except ProcessLookupError:
+            return
+        asyncio.ensure_future(proceso.wait())
+
+    async def intercambiar(self, peticion, limite):
+        """Envía una petición (dict) con `limite` segundos y devuelve la respuesta (dict) del trabajador"""
+        if not self.vivo():
+            try:
+                await self.iniciar()
+            except OSError as e:
+                raise ErrorPool(f'No se pudo iniciar SWI-Prolog: {e}')
+        self.peticiones += 1
+        datos = codificar_peticion(dict(peticion, limite=round(limite, 3)))
+        inicio = time.perf_counter()
+        try:
+            self.proceso.stdin.write(datos)
+            await self.proceso.stdin.drain()
+            linea = await self.proceso.stdout.readline()
+        except (OSError, ConnectionError, ValueError) as e:
+            # ValueError: la línea de respuesta superó LIMITE_LINEA
+            self.detener()
+            raise ErrorPool(f'No se pudo comunicar con el trabajador: {e}')
+        except asyncio.CancelledError:
+            # Plazo vencido o cliente desconectado a mitad de la respuesta:
+            # el proceso queda desincronizado, se termina y se reemplaza
+            self.detener()
+            raise
+        if not linea:
+            self.detener()
+            metricas.contar_error('proceso_caido')
+            raise ErrorPool('El proceso SWI-Prolog terminó inesperadamente')
+        metricas.observar_etapa('consulta', time.perf_counter() - inicio)
+        return decodificar_respuesta(linea)
+
+    async def consultar(self, perfil, limite):
+        """Evalúa un perfil (dict) y devuelve los ids de las reglas disparadas"""
+        return ids_respuesta(await self.intercambiar({'perfil': perfil}, limite))
+
+    async def consultar_lote(self, perfiles, limite):
+        """Evalúa varios perfiles en un solo intercambio; una tupla (ids, error) por perfil"""
+        return resultados_lote(await self.intercambiar({'perfiles': perfiles}, limite))
+
+
+class PoolAsync:
+    """
+    Conjunto fijo de trabajadores SWI-Prolog compartido por todas las
+    corrutinas. El plazo de cada consulta cubre la espera de un trabajador
+    libre y la respuesta de Prolog.
+    """
+
+    def __init__(self, swipl_cmd, archivo_prolog, tamano=4, max_peticiones=1000, timeout=15):
+        self.swipl_cmd = swipl_cmd
+        self.archivo_prolog = os.path.abspath(archivo_prolog)
+        self.tamano = tamano
+        self.max_peticiones = max_peticiones
+        self.timeout = timeout
+        self.reciclados = 0
+        self.cancelados = 0
+        self.en_espera = 0
+        self._trabajadores = [TrabajadorAsync(swipl_cmd, self.archivo_prolog) for _ in range(tamano)]
+        self._libres = asyncio.LifoQueue()
+        for trabajador in self._trabajadores:
+            self._libres.put_nowait(trabajador)
+
+    async def iniciar(self):
+        """Arranca todos los trabajadores para que las primeras consultas los encuentren calientes"""
+        await asyncio.gather(*(t.iniciar() for t in self._trabajadores if not t.vivo()))
+
+    def _liberar(self, trabajador):
+        if not trabajador.vivo() or trabajador.peticiones >= self.max_peticiones:
+            # Se reinicia en su próxima consulta, fuera de este `finally`
+            trabajador.detener()
+            self.reciclados += 1
+        self._libres.put_nowait(trabajador)
+
+    async def consultar(self, perfil, timeout=None):
+        """Ids de las reglas disparadas para un perfil, dentro de `timeout` segundos"""
+        return await self._en_trabajador(lambda trabajador, restante: trabajador.consultar(perfil, restante), timeout)
+
+    async def consultar_lote(self, perfiles, timeout=None):
+        """
+        Un bloque de perfiles en un solo intercambio con un trabajador, dentro
+        de `timeout` segundos; una tupla (ids, error) por perfil
+        """
+        if not perfiles:
+            return []
+        return await self._en_trabajador(
+            lambda trabajador, restante: trabajador.consultar_lote(perfiles, restante), timeout
+        )
+
+    async def _en_trabajador(self, operacion, timeout):
+        """Reserva un trabajador libre y ejecuta `operacion(trabajador, restante)` en el plazo"""
+        plazo = self.timeout if timeout is None else min(timeout, self.timeout)
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + plazo
+
+        self.en_espera += 1
+        try:
+            trabajador = await asyncio.wait_for(self._libres.get(), max(plazo, 0))
+        except asyncio.TimeoutError:
+            metricas.contar_error('sin_trabajadores')
+            raise TimeoutConsulta('No hay trabajadores Prolog libres')
+        finally:
+            self.en_espera -= 1
+            metricas.observar_etapa('espera_trabajador', loop.time() - (limite - plazo))
+
+        try:
+            restante = max(limite - loop.time(), 0)
+            return await asyncio.wait_for(operacion(trabajador, restante), restante + MARGEN_LIMITE)
+        except asyncio.TimeoutError:
+            self.cancelados += 1
+            metricas.contar_error('timeout')
+            raise TimeoutConsulta(f'La consulta superó {plazo}s')
+        except asyncio.CancelledError:
+            self.cancelados += 1
+            metricas.contar_error('cancelada')
+            raise
+        finally:
+            self._liberar(trabajador)
+
+    def estado(self):
+        return {
+            'tamano': self.tamano,
+            'libres': self._libres.qsize(),
+            'vivos': sum(1 for t in self._trabajadores if t.vivo()),
+            'en_espera': self.en_espera,
+            'reciclados': self.reciclados,
+            'cancelados': self.cancelados,
+            'max_peticiones': self.max_peticiones,
+            'timeout': self.timeout
+        }
+
+    def cerrar(self):
+        for trabajador in self._trabajadores:
+            trabajador.detener()
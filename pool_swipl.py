@@ -0,0 +1,268 @@
+"""
+Pool de procesos SWI-Prolog persistentes
+Cada trabajador carga la base de conocimiento una sola vez y atiende
+consultas por stdin/stdout (ver worker_swipl.pl), evitando crear un proceso
+y reconsultar asistente_finanzas.pl en cada petición. El intercambio es una
+línea JSON por petición y por respuesta (protocolo_json.pl): los perfiles no
+se convierten en código Prolog y la respuesta trae los ids de las reglas.
+Cada petición lleva su tiempo disponible ("limite"): Prolog abandona la
+consulta al vencer y el trabajador sigue vivo para la siguiente.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import metricas
+import trazas
+from bitacora import bitacora
+
+WORKER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker_swipl.pl')
+
+# Respuesta de protocolo_json.pl cuando vence el "limite" de la petición
+LIMITE_AGOTADO = 'time_limit_exceeded'
+# Segundos que se espera además del límite para que Prolog conteste a tiempo;
+# pasado ese margen el trabajador se da por colgado y se termina
+MARGEN_LIMITE = 0.5
+
+
+class ErrorPool(Exception):
+    """Error de comunicación con un trabajador SWI-Prolog"""
+
+
+class TimeoutConsulta(ErrorPool):
+    """La consulta superó el tiempo máximo permitido"""
+
+
+class ErrorProlog(ErrorPool):
+    """Prolog respondió con una excepción"""
+
+
+def codificar_peticion(peticion):
+    """Petición JSON en una sola línea, lista para escribir en el pipe"""
+    peticion = trazas.con_perfilado(peticion)
+    with metricas.etapa('serializacion'):
+        return json.dumps(peticion, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decodificar_respuesta(linea):
+    """Convierte la línea de respuesta (bytes) en un dict"""
+    with metricas.etapa('decodificacion'):
+        try:
+            respuesta = json.loads(linea)
+        except ValueError:
+            respuesta = None
+    if not isinstance(respuesta, dict):
+        raise ErrorPool(f'Respuesta inválida del trabajador: {linea[:200]!r}')
+    trazas.registrar_prolog(respuesta)
+    return respuesta
+
+
+def ids_respuesta(respuesta):
+    """Ids de reglas de una respuesta {"ids": [...]}; lanza ErrorProlog si trae un error"""
+    if respuesta.get('error') == LIMITE_AGOTADO:
+        metricas.contar_error('timeout')
+        raise TimeoutConsulta('Prolog abandonó la consulta al vencer el plazo')
+    if 'error' in respuesta:
+        metricas.contar_error('prolog')
+        raise ErrorProlog(respuesta['error'])
+    return respuesta.get('ids', [])
+
+
+def resultados_lote(respuesta):
+    """Lista de tuplas (ids, error) de una respuesta {"resultados": [...]}"""
+    if 'resultados' not in respuesta:
+        ids_respuesta(respuesta)
+        raise ErrorPool('Respuesta de lote sin resultados')
+    resultados = []
+    for item in respuesta['resultados']:
+        if 'error' in item:
+            metricas.contar_error('prolog')
+            resultados.append((None, f"Error ejecutando Prolog: {item['error']}"))
+        else:
+            resultados.append((item.get('ids', []), None))
+    return resultados
+
+
+class TrabajadorSwipl:
+    """Un proceso `swipl` de larga duración con la base de conocimiento cargada"""
+
+    def __init__(self, swipl_cmd, archivo_prolog):
+        self.swipl_cmd = swipl_cmd
+        self.archivo_prolog = archivo_prolog
+        self.proceso = None
+        self.peticiones = 0
+        self._lineas = None
+
+    def iniciar(self):
+        """Lanza el proceso; la carga de la base ocurre en segundo plano"""
+        cmd = [self.swipl_cmd, '-q', WORKER_FILE, '--', self.archivo_prolog]
+        with metricas.etapa('arranque_proceso'):
+            self.proceso = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                bufsize=0
+            )
+        self.peticiones = 0
+        self._lineas = queue.Queue()
+        # Un hilo lector por proceso permite aplicar timeouts sin bloquear
+        # (select() no funciona con pipes en Windows)
+        hilo = threading.Thread(
+            target=self._leer_salida,
+            args=(self.proceso.stdout, self._lineas),
+            daemon=True
+        )
+        hilo.start()
+
+    @staticmethod
+    def _leer_salida(stdout, lineas):
+        for linea in iter(stdout.readline, b''):
+            lineas.put(linea)
+        lineas.put(None)
+
+    def vivo(self):
+        return self.proceso is not None and self.proceso.poll() is None
+
+    def detener(self):
+        """Termina el proceso sin afectar al resto del pool"""
+        proceso, self.proceso = self.proceso, None
+        if proceso is None:
+            return
+        try:
+            proceso.stdin.close()
+        except Exception:
+            pass
+        try:
+            proceso.kill()
+            proceso.wait(timeout=5)
+        except Exception:
+            pass
+
+    def intercambiar(self, peticion, timeout):
+        """
+        Envía una petición (dict) y devuelve la respuesta (dict) del trabajador.
+        Prolog recibe `timeout` como límite propio; solo si tampoco responde
+        dentro del margen se termina el proceso.
+        """
+        if not self.vivo():
+            # Reemplaza un proceso caído o expirado en una consulta anterior
+            try:
+                self.iniciar()
+            except OSError as e:
+                raise ErrorPool(f'No se pudo iniciar SWI-Prolog: {e}')
+        self.peticiones += 1
+        datos = codificar_peticion(dict(peticion, limite=round(timeout, 3)))
+        try:
+            self.proceso.stdin.write(datos)
+            self.proceso.stdin.flush()
+        except (OSError, ValueError, AttributeError) as e:
+            self.detener()
+            raise ErrorPool(f'No se pudo enviar la consulta al trabajador: {e}')
+
+        inicio = time.perf_counter()
+        try:
+            linea = self._lineas.get(timeout=timeout + MARGEN_LIMITE)
+        except queue.Empty:
+            # Solo se sacrifica este trabajador; el pool lo reemplaza
+            self.detener()
+            metricas.contar_error('timeout')
+            raise TimeoutConsulta(f'La consulta superó {timeout}s')
+        if linea is None:
+            self.detener()
+            metricas.contar_error('proceso_caido')
+            raise ErrorPool('El proceso SWI-Prolog terminó inesperadamente')
+        metricas.observar_etapa('consulta', time.perf_counter() - inicio)
+        return decodificar_respuesta(linea)
+
+    def consultar(self, perfil, timeout):
+        """Evalúa un perfil (dict) y devuelve los ids de las reglas disparadas"""
+        return ids_respuesta(self.intercambiar({'perfil': perfil}, timeout))
+
+    def consultar_lote(self, perfiles, timeout):
+        """Evalúa varios perfiles en un solo intercambio; una tupla (ids, error) por perfil"""
+        return resultados_lote(self.intercambiar({'perfiles': perfiles}, timeout))
+
+
+class PoolSwipl:
+    """
+    Conjunto fijo de trabajadores SWI-Prolog reutilizables.
+    Los trabajadores se reciclan tras `max_peticiones` consultas o si mueren
+    (caída o timeout); cada consulta tiene su propio límite de tiempo.
+    """
+
+    def __init__(self, swipl_cmd, archivo_prolog, tamano=4, max_peticiones=1000, timeout=15):
+        self.swipl_cmd = swipl_cmd
+        self.archivo_prolog = os.path.abspath(archivo_prolog)
+        self.tamano = tamano
+        self.max_peticiones = max_peticiones
+        self.timeout = timeout
+        self.reciclados = 0
+        self.en_espera = 0
+        self._espera_lock = threading.Lock()
+        self._trabajadores = [TrabajadorSwipl(swipl_cmd, self.archivo_prolog) for _ in range(tamano)]
+        self._libres = queue.LifoQueue()
+        for trabajador in self._trabajadores:
+            self._libres.put(trabajador)
+
+    def iniciar(self):
+        """Arranca todos los trabajadores para que las primeras consultas los encuentren calientes"""
+        for trabajador in self._trabajadores:
+            if not trabajador.vivo():
+                trabajador.iniciar()
+
+    @contextmanager
+    def trabajador(self, timeout=None):
+        """Reserva un trabajador en exclusiva mientras dure el bloque `with`, esperando hasta `timeout`"""
+        with self._espera_lock:
+            self.en_espera += 1
+        inicio = time.perf_counter()
+        try:
+            trabajador = self._libres.get(timeout=self.timeout if timeout is None else min(timeout, self.timeout))
+        except queue.Empty:
+            metricas.contar_error('sin_trabajadores')
+            raise TimeoutConsulta('No hay trabajadores Prolog libres')
+        finally:
+            with self._espera_lock:
+                self.en_espera -= 1
+            metricas.observar_etapa('espera_trabajador', time.perf_counter() - inicio)
+        try:
+            yield trabajador
+        finally:
+            self._liberar(trabajador)
+
+    def _liberar(self, trabajador):
+        if not trabajador.vivo() or trabajador.peticiones >= self.max_peticiones:
+            trabajador.detener()
+            self.reciclados += 1
+            try:
+                trabajador.iniciar()
+            except Exception as e:
+                bitacora.error('trabajador_no_reiniciado', error=str(e))
+        self._libres.put(trabajador)
+
+    def consultar(self, perfil, timeout=None):
+        """Ids de las reglas disparadas para un perfil (dict); `timeout` cubre la espera y la consulta"""
+        plazo = self.timeout if timeout is None else min(timeout, self.timeout)
+        limite = time.monotonic() + plazo
+        with self.trabajador(plazo) as trabajador:
+            return trabajador.consultar(perfil, max(limite - time.monotonic(), 0))
+
+    def estado(self):
+        return {
+            'tamano': self.tamano,
+            'libres': self._libres.qsize(),
+            'vivos': sum(1 for t in self._trabajadores if t.vivo()),
+            'en_espera': self.en_espera,
+            'reciclados': self.reciclados,
+            'max_peticiones': self.max_peticiones,
+            'timeout': self.timeout
+        }
+
+    def cerrar(self):
+        for trabajador in self._trabajadores:
+            trabajador.detener()
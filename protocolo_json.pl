@@ -0,0 +1,176 @@
+/*  protocolo_json.pl
+    SWI-Prolog (7.x/8.x/9.x)
+    Intercambio estructurado con Python: los perfiles llegan como JSON y la
+    respuesta son los ids de las reglas disparadas, también en JSON. Lo usan
+    worker_swipl.pl (una petición por línea) y los motores pyswip de backend.py.
+
+    Petición:   {"perfil": {...}}          -> {"ids": [Id, ...]} | {"error": Texto}
+                {"perfiles": [{...}, ...]} -> {"resultados": [Respuesta, ...]}
+
+    Con "limite": Segundos la petición entera se evalúa dentro de
+    call_with_time_limit/2; si el plazo vence se abandona y la respuesta es
+    {"error": "time_limit_exceeded"}, sin reiniciar el proceso.
+
+    Con "referencia": true los perfiles se evalúan con
+    recomendaciones_ids_referencia/2 (recommend/2 cláusula por cláusula) en
+    lugar de la pasada única; recarga.py compara ambas al cargar cada versión.
+
+    Con "perfilar": true (peticiones trazadas, ver trazas.py) la respuesta
+    agrega "perfil_prolog": inferencias, µs de CPU y, si SWI-Prolog tiene
+    profile_data/1 (8.3 o posterior), los predicados con más llamadas.
+
+    En el perfil, las cadenas se leen como átomos (basic, true, false...) y
+    cada meta {"tipo": T, "meses": M} se convierte en meta(T, M), igual que el
+    dict que espera asistente_finanzas.pl. Los campos booleanos solo admiten
+    true o false: cualquier otro valor es type_error(boolean, V), porque
+    asistente_finanzas.pl los usa en \+ y un átomo como halt se ejecutaría
+    como objetivo (perfiles.validar_perfil aplica la misma regla).
+*/
+
+:- module(protocolo_json, [
+    atender_json/2,             % +PeticionDict, -RespuestaDict
+    atender_json_texto/2,       % +PeticionAtomo, -RespuestaAtomo
+    perfil_json/2               % +JsonDict, -PerfilDict
+]).
+
+:- encoding(utf8).
+:- use_module(library(http/json)).
+:- use_module(library(time)).
+
+perfil_json(Json, Perfil) :-
+    forall(( campo_booleano(Campo), get_dict(Campo, Json, Valor) ),
+           booleano_json(Valor)),
+    (   get_dict(metas, Json, Metas0), is_list(Metas0)
+    ->  maplist(meta_json, Metas0, Metas),
+        put_dict(metas, Json, Metas, Perfil)
+    ;   Perfil = Json
+    ).
+
+campo_booleano(registra_gastos).
+campo_booleano(cc_pago_minimo).
+campo_booleano(jubilacion_definida).
+campo_booleano(tiene_seguro_salud).
+campo_booleano(tiene_seguro_vida).
+campo_booleano(dependientes).
+campo_booleano(posee_auto).
+campo_booleano(tiene_seguro_auto).
+campo_booleano(tiene_testamento).
+
+booleano_json(Valor) :-
+    (   Valor == true
+    ;   Valor == false
+    ), !.
+booleano_json(Valor) :-
+    throw(error(type_error(boolean, Valor), _)).
+
+%% Una meta sin "tipo" o "meses" es un error del perfil, no un fallo: así
+%% evaluar_json la informa en vez de dejar la petición sin respuesta
+meta_json(Meta, meta(Tipo, Meses)) :-
+    is_dict(Meta), !,
+    (   get_dict(tipo, Meta, Tipo),
+        get_dict(meses, Meta, Meses)
+    ->  true
+    ;   throw(error(domain_error(meta, Meta), _))
+    ).
+meta_json(Meta, Meta).
+
+atender_json(Peticion, Respuesta) :-
+    atender_json(Peticion, recomendaciones_ids, Respuesta).
+
+atender_json(Peticion, Evaluador, Respuesta) :-
+    is_dict(Peticion),
+    get_dict(limite, Peticion, Limite), number(Limite), !,
+    del_dict(limite, Peticion, _, Resto),
+    (   Limite =< 0
+    ->  Respuesta = _{error: time_limit_exceeded}
+    ;   catch(call_with_time_limit(Limite, atender_json(Resto, Evaluador, Respuesta)),
+              time_limit_exceeded,
+              Respuesta = _{error: time_limit_exceeded})
+    ).
+atender_json(Peticion, Evaluador, Respuesta) :-
+    is_dict(Peticion),
+    del_dict(perfilar, Peticion, true, Resto), !,
+    perfilado(atender_json(Resto, Evaluador, Respuesta0), Perfil),
+    put_dict(perfil_prolog, Respuesta0, Perfil, Respuesta).
+atender_json(Peticion, _, Respuesta) :-
+    is_dict(Peticion),
+    del_dict(referencia, Peticion, true, Resto), !,
+    atender_json(Resto, recomendaciones_ids_referencia, Respuesta).
+atender_json(Peticion, Evaluador, _{resultados: Resultados}) :-
+    is_dict(Peticion),
+    get_dict(perfiles, Peticion, Perfiles), !,
+    maplist(evaluar_json(Evaluador), Perfiles, Resultados).
+atender_json(Peticion, Evaluador, Respuesta) :-
+    is_dict(Peticion),
+    get_dict(perfil, Peticion, Perfil), !,
+    evaluar_json(Evaluador, Perfil, Respuesta).
+atender_json(_, _, _{error: peticion_desconocida}).
+
+%% El error (o el fallo) de cada perfil queda en su respuesta, salvo el fin
+%% del plazo, que corta el lote entero
+evaluar_json(Evaluador, Json, Respuesta) :-
+    catch(( perfil_json(Json, Perfil),
+            (   call(asistente_finanzas:Evaluador, Perfil, Ids)
+            ->  Respuesta = _{ids: Ids}
+            ;   Respuesta = _{error: fallo}
+            ) ),
+          E,
+          (   E == time_limit_exceeded
+          ->  throw(E)
+          ;   respuesta_error(E, Respuesta)
+          )).
+
+%% El perfilador se apaga aunque venza el plazo a mitad de la consulta
+perfilado(Meta, _{inferencias: Inferencias, cpu_us: CpuUs, predicados: Predicados}) :-
+    statistics(inferences, I0),
+    statistics(cputime, T0),
+    (   catch(use_module(library(prolog_profile)), _, fail),
+        current_predicate(prolog_profile:profile_data/1)
+    ->  reset_profiler,
+        setup_call_cleanup(profiler(_, cputime), once(Meta), profiler(_, false)),
+        prolog_profile:profile_data(Datos),
+        predicados_perfil(Datos, Predicados)
+    ;   once(Meta),
+        Predicados = []
+    ),
+    statistics(cputime, T1),
+    statistics(inferences, I1),
+    Inferencias is I1 - I0,
+    CpuUs is round((T1 - T0) * 1000000).
+
+%% Los 15 predicados con más llamadas
+predicados_perfil(Datos, Predicados) :-
+    get_dict(nodes, Datos, Nodos),
+    findall(Llamadas-_{predicado: Nombre, llamadas: Llamadas, ticks: Ticks},
+            ( member(Nodo, Nodos),
+              get_dict(predicate, Nodo, Predicado),
+              format(atom(Nombre), '~q', [Predicado]),
+              dato_nodo(call, Nodo, Llamadas),
+              dato_nodo(ticks_self, Nodo, Ticks) ),
+            Pares),
+    sort(1, @>=, Pares, Ordenados),
+    pairs_values(Ordenados, Todos),
+    length(Todos, N),
+    Max is min(N, 15),
+    length(Predicados, Max),
+    append(Predicados, _, Todos).
+
+dato_nodo(Clave, Nodo, Valor) :-
+    (   get_dict(Clave, Nodo, Valor0)
+    ->  Valor = Valor0
+    ;   Valor = 0
+    ).
+
+respuesta_error(E, _{error: Texto}) :-
+    format(atom(Texto), '~q', [E]).
+
+%% Variante para pyswip: la petición y la respuesta viajan como átomos JSON
+atender_json_texto(Texto, Salida) :-
+    catch(( atom_json_dict(Texto, Peticion, [value_string_as(atom)]),
+            (   atender_json(Peticion, Respuesta0)
+            ->  Respuesta = Respuesta0
+            ;   Respuesta = _{error: fallo}
+            ) ),
+          E,
+          respuesta_error(E, Respuesta)),
+    atom_json_dict(Salida, Respuesta, [width(0), as(atom)]).
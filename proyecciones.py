@@ -0,0 +1,337 @@
+"""
+Proyecciones de ahorro y pago de deudas (NumPy)
+Complementa las recomendaciones cualitativas con cifras mes a mes para cada
+perfil: cuándo se alcanza el fondo de emergencia de 3 y 6 meses, en cuántos
+meses se liquida la deuda con el pago actual frente a pagar solo el mínimo, y
+cuánto se habrá ahorrado para cada meta(Tipo, Meses) al llegar su plazo.
+Todo se calcula por columnas para el lote completo, con las fórmulas cerradas
+de amortización en lugar de simular cada perfil mes a mes.
+
+Supuestos:
+  - `deudas_total` es el pago mensual de deudas (como en la interfaz) y el
+    saldo pendiente llega en el campo opcional `saldo_deuda`; sin él no hay
+    proyección de deuda.
+  - El pago mínimo es el interés del mes más PAGO_MINIMO_PCT % del saldo, con
+    un piso de PAGO_MINIMO_PISO.
+  - El ahorro mensual va íntegro al fondo de emergencia y, para las metas, se
+    reparte en partes iguales entre las metas del perfil. Una meta puede
+    traer `monto`; la de tipo fondo_emergencia sin monto apunta a 6 meses.
+"""
+
+import os
+
+import metricas
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+PAGO_MINIMO_PCT = float(os.environ.get('PAGO_MINIMO_PCT', '1'))
+PAGO_MINIMO_PISO = float(os.environ.get('PAGO_MINIMO_PISO', '200'))
+# Horizonte máximo de la serie mes a mes
+PROYECCION_MESES_MAX = int(os.environ.get('PROYECCION_MESES_MAX', '600'))
+
+CAMPOS = ('gasto_total', 'ahorro_mensual', 'meses_fondo', 'deudas_total', 'tasa_interes_apr')
+OBJETIVOS_FONDO = (3, 6)
+# Tolerancia al redondear meses hacia arriba (evita 13 por 12.0000000001)
+EPSILON = 1e-9
+
+
+def _numero(valor):
+    return not isinstance(valor, bool) and isinstance(valor, (int, float))
+
+
+def _lista(columna):
+    """Arreglo -> lista JSON, con NaN como null"""
+    return [None if v != v else v for v in columna.tolist()]
+
+
+def _meses(columna):
+    """Meses fraccionarios -> meses enteros (hacia arriba), NaN como null"""
+    return [None if v != v else int(v) for v in np.ceil(columna - EPSILON).tolist()]
+
+
+def columnas(perfiles):
+    """
+    Columnas NumPy de los campos que usan las proyecciones, más las metas
+    aplanadas (un elemento por meta con el índice de su perfil en `dueno`).
+    Devuelve (columnas, metas, errores) como MotorVectorizado.columnas.
+    """
+    n = len(perfiles)
+    errores = {}
+    valores = {campo: np.zeros(n) for campo in CAMPOS + ('saldo_deuda',)}
+    tiene_saldo = np.zeros(n, dtype=bool)
+    duenos, plazos, montos, tipos = [], [], [], []
+
+    for i, perfil in enumerate(perfiles):
+        if not isinstance(perfil, dict):
+            errores[i] = 'El perfil debe ser un objeto JSON'
+            continue
+        faltante = next((c for c in CAMPOS if not _numero(perfil.get(c))), None)
+        if faltante is not None:
+            errores[i] = f'Campo numérico ausente o inválido: {faltante}'
+            continue
+        saldo = perfil.get('saldo_deuda')
+        if saldo is not None and (not _numero(saldo) or saldo < 0):
+            errores[i] = 'saldo_deuda debe ser un número no negativo'
+            continue
+        metas = perfil.get('metas') or []
+        if not isinstance(metas, list) or not all(
+                isinstance(m, dict) and _numero(m.get('meses')) and _numero(m.get('monto', 0))
+                for m in metas):
+            errores[i] = 'Cada meta debe tener "tipo" y "meses" numérico (y "monto" opcional)'
+            continue
+        for campo in CAMPOS:
+            valores[campo][i] = perfil[campo]
+        if saldo is not None:
+            valores['saldo_deuda'][i] = saldo
+            tiene_saldo[i] = True
+        for meta in metas:
+            duenos.append(i)
+            plazos.append(meta['meses'])
+            montos.append(meta.get('monto', np.nan))
+            tipos.append(str(meta.get('tipo')))
+
+    valores['tiene_saldo'] = tiene_saldo
+    metas = {
+        'dueno': np.array(duenos, dtype=np.intp),
+        'meses': np.array(plazos, dtype=np.float64),
+        'monto': np.array(montos, dtype=np.float64),
+        'tipo': tipos
+    }
+    return valores, metas, errores
+
+
+# --------- Fórmulas por columnas ---------
+
+def meses_para_juntar(faltante, aporte):
+    """Meses para juntar `faltante` aportando `aporte` al mes (NaN si nunca)"""
+    meses = np.full(faltante.shape, np.nan)
+    listo = faltante <= 0
+    meses[listo] = 0
+    posible = ~listo & (aporte > 0)
+    meses[posible] = faltante[posible] / aporte[posible]
+    return meses
+
+
+def meses_amortizacion(saldo, tasa, pago):
+    """
+    Meses (fraccionarios) para liquidar `saldo` con un pago fijo y tasa
+    mensual `tasa`: n = -ln(1 - r·B/P) / ln(1 + r). NaN si el pago no cubre
+    el interés del primer mes.
+    """
+    meses = np.full(saldo.shape, np.nan)
+    meses[saldo <= 0] = 0
+    pendiente = saldo > 0
+    sin_tasa = pendiente & (tasa == 0) & (pago > 0)
+    meses[sin_tasa] = saldo[sin_tasa] / pago[sin_tasa]
+    con_tasa = pendiente & (tasa > 0) & (pago > tasa * saldo)
+    r, b, p = tasa[con_tasa], saldo[con_tasa], pago[con_tasa]
+    meses[con_tasa] = -np.log1p(-r * b / p) / np.log1p(r)
+    return meses
+
+
+def saldo_amortizado(saldo, tasa, pago, meses):
+    """Saldo tras `meses` pagos fijos (matrices por difusión), sin bajar de 0"""
+    crecimiento = (1 + tasa) ** meses
+    acumulado = np.where(tasa > 0, (crecimiento - 1) / np.where(tasa > 0, tasa, 1), meses)
+    return np.maximum(saldo * crecimiento - pago * acumulado, 0)
+
+
+def tramos_minimo(saldo, tasa, pct=PAGO_MINIMO_PCT, piso=PAGO_MINIMO_PISO):
+    """
+    El pago mínimo (interés + pct·saldo) reduce el saldo un pct cada mes hasta
+    que cae bajo el piso; desde ahí es un pago fijo igual al piso. Devuelve los
+    meses del primer tramo y el saldo con el que empieza el segundo.
+    """
+    q = pct / 100
+    cuota = (tasa + q) * saldo
+    k = np.zeros(saldo.shape)
+    encima = cuota >= piso
+    # Primer k con (r + q)·B·(1 - q)^k < piso
+    k[encima] = np.floor(np.log(piso / cuota[encima]) / np.log1p(-q)) + 1
+    return k, saldo * (1 - q) ** k
+
+
+def proyectar_minimo(saldo, tasa, pct=PAGO_MINIMO_PCT, piso=PAGO_MINIMO_PISO):
+    """(meses, intereses, pago inicial) pagando solo el mínimo"""
+    q = pct / 100
+    k, restante = tramos_minimo(saldo, tasa, pct, piso)
+    intereses_tramo = tasa * saldo * (1 - (1 - q) ** k) / q
+    fijo = meses_amortizacion(restante, tasa, np.full(saldo.shape, piso))
+    meses = np.where(saldo > 0, k + fijo, 0)
+    intereses = intereses_tramo + np.maximum(piso * fijo - restante, 0)
+    pago_inicial = np.minimum(np.maximum((tasa + q) * saldo, piso), saldo * (1 + tasa))
+    return meses, intereses, pago_inicial
+
+
+def serie_minimo(saldo, tasa, meses, pct=PAGO_MINIMO_PCT, piso=PAGO_MINIMO_PISO):
+    """Saldo mes a mes (N×M) pagando solo el mínimo"""
+    k, restante = tramos_minimo(saldo, tasa, pct, piso)
+    k, restante, tasa, saldo = k[:, None], restante[:, None], tasa[:, None], saldo[:, None]
+    primer_tramo = saldo * (1 - pct / 100) ** np.minimum(meses, k)
+    segundo_tramo = saldo_amortizado(restante, tasa, piso, np.maximum(meses - k, 0))
+    return np.where(meses <= k, primer_tramo, segundo_tramo)
+
+
+# --------- Proyección por lotes ---------
+
+def proyectar(perfiles, meses=0):
+    """
+    Proyecciones de un lote de perfiles. Devuelve una tupla (proyeccion,
+    error) por perfil, en el mismo orden. Con `meses` > 0 cada proyección
+    incluye la serie mes a mes (fondo y saldo de deuda) de ese horizonte.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('NumPy no está instalado: las proyecciones no están disponibles')
+    if not perfiles:
+        return []
+    c, metas, errores = columnas(perfiles)
+    gasto, ahorro = c['gasto_total'], c['ahorro_mensual']
+    fondo = np.maximum(c['meses_fondo'], 0) * gasto
+    aporte_fondo = np.maximum(ahorro, 0)
+
+    objetivos = {}
+    for objetivo in OBJETIVOS_FONDO:
+        faltante = np.maximum(objetivo * gasto - fondo, 0)
+        objetivos[objetivo] = (faltante, meses_para_juntar(faltante, aporte_fondo))
+
+    saldo, pago = c['saldo_deuda'], c['deudas_total']
+    tasa = np.maximum(c['tasa_interes_apr'], 0) / 1200
+    meses_actual = meses_amortizacion(saldo, tasa, pago)
+    intereses_actual = np.where(np.isnan(meses_actual), np.nan, np.maximum(pago * meses_actual - saldo, 0))
+    meses_minimo, intereses_minimo, pago_minimo = proyectar_minimo(saldo, tasa)
+
+    # Las metas aplanadas se reparten el ahorro de su perfil en partes iguales
+    dueno = metas['dueno']
+    por_perfil = np.bincount(dueno, minlength=len(perfiles))
+    aporte_meta = aporte_fondo[dueno] / np.maximum(por_perfil[dueno], 1)
+    acumulado = aporte_meta * metas['meses']
+    monto = metas['monto'].copy()
+    es_fondo = np.array([tipo == 'fondo_emergencia' for tipo in metas['tipo']], dtype=bool)
+    sin_monto = np.isnan(monto) & es_fondo
+    monto[sin_monto] = objetivos[OBJETIVOS_FONDO[-1]][0][dueno[sin_monto]]
+    progreso = np.full(monto.shape, np.nan)
+    con_monto = ~np.isnan(monto)
+    np.divide(acumulado, monto, out=progreso, where=con_monto & (monto > 0))
+    progreso[con_monto & (monto <= 0)] = 1
+    progreso = np.minimum(progreso, 1)
+    meses_meta = meses_para_juntar(np.where(con_monto, monto, np.nan), aporte_meta)
+    meses_meta[~con_monto] = np.nan
+    aporte_necesario = np.full(monto.shape, np.nan)
+    np.divide(monto, metas['meses'], out=aporte_necesario, where=con_monto & (metas['meses'] > 0))
+    plazo = np.where(metas['meses'] < 12, 'corto', np.where(metas['meses'] <= 60, 'mediano', 'largo'))
+
+    serie = None
+    if meses > 0:
+        horizonte = np.arange(min(meses, PROYECCION_MESES_MAX) + 1, dtype=np.float64)
+        serie = {
+            'fondo': fondo[:, None] + aporte_fondo[:, None] * horizonte,
+            'deuda_pago_actual': saldo_amortizado(saldo[:, None], tasa[:, None], pago[:, None], horizonte),
+            'deuda_pago_minimo': serie_minimo(saldo, tasa, horizonte)
+        }
+
+    # Conversión a listas una sola vez por columna; el armado de dicts es lo único por perfil
+    fondo_l, gasto_l = _lista(fondo), _lista(gasto)
+    objetivos_l = {o: (_lista(f), _meses(m)) for o, (f, m) in objetivos.items()}
+    deuda_l = {
+        'saldo': _lista(saldo), 'pago': _lista(pago), 'meses': _meses(meses_actual),
+        'intereses': _lista(np.round(intereses_actual, 2)), 'pago_minimo': _lista(np.round(pago_minimo, 2)),
+        'meses_minimo': _meses(meses_minimo), 'intereses_minimo': _lista(np.round(intereses_minimo, 2))
+    }
+    metas_l = list(zip(
+        dueno.tolist(), metas['tipo'], _lista(metas['meses']), plazo.tolist(),
+        _lista(np.round(aporte_meta, 2)), _lista(np.round(acumulado, 2)), _lista(monto),
+        _lista(np.round(progreso, 4)), _meses(meses_meta), _lista(np.round(aporte_necesario, 2))
+    ))
+    metas_por_perfil = [[] for _ in perfiles]
+    for d, tipo, plazo_meses, tipo_plazo, aporte, junto, objetivo, avance, necesarios, necesario in metas_l:
+        metas_por_perfil[d].append({
+            'tipo': tipo,
+            'meses': plazo_meses,
+            'plazo': tipo_plazo,
+            'aporte_mensual': aporte,
+            'ahorro_al_plazo': junto,
+            'monto': objetivo,
+            'progreso': avance,
+            'meses_necesarios': necesarios,
+            'aporte_necesario': necesario,
+            'alcanzable': None if objetivo is None else necesarios is not None and necesarios <= plazo_meses
+        })
+    series_l = None if serie is None else {nombre: np.round(m, 2).tolist() for nombre, m in serie.items()}
+
+    resultados = []
+    for i in range(len(perfiles)):
+        if i in errores:
+            resultados.append((None, errores[i]))
+            continue
+        proyeccion = {
+            'fondo_emergencia': {
+                'saldo': fondo_l[i],
+                'gasto_mensual': gasto_l[i],
+                'objetivos': [
+                    {'meses_gasto': o, 'faltante': objetivos_l[o][0][i], 'meses': objetivos_l[o][1][i]}
+                    for o in OBJETIVOS_FONDO
+                ]
+            },
+            'deuda': None,
+            'metas': metas_por_perfil[i]
+        }
+        if c['tiene_saldo'][i]:
+            actual, minimo = deuda_l['meses'][i], deuda_l['meses_minimo'][i]
+            proyeccion['deuda'] = {
+                'saldo': deuda_l['saldo'][i],
+                'pago_actual': {'pago': deuda_l['pago'][i], 'meses': actual, 'intereses': deuda_l['intereses'][i]},
+                'pago_minimo': {'pago': deuda_l['pago_minimo'][i], 'meses': minimo,
+                                'intereses': deuda_l['intereses_minimo'][i]},
+                'meses_ahorrados': None if actual is None or minimo is None else minimo - actual
+            }
+        if series_l is not None:
+            proyeccion['serie'] = {nombre: filas[i] for nombre, filas in series_l.items()}
+            if not c['tiene_saldo'][i]:
+                del proyeccion['serie']['deuda_pago_actual'], proyeccion['serie']['deuda_pago_minimo']
+        resultados.append((proyeccion, None))
+    return resultados
+
+
+def responder(data, meses=None):
+    """
+    (estado HTTP, cuerpo) de /api/proyecciones para el JSON recibido: un
+    perfil, o un lote como arreglo o {"perfiles": [...]}. `meses` es el
+    valor de ?meses= (texto) para incluir la serie mes a mes.
+    """
+    if not NUMPY_AVAILABLE:
+        return 503, {'error': 'NumPy no está instalado: las proyecciones no están disponibles'}
+    try:
+        horizonte = int(meses) if meses not in (None, '') else 0
+    except ValueError:
+        return 400, {'error': f'meses debe ser un entero: {meses}'}
+    if horizonte < 0 or horizonte > PROYECCION_MESES_MAX:
+        return 400, {'error': f'meses debe estar entre 0 y {PROYECCION_MESES_MAX}'}
+
+    lote = isinstance(data, list) or (isinstance(data, dict) and 'perfiles' in data)
+    perfiles = data.get('perfiles') if isinstance(data, dict) and lote else data
+    if lote and not isinstance(perfiles, list):
+        return 400, {'error': 'Se esperaba un arreglo JSON de perfiles o {"perfiles": [...]}'}
+    if not lote:
+        if not isinstance(data, dict):
+            return 400, {'error': 'El perfil debe ser un objeto JSON'}
+        perfiles = [data]
+
+    with metricas.etapa('proyecciones'):
+        resultados = proyectar(perfiles, horizonte)
+    if not lote:
+        proyeccion, error = resultados[0]
+        if error is not None:
+            return 400, {'error': error}
+        return 200, {'success': True, 'proyeccion': proyeccion}
+    return 200, {
+        'success': True,
+        'total': len(perfiles),
+        'proyecciones': [
+            {'indice': i, 'error': error} if error is not None else {'indice': i, 'proyeccion': proyeccion}
+            for i, (proyeccion, error) in enumerate(resultados)
+        ]
+    }
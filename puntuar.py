@@ -0,0 +1,345 @@
+"""
+Puntuación masiva fuera de línea (sin HTTP)
+Lee perfiles de un CSV o Parquet por bloques, reparte los bloques entre un
+pool de procesos (cada uno con su motor: vectorizado o un trabajador
+SWI-Prolog) y escribe una parte por bloque en el directorio de salida, con
+los ids de las reglas disparadas y sus categorías. La memoria queda acotada
+por el número de bloques en vuelo, y una ejecución interrumpida se reanuda
+saltando las partes ya escritas.
+
+Columnas de entrada: las de perfiles.CAMPOS_REQUERIDOS más los campos
+opcionales del perfil de ejemplo (booleanos, nivel_conocimiento, metas...).
+En CSV, `metas` es JSON: [{"tipo": "auto", "meses": 24}].
+
+Ejemplos:
+    python puntuar.py clientes.csv resultados/ --procesos 8
+    python puntuar.py clientes.parquet resultados/ --motor prolog --id-columna cliente_id
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    PYARROW_AVAILABLE = False
+
+from perfiles import CAMPOS_REQUERIDOS, EJEMPLO_PERFIL, validar_perfil
+
+BLOQUE_FILAS = int(os.environ.get('PUNTUAR_BLOQUE', '10000'))
+PROLOG_TIMEOUT = float(os.environ.get('SWIPL_TIMEOUT', '15'))
+MANIFIESTO = '_manifiesto.json'
+VERDADEROS = {'true', '1', 'si', 'sí', 'yes', 't', 'y', 's'}
+FALSOS = {'false', '0', 'no', 'f', 'n'}
+
+
+# --------- Esquema ---------
+
+def _tipo_campo(campo):
+    if campo in CAMPOS_REQUERIDOS:
+        return 'numero'
+    valor = EJEMPLO_PERFIL.get(campo)
+    if isinstance(valor, bool):
+        return 'booleano'
+    if isinstance(valor, (int, float)):
+        return 'numero'
+    if isinstance(valor, list):
+        return 'json'
+    return 'texto'
+
+
+CAMPOS = {campo: _tipo_campo(campo) for campo in list(CAMPOS_REQUERIDOS) + list(EJEMPLO_PERFIL)}
+
+
+def convertir_valor(tipo, valor):
+    """Convierte una celda (texto de CSV o valor de Parquet) al tipo del perfil"""
+    if not isinstance(valor, str):
+        return valor
+    texto = valor.strip()
+    if tipo == 'numero':
+        numero = float(texto)
+        return int(numero) if numero.is_integer() and '.' not in texto else numero
+    if tipo == 'booleano':
+        if texto.lower() in VERDADEROS:
+            return True
+        if texto.lower() in FALSOS:
+            return False
+        raise ValueError(f'booleano inválido: {valor!r}')
+    if tipo == 'json':
+        return json.loads(texto)
+    return texto
+
+
+def fila_a_perfil(fila):
+    """Perfil (dict) de una fila; las celdas vacías se omiten. Devuelve (perfil, error)"""
+    perfil = {}
+    for campo, tipo in CAMPOS.items():
+        valor = fila.get(campo)
+        if valor is None or valor == '':
+            continue
+        try:
+            perfil[campo] = convertir_valor(tipo, valor)
+        except ValueError as e:
+            return None, f'Campo {campo}: {e}'
+    return perfil, validar_perfil(perfil)
+
+
+# --------- Entrada ---------
+
+def leer_bloques(ruta, filas):
+    """Itera listas de hasta `filas` filas (dicts) del CSV o Parquet"""
+    if ruta.endswith('.parquet'):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError('pyarrow no está instalado: no se puede leer Parquet')
+        archivo = pq.ParquetFile(ruta)
+        for lote in archivo.iter_batches(batch_size=filas):
+            yield lote.to_pylist()
+        return
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        lector = csv.DictReader(f)
+        while True:
+            bloque = list(islice(lector, filas))
+            if not bloque:
+                return
+            yield bloque
+
+
+def filas_totales(ruta):
+    """Filas de la entrada si se conocen sin leerla (metadatos de Parquet)"""
+    if ruta.endswith('.parquet') and PYARROW_AVAILABLE:
+        return pq.ParquetFile(ruta).metadata.num_rows
+    return None
+
+
+# --------- Procesos del pool ---------
+
+_motor = None
+_categorias = None
+
+
+def _inicializar(motor, archivo_prolog):
+    """Crea el motor de este proceso una sola vez"""
+    global _motor, _categorias
+    from categorias import tabla
+    _categorias = {regla_id: regla.categoria for regla_id, regla in tabla.reglas.items()}
+    if motor == 'vectorizado':
+        from motor_vectorizado import obtener_motor
+        _motor = obtener_motor().evaluar_ids
+    else:
+        from arranque import get_swipl_cmd
+        from lotes import en_bloques, LOTE_TAMANO
+        from pool_swipl import TrabajadorSwipl, ErrorPool
+        trabajador = TrabajadorSwipl(get_swipl_cmd(), archivo_prolog)
+        trabajador.iniciar()
+
+        def evaluar(perfiles):
+            resultados = []
+            for sub in en_bloques(perfiles, LOTE_TAMANO):
+                try:
+                    resultados.extend(trabajador.consultar_lote(sub, PROLOG_TIMEOUT))
+                except ErrorPool as e:
+                    resultados.extend([(None, f'Error ejecutando Prolog: {e}')] * len(sub))
+            return resultados
+        _motor = evaluar
+
+
+def _columnas(inicio, ids_fila, resultados):
+    """Resultados de un bloque en columnas: fila, id, reglas, categorias, error"""
+    columnas = {'fila': [], 'id': [], 'reglas': [], 'categorias': [], 'error': []}
+    for desplazamiento, (id_fila, (ids, error)) in enumerate(zip(ids_fila, resultados)):
+        columnas['fila'].append(inicio + desplazamiento)
+        columnas['id'].append(id_fila)
+        columnas['reglas'].append(ids or [])
+        columnas['categorias'].append(sorted({_categorias.get(i, 'general') for i in ids or []}))
+        columnas['error'].append(error)
+    return columnas
+
+
+def _escribir_parte(ruta, columnas, formato):
+    """Escribe la parte en un temporal y la renombra: una parte existe completa o no existe"""
+    temporal = ruta + '.tmp'
+    if formato == 'parquet':
+        tabla = pa.table({
+            'fila': pa.array(columnas['fila'], pa.int64()),
+            'id': pa.array([None if v is None else str(v) for v in columnas['id']], pa.string()),
+            'reglas': pa.array(columnas['reglas'], pa.list_(pa.string())),
+            'categorias': pa.array(columnas['categorias'], pa.list_(pa.string())),
+            'error': pa.array(columnas['error'], pa.string()),
+        })
+        pq.write_table(tabla, temporal)
+    else:
+        with open(temporal, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['fila', 'id', 'reglas', 'categorias', 'error'])
+            for fila in zip(*(columnas[c] for c in ('fila', 'id', 'reglas', 'categorias', 'error'))):
+                escritor.writerow([fila[0], '' if fila[1] is None else fila[1], '|'.join(fila[2]), '|'.join(fila[3]), fila[4] or ''])
+    os.replace(temporal, ruta)
+
+
+def puntuar_bloque(ruta, inicio, filas, id_columna, formato):
+    """Evalúa un bloque de filas y escribe su parte. Devuelve (filas, errores)"""
+    perfiles, posiciones, resultados = [], [], []
+    for fila in filas:
+        perfil, error = fila_a_perfil(fila)
+        if error:
+            resultados.append((None, error))
+        else:
+            posiciones.append(len(resultados))
+            resultados.append(None)
+            perfiles.append(perfil)
+    for posicion, resultado in zip(posiciones, _motor(perfiles)):
+        resultados[posicion] = resultado
+    ids_fila = [fila.get(id_columna) for fila in filas] if id_columna else [None] * len(filas)
+    _escribir_parte(ruta, _columnas(inicio, ids_fila, resultados), formato)
+    return len(filas), sum(1 for _, error in resultados if error)
+
+
+# --------- Coordinación ---------
+
+def huella_entrada(ruta, args, formato):
+    """Identifica la entrada y la configuración; reanudar exige que coincida"""
+    stat = os.stat(ruta)
+    return {
+        'entrada': os.path.abspath(ruta),
+        'tamano': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'bloque': args.bloque,
+        'motor': args.motor,
+        'formato': formato,
+        'id_columna': args.id_columna
+    }
+
+
+def preparar_salida(directorio, huella, reiniciar):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, MANIFIESTO)
+    if os.path.exists(ruta) and not reiniciar:
+        with open(ruta, encoding='utf-8') as f:
+            anterior = json.load(f)
+        if anterior != huella:
+            raise RuntimeError(f'{directorio} tiene resultados de otra entrada o configuración (usa --reiniciar)')
+        return
+    for nombre in os.listdir(directorio):
+        if nombre.startswith('parte-'):
+            os.remove(os.path.join(directorio, nombre))
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(huella, f, indent=2)
+
+
+class Progreso:
+    """Informe periódico de filas, throughput y tiempo restante en stderr"""
+
+    def __init__(self, total, intervalo):
+        self.total = total
+        self.intervalo = intervalo
+        self.inicio = time.perf_counter()
+        self.ultimo = self.inicio
+        self.filas = 0
+        self.saltadas = 0
+        self.errores = 0
+        self.bloques = 0
+
+    def sumar(self, filas, errores):
+        self.filas += filas
+        self.errores += errores
+        self.bloques += 1
+        ahora = time.perf_counter()
+        if ahora - self.ultimo >= self.intervalo:
+            self.ultimo = ahora
+            self.informar()
+
+    def saltar(self, filas):
+        self.saltadas += filas
+
+    def informar(self, final=False):
+        segundos = time.perf_counter() - self.inicio
+        ritmo = self.filas / segundos if segundos > 0 else 0
+        partes = [f'{self.filas} filas', f'{ritmo:,.0f} filas/s', f'{self.errores} con error']
+        if self.saltadas:
+            partes.append(f'{self.saltadas} ya puntuadas')
+        if self.total and ritmo and not final:
+            restantes = self.total - self.filas - self.saltadas
+            partes.append(f'~{restantes / ritmo:.0f}s restantes')
+        simbolo = '✓' if final else '…'
+        print(f"{simbolo} {', '.join(partes)} ({segundos:.1f}s)", file=sys.stderr, flush=True)
+
+    def resumen(self):
+        segundos = time.perf_counter() - self.inicio
+        return {
+            'filas': self.filas,
+            'saltadas': self.saltadas,
+            'errores': self.errores,
+            'bloques': self.bloques,
+            'segundos': round(segundos, 3),
+            'filas_por_segundo': round(self.filas / segundos, 1) if segundos > 0 else None
+        }
+
+
+def puntuar(args):
+    formato = args.formato or ('parquet' if PYARROW_AVAILABLE else 'csv')
+    if formato == 'parquet' and not PYARROW_AVAILABLE:
+        raise RuntimeError('pyarrow no está instalado: usa --formato csv')
+    huella = huella_entrada(args.entrada, args, formato)
+    preparar_salida(args.salida, huella, args.reiniciar)
+
+    archivo_prolog = None
+    if args.motor == 'prolog':
+        from arranque import preparar_base
+        archivo_prolog = preparar_base().ruta
+
+    progreso = Progreso(filas_totales(args.entrada), args.intervalo)
+    en_vuelo = set()
+    # Bloques en vuelo acotados: la lectura espera a que terminen los anteriores
+    limite = args.procesos * 2
+    with ProcessPoolExecutor(args.procesos, initializer=_inicializar,
+                             initargs=(args.motor, archivo_prolog)) as pool:
+        inicio = 0
+        for numero, filas in enumerate(leer_bloques(args.entrada, args.bloque)):
+            ruta = os.path.join(args.salida, f'parte-{numero:06d}.{formato}')
+            if os.path.exists(ruta):
+                progreso.saltar(len(filas))
+            else:
+                while len(en_vuelo) >= limite:
+                    hechos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        progreso.sumar(*futuro.result())
+                en_vuelo.add(pool.submit(puntuar_bloque, ruta, inicio, filas, args.id_columna, formato))
+            inicio += len(filas)
+        for futuro in en_vuelo:
+            progreso.sumar(*futuro.result())
+    progreso.informar(final=True)
+    return progreso.resumen()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Puntuación masiva de perfiles desde CSV o Parquet')
+    parser.add_argument('entrada', help='archivo .csv o .parquet con un perfil por fila')
+    parser.add_argument('salida', help='directorio de resultados (una parte por bloque)')
+    parser.add_argument('--motor', choices=('vectorizado', 'prolog'), default='vectorizado')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--bloque', type=int, default=BLOQUE_FILAS, help='filas por bloque (y por parte)')
+    parser.add_argument('--formato', choices=('parquet', 'csv'), help='formato de las partes (parquet si hay pyarrow)')
+    parser.add_argument('--id-columna', help='columna de la entrada que se copia a la salida como `id`')
+    parser.add_argument('--intervalo', type=float, default=5, help='segundos entre informes de progreso')
+    parser.add_argument('--reiniciar', action='store_true', help='descartar las partes de una ejecución anterior')
+    args = parser.parse_args()
+
+    try:
+        resumen = puntuar(args)
+    except (OSError, RuntimeError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        raise SystemExit(1)
+    print(json.dumps(resumen, indent=2))
+
+
+if __name__ == '__main__':
+    main()
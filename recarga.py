@@ -0,0 +1,314 @@
+"""
+Recarga en caliente de asistente_finanzas.pl
+Un hilo vigila la fuente; cuando cambia, compila la nueva versión (QLF con
+nombre por contenido, ver arranque.py), relee las reglas de la misma copia y
+crea en segundo plano un motor nuevo (el pool de trabajadores de cada
+backend) con ella. Solo si la versión pasa verificar_artefacto se publica
+como vigente, y el cambio es un único reemplazo de referencia; la primera
+versión se verifica igual. Cada petición toma una versión con `usar()` y la
+conserva hasta el final: las que estaban en curso terminan con la versión
+anterior, cuyo motor se cierra (y su artefacto se borra) cuando sale la última.
+KB_RECARGA fija los segundos entre revisiones (0 desactiva la vigilancia).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metricas
+from arranque import preparar_base, descartar_artefacto, swipl_detectado, get_swipl_cmd, KB_PRECOMPILAR
+from categorias import TablaReglas
+from reglas import cargar_reglas, condiciones_unicas, evaluar_reglas, PROLOG_FILE
+
+RECARGA_INTERVALO = float(os.environ.get('KB_RECARGA', '2'))
+# Perfiles sintéticos que se evalúan al verificar cada versión
+VERIFICAR_MUESTRAS = int(os.environ.get('KB_VERIFICAR_MUESTRAS', '200'))
+CABECERA_VERSION = 'X-Version-Reglas'
+
+
+class ErrorRecarga(RuntimeError):
+    """La nueva versión de la base no se pudo compilar o no respondió"""
+
+
+class VersionBase:
+    """Una versión inmutable de la base: artefacto, reglas, tabla y motor propios"""
+
+    def __init__(self, artefacto, reglas, motor=None):
+        self.id = artefacto.sha256[:12]
+        self.artefacto = artefacto
+        self.reglas = reglas
+        self.tabla = TablaReglas(reglas)
+        self.condiciones = condiciones_unicas(reglas)
+        self.motor = motor
+        self.cargada = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.activas = 0
+        self.retirada = False
+        self._vectorizado = None
+        self._lock = threading.Lock()
+        metricas.inicializar_reglas(self.tabla.reglas)
+
+    def vectorizado(self):
+        """Motor NumPy compilado con las reglas de esta versión"""
+        if self._vectorizado is None:
+            from motor_vectorizado import MotorVectorizado, NUMPY_AVAILABLE
+            if not NUMPY_AVAILABLE:
+                raise RuntimeError('NumPy no está instalado: el motor vectorizado no está disponible')
+            with self._lock:
+                if self._vectorizado is None:
+                    self._vectorizado = MotorVectorizado(self.reglas)
+        return self._vectorizado
+
+    def estado(self):
+        return {
+            'version': self.id,
+            'archivo': os.path.basename(self.artefacto.ruta),
+            'tipo': self.artefacto.tipo,
+            'sha256': self.artefacto.sha256,
+            'compilado': self.artefacto.compilado,
+            'cargada': self.cargada,
+            'reglas': len(self.tabla.reglas),
+            'peticiones_activas': self.activas
+        }
+
+
+def _resultado(item):
+    ids, error = item
+    return (sorted(ids), None) if error is None else (None, 'error')
+
+
+def _resultado_python(reglas, perfil):
+    try:
+        return evaluar_reglas(reglas, perfil), None
+    except (ValueError, TypeError, ArithmeticError):
+        return None, 'error'
+
+
+def _diferencia(descripcion, muestra, esperados, obtenidos):
+    diferentes = [perfil for perfil, a, b in zip(muestra, esperados, obtenidos) if _resultado(a) != _resultado(b)]
+    if diferentes:
+        raise ErrorRecarga(
+            f'{descripcion} en {len(diferentes)} de {len(muestra)} perfiles de prueba, por ejemplo: '
+            f'{json.dumps(diferentes[0], ensure_ascii=False)}'
+        )
+
+
+def verificar_artefacto(version, muestras=VERIFICAR_MUESTRAS):
+    """
+    Carga el artefacto de la versión en un trabajador SWI-Prolog aparte y
+    evalúa el perfil de ejemplo y `muestras` perfiles sintéticos dos veces:
+    con la pasada única (recomendaciones_ids/2) y con recommend/2 cláusula
+    por cláusula. Las dos deben coincidir en cada perfil (disparadas//2 copia
+    los umbrales de recommend/2 y puede quedar desfasada) y con la evaluación
+    en Python de las reglas que se leyeron de la misma copia de la fuente
+    (la que usan la caché, las sesiones y el motor vectorizado).
+    """
+    from perfiles import EJEMPLO_PERFIL, perfiles_muestra
+    from pool_swipl import TrabajadorSwipl, ErrorPool, resultados_lote
+    muestra = [dict(EJEMPLO_PERFIL)] + perfiles_muestra(muestras)
+    trabajador = TrabajadorSwipl(get_swipl_cmd(), version.artefacto.ruta)
+    try:
+        una_pasada = trabajador.consultar_lote(muestra, 60)
+        referencia = resultados_lote(trabajador.intercambiar({'perfiles': muestra, 'referencia': True}, 60))
+    except ErrorPool as e:
+        raise ErrorRecarga(f'La nueva base no respondió: {e}')
+    finally:
+        trabajador.detener()
+    if una_pasada[0][1] is not None:
+        raise ErrorRecarga(f'La nueva base rechazó el perfil de ejemplo: {una_pasada[0][1]}')
+    _diferencia('recomendaciones_ids/2 no coincide con recommend/2 (disparadas//2 desfasada)',
+                muestra, referencia, una_pasada)
+    _diferencia('Prolog no coincide con las reglas leídas en Python',
+                muestra, [_resultado_python(version.reglas, perfil) for perfil in muestra], una_pasada)
+    desconocidos = {i for ids, _ in una_pasada if ids for i in ids} - set(version.tabla.reglas)
+    if desconocidos:
+        raise ErrorRecarga(f'Prolog devolvió reglas sin regla/4: {sorted(desconocidos)}')
+
+
+class BaseConocimiento:
+    """
+    Versión vigente de la base de conocimiento de un backend.
+    `crear_motor(version)` construye el motor de una versión (o None si el
+    backend no mantiene procesos) y `cerrar_motor(motor)` lo libera.
+    """
+
+    def __init__(self, archivo=PROLOG_FILE, crear_motor=None, cerrar_motor=None, intervalo=RECARGA_INTERVALO):
+        self.archivo = os.path.abspath(archivo)
+        self.crear_motor = crear_motor
+        self.cerrar_motor = cerrar_motor
+        self.intervalo = intervalo
+        self.recargas = 0
+        self.fallidas = 0
+        self.ultimo_error = None
+        self._actual = None
+        self._firma = None
+        self._retiradas = []
+        self._al_cambiar = []
+        self._lock = threading.Lock()
+        self._recarga_lock = threading.Lock()
+        self._hilo = None
+
+    def _firma_fuente(self):
+        try:
+            st = os.stat(self.archivo)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def al_cambiar(self, funcion):
+        """Registra `funcion(nueva, anterior)`, llamada tras publicar cada versión"""
+        self._al_cambiar.append(funcion)
+
+    def _construir(self, recarga):
+        artefacto = preparar_base(self.archivo)
+        try:
+            if recarga and KB_PRECOMPILAR and artefacto.tipo != 'qlf' and swipl_detectado() is not None:
+                raise ErrorRecarga('qcompile falló; se conserva la versión anterior')
+            try:
+                # De la misma copia que se compiló, no de la fuente, que pudo cambiar
+                reglas = cargar_reglas(artefacto.fuente)
+            except (OSError, ValueError) as e:
+                raise ErrorRecarga(f'No se pudieron leer las reglas: {e}')
+            version = VersionBase(artefacto, reglas)
+            if swipl_detectado() is not None:
+                verificar_artefacto(version)
+            if self.crear_motor is not None:
+                version.motor = self.crear_motor(version)
+        except Exception:
+            self._descartar(artefacto, rechazado=True)
+            raise
+        return version
+
+    def _descartar(self, artefacto, rechazado=False):
+        """Borra el artefacto de una versión retirada si ninguna versión viva lo usa"""
+        with self._lock:
+            vivas = ([self._actual] if self._actual is not None else []) + self._retiradas
+            if any(v.artefacto.ruta == artefacto.ruta for v in vivas):
+                return
+        try:
+            descartar_artefacto(artefacto, self.archivo, rechazado)
+        except OSError as e:
+            print(f"⚠️  No se pudo borrar el artefacto {os.path.basename(artefacto.ruta)}: {e}")
+
+    def actual(self):
+        """Versión vigente; la primera llamada la construye"""
+        if self._actual is None:
+            with self._recarga_lock:
+                if self._actual is None:
+                    firma = self._firma_fuente()
+                    version = self._construir(recarga=False)
+                    with self._lock:
+                        self._actual, self._firma = version, firma
+                    self.vigilar()
+        return self._actual
+
+    def vigente(self):
+        """Versión vigente sin construirla (None antes de la primera petición)"""
+        return self._actual
+
+    @contextmanager
+    def usar(self):
+        """Fija la versión vigente durante el bloque `with`"""
+        self.actual()
+        with self._lock:
+            version = self._actual
+            version.activas += 1
+        try:
+            yield version
+        finally:
+            self._soltar(version)
+
+    def _soltar(self, version):
+        with self._lock:
+            version.activas -= 1
+            cerrar = version.retirada and version.activas == 0 and version in self._retiradas
+            if cerrar:
+                self._retiradas.remove(version)
+        if cerrar:
+            self._cerrar(version)
+            self._descartar(version.artefacto)
+
+    def _cerrar(self, version):
+        if version.motor is not None and self.cerrar_motor is not None:
+            try:
+                self.cerrar_motor(version.motor)
+            except Exception as e:
+                print(f"⚠️  Error cerrando el motor de la versión {version.id}: {e}")
+
+    def recargar(self, forzar=False):
+        """
+        Publica una nueva versión si la fuente cambió (o si `forzar`).
+        Devuelve True si hubo cambio; un fallo deja vigente la versión anterior.
+        """
+        with self._recarga_lock:
+            firma = self._firma_fuente()
+            if self._actual is not None and not forzar and firma == self._firma:
+                return False
+            inicio = time.perf_counter()
+            try:
+                nueva = self._construir(recarga=self._actual is not None)
+            except Exception as e:
+                self.fallidas += 1
+                self.ultimo_error = str(e)
+                self._firma = firma
+                metricas.contar_error('recarga')
+                print(f"✗ No se recargó {os.path.basename(self.archivo)}: {e}")
+                return False
+            with self._lock:
+                anterior, self._actual = self._actual, nueva
+                self._firma = firma
+                self.recargas += 1
+                self.ultimo_error = None
+                cerrar = False
+                if anterior is not None:
+                    anterior.retirada = True
+                    cerrar = anterior.activas == 0
+                    if not cerrar:
+                        self._retiradas.append(anterior)
+            metricas.observar_etapa('recarga_base', time.perf_counter() - inicio)
+        if anterior is not None and cerrar:
+            self._cerrar(anterior)
+            self._descartar(anterior.artefacto)
+        for funcion in self._al_cambiar:
+            funcion(nueva, anterior)
+        if anterior is not None:
+            print(f"✓ Base de conocimiento recargada: versión {anterior.id} -> {nueva.id}")
+        return True
+
+    def _vigilar(self):
+        while True:
+            time.sleep(self.intervalo)
+            if self._actual is None:
+                continue
+            try:
+                self.recargar()
+            except Exception as e:
+                print(f"⚠️  Error vigilando la base de conocimiento: {e}")
+
+    def vigilar(self):
+        """Arranca el hilo que revisa la fuente cada `intervalo` segundos"""
+        if self.intervalo <= 0 or self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._vigilar, name='recarga-base', daemon=True)
+        self._hilo.start()
+
+    def estado(self):
+        """Resumen para /api/health"""
+        version = self._actual
+        datos = version.estado() if version is not None else {}
+        datos.update({
+            'recargas': self.recargas,
+            'recargas_fallidas': self.fallidas,
+            'ultimo_error': self.ultimo_error,
+            'versiones_retiradas_activas': len(self._retiradas),
+            'vigilancia_segundos': self.intervalo if self._hilo is not None else 0
+        })
+        return datos
+
+    def cerrar(self):
+        with self._lock:
+            versiones = ([self._actual] if self._actual is not None else []) + self._retiradas
+            self._retiradas = []
+        for version in versiones:
+            self._cerrar(version)
@@ -0,0 +1,382 @@
+"""
+Compilador de las reglas recommend/2 de asistente_finanzas.pl
+Lee el archivo Prolog, une cada cláusula con los metadatos declarados en
+regla/4 (id, categoría, prioridad, texto) y traduce su cuerpo a una lista de
+condiciones simples (característica, operador, valor) que pueden evaluarse
+fuera de Prolog. Solo se reconocen las construcciones que usa la base de
+conocimiento; cualquier otra produce ReglaNoSoportada.
+"""
+
+import operator
+import os
+import re
+from collections import namedtuple
+
+PROLOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asistente_finanzas.pl')
+
+# Predicados auxiliares de porcentaje: nombre -> (parte, total)
+PORCENTAJES = {
+    'tasa_ahorro': ('ahorro_mensual', 'ingreso'),
+    'ratio_vivienda_pct': ('vivienda', 'ingreso'),
+    'ratio_alimentacion_pct': ('alimentacion', 'ingreso'),
+    'ratio_transporte_pct': ('transporte', 'ingreso'),
+    'ratio_deuda_pct': ('deudas_total', 'ingreso'),
+}
+
+# Características booleanas derivadas: nombre -> campos de los que dependen
+BOOLEANAS = {
+    'gastos_superan_ingresos': ('gasto_total', 'ingreso'),
+    'metas_vacias': ('metas',),
+    'meta_corto': ('metas',),
+    'meta_mediano': ('metas',),
+    'meta_largo': ('metas',),
+}
+
+COMPARADORES = {
+    '<': operator.lt,
+    '>': operator.gt,
+    '=<': operator.le,
+    '>=': operator.ge,
+    '=:=': operator.eq,
+    '=\\=': operator.ne,
+}
+
+Condicion = namedtuple('Condicion', ['caracteristica', 'operador', 'valor'])
+Regla = namedtuple('Regla', ['indice', 'id', 'texto', 'categoria', 'prioridad', 'condiciones'])
+
+
+class ReglaNoSoportada(ValueError):
+    """La cláusula usa una construcción que el compilador no sabe traducir"""
+
+
+def campos_de(caracteristica):
+    """Campos del perfil de los que depende una característica"""
+    if caracteristica in PORCENTAJES:
+        return PORCENTAJES[caracteristica]
+    if caracteristica in BOOLEANAS:
+        return BOOLEANAS[caracteristica]
+    return (caracteristica,)
+
+
+def atomo_prolog(valor):
+    """Átomo Prolog equivalente a un valor JSON (como lo lee protocolo_json.pl)"""
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, str):
+        return valor
+    return None
+
+
+# --------- Evaluación escalar (un perfil) ---------
+
+def _campo(perfil, campo):
+    if campo not in perfil:
+        raise ValueError(f'Campo faltante: {campo}')
+    return perfil[campo]
+
+
+def es_numero(valor):
+    """
+    Número JSON que los motores de Python pueden evaluar: no booleano y
+    representable como float (un entero como 10**400 no lo es)
+    """
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return False
+    try:
+        float(valor)
+    except OverflowError:
+        return False
+    return True
+
+
+def _numero_perfil(perfil, campo):
+    valor = _campo(perfil, campo)
+    if not es_numero(valor):
+        raise ValueError(f'Campo numérico inválido: {campo}')
+    return valor
+
+
+def _porcentaje(perfil, parte, total):
+    # safe_div/3 compara el total con 0 antes de dividir: con total 0 la
+    # parte solo tiene que existir
+    valor_total = _numero_perfil(perfil, total)
+    if valor_total == 0:
+        _campo(perfil, parte)
+        return 0
+    try:
+        return _numero_perfil(perfil, parte) / valor_total * 100
+    except ArithmeticError as e:
+        raise ValueError(f'Porcentaje fuera de rango: {parte}/{total} ({e})')
+
+
+def _plazos_metas(perfil):
+    metas = _campo(perfil, 'metas')
+    if not isinstance(metas, list):
+        return None
+    # member(meta(_, M), Metas) solo encuentra las metas que eran objetos
+    metas = [m for m in metas if isinstance(m, dict)]
+    if any('tipo' not in m or 'meses' not in m for m in metas):
+        raise ValueError('Cada meta debe tener "tipo" y "meses"')
+    plazos = [m['meses'] for m in metas]
+    if not all(es_numero(m) for m in plazos):
+        raise ValueError('Plazo de meta no numérico')
+    return plazos
+
+
+def valor_caracteristica(nombre, perfil):
+    """Valor de una característica (campo o derivada) para un perfil, como lo calcula Prolog"""
+    if nombre in PORCENTAJES:
+        return _porcentaje(perfil, *PORCENTAJES[nombre])
+    if nombre == 'gastos_superan_ingresos':
+        return _numero_perfil(perfil, 'gasto_total') > _numero_perfil(perfil, 'ingreso')
+    if nombre in BOOLEANAS:
+        plazos = _plazos_metas(perfil)
+        if nombre == 'metas_vacias':
+            # Metas == [] mira la lista tal cual, con las metas que no son objetos
+            return perfil['metas'] == []
+        plazos = plazos or []
+        if nombre == 'meta_corto':
+            return any(m < 12 for m in plazos)
+        if nombre == 'meta_mediano':
+            return any(12 <= m <= 60 for m in plazos)
+        # plazo_tipo(M, largo) es cierto para cualquier meta (ver motor_vectorizado)
+        return bool(plazos)
+    return _campo(perfil, nombre)
+
+
+def evaluar_condicion(cond, perfil):
+    """
+    Evalúa una condición sobre un perfil (dict). Lanza ValueError cuando
+    Prolog respondería con un error (campo ausente o de tipo inválido).
+    """
+    if cond.operador in COMPARADORES:
+        if cond.caracteristica in PORCENTAJES:
+            valor = valor_caracteristica(cond.caracteristica, perfil)
+        else:
+            valor = _numero_perfil(perfil, cond.caracteristica)
+        return COMPARADORES[cond.operador](valor, cond.valor)
+    if cond.caracteristica in BOOLEANAS:
+        return valor_caracteristica(cond.caracteristica, perfil) == cond.valor
+    atomo = atomo_prolog(_campo(perfil, cond.caracteristica))
+    if cond.operador == '\\+':
+        if atomo not in ('true', 'false'):
+            raise ValueError(f'Valor no booleano: {cond.caracteristica}')
+        return atomo != 'true'
+    return atomo == cond.valor
+
+
+def condiciones_evaluadas(reglas, perfil):
+    """
+    Evalúa las condiciones de cada regla en el orden de su cláusula, como
+    Prolog: una condición solo se evalúa si las anteriores de la misma
+    cláusula se cumplen (un perfil sin dependientes puede omitir
+    tiene_seguro_vida). Devuelve {condición: bool} con las evaluadas; lanza
+    ValueError si Prolog rechazaría el perfil.
+    """
+    valores = {}
+    for regla in reglas:
+        for cond in regla.condiciones:
+            if cond not in valores:
+                valores[cond] = evaluar_condicion(cond, perfil)
+            if not valores[cond]:
+                break
+    return valores
+
+
+def evaluar_reglas(reglas, perfil):
+    """Ids de las reglas que dispara el perfil, ordenados como recomendaciones_ids/2"""
+    valores = condiciones_evaluadas(reglas, perfil)
+    return sorted({regla.id for regla in reglas if all(valores.get(cond) for cond in regla.condiciones)})
+
+
+def condiciones_unicas(reglas):
+    """Condiciones distintas de todas las reglas, en orden de aparición"""
+    return list(dict.fromkeys(cond for regla in reglas for cond in regla.condiciones))
+
+
+# --------- Lectura de cláusulas ---------
+
+def _clausulas(texto):
+    """Divide el código fuente en cláusulas, ignorando comentarios y respetando comillas"""
+    actual = []
+    profundidad = 0
+    i, n = 0, len(texto)
+    while i < n:
+        c = texto[i]
+        if c == "'":
+            fin = i + 1
+            while fin < n:
+                if texto[fin] == "'" and texto[fin + 1:fin + 2] == "'":
+                    fin += 2
+                    continue
+                if texto[fin] == "'":
+                    break
+                fin += 1
+            actual.append(texto[i:fin + 1])
+            i = fin + 1
+            continue
+        if c == '%':
+            fin = texto.find('\n', i)
+            i = n if fin < 0 else fin
+            continue
+        if c == '/' and texto[i + 1:i + 2] == '*':
+            fin = texto.find('*/', i + 2)
+            i = n if fin < 0 else fin + 2
+            continue
+        if c in '([{':
+            profundidad += 1
+        elif c in ')]}':
+            profundidad -= 1
+        elif c == '.' and profundidad == 0 and (i + 1 == n or texto[i + 1].isspace() or texto[i + 1] == '%'):
+            clausula = ''.join(actual).strip()
+            if clausula:
+                yield clausula
+            actual = []
+            i += 1
+            continue
+        actual.append(c)
+        i += 1
+
+
+def _dividir(texto, separador):
+    """Divide por `separador` en el nivel superior (fuera de paréntesis y comillas)"""
+    partes, actual = [], []
+    profundidad = 0
+    en_comillas = False
+    for c in texto:
+        if c == "'":
+            en_comillas = not en_comillas
+        elif not en_comillas:
+            if c in '([{':
+                profundidad += 1
+            elif c in ')]}':
+                profundidad -= 1
+            elif c == separador and profundidad == 0:
+                partes.append(''.join(actual).strip())
+                actual = []
+                continue
+        actual.append(c)
+    partes.append(''.join(actual).strip())
+    return partes
+
+
+def _atomo(texto):
+    texto = texto.strip()
+    if texto.startswith("'") and texto.endswith("'"):
+        return texto[1:-1].replace("''", "'")
+    return texto
+
+
+def _numero(texto):
+    return float(texto) if '.' in texto else int(texto)
+
+
+# --------- Traducción de objetivos ---------
+
+NUM = r'(-?\d+(?:\.\d+)?)'
+OP = r'(=<|>=|=:=|=\\=|<|>)'
+VAR = r'([A-Z_]\w*)'
+
+
+def _traducir_cuerpo(perfil, cuerpo, texto):
+    """Convierte los objetivos del cuerpo en una lista de Condicion"""
+    p = re.escape(perfil)
+    variables = {}
+    condiciones = []
+
+    def no_soportada(objetivo):
+        raise ReglaNoSoportada(f'Objetivo no soportado en la regla "{texto}": {objetivo}')
+
+    for objetivo in _dividir(cuerpo, ','):
+        if objetivo == 'true':
+            continue
+
+        m = re.fullmatch(rf'(\w+)\({p},\s*{VAR}\)', objetivo)
+        if m and m.group(1) in PORCENTAJES:
+            variables[m.group(2)] = m.group(1)
+            continue
+
+        m = re.fullmatch(rf'{VAR}\s*{OP}\s*{NUM}', objetivo)
+        if m:
+            caracteristica = variables.get(m.group(1))
+            if caracteristica is None or caracteristica == 'meta':
+                no_soportada(objetivo)
+            condiciones.append(Condicion(caracteristica, m.group(2), _numero(m.group(3))))
+            continue
+
+        m = re.fullmatch(rf'{p}\.(\w+)\s*{OP}\s*{NUM}', objetivo)
+        if m:
+            condiciones.append(Condicion(m.group(1), m.group(2), _numero(m.group(3))))
+            continue
+
+        m = re.fullmatch(rf'{p}\.(\w+)\s*==\s*(\w+)', objetivo)
+        if m:
+            condiciones.append(Condicion(m.group(1), '==', m.group(2)))
+            continue
+
+        m = re.fullmatch(rf'\\\+\s*{p}\.(\w+)', objetivo)
+        if m:
+            condiciones.append(Condicion(m.group(1), '\\+', None))
+            continue
+
+        m = re.fullmatch(rf'betweenf\({NUM},\s*{NUM},\s*{VAR}\)', objetivo)
+        if m:
+            caracteristica = variables.get(m.group(3))
+            if caracteristica is None or caracteristica == 'meta':
+                no_soportada(objetivo)
+            condiciones.append(Condicion(caracteristica, '>=', _numero(m.group(1))))
+            condiciones.append(Condicion(caracteristica, '=<', _numero(m.group(2))))
+            continue
+
+        if re.fullmatch(rf'gastos_superan_ingresos\({p}\)', objetivo):
+            condiciones.append(Condicion('gastos_superan_ingresos', '==', True))
+            continue
+
+        if re.fullmatch(rf'\(\s*var\({p}\.metas\)\s*;\s*{p}\.metas\s*==\s*\[\]\s*\)', objetivo):
+            condiciones.append(Condicion('metas_vacias', '==', True))
+            continue
+
+        m = re.fullmatch(rf'member\(meta\(_\w*,\s*{VAR}\),\s*{p}\.metas\)', objetivo)
+        if m:
+            variables[m.group(1)] = 'meta'
+            continue
+
+        m = re.fullmatch(rf'plazo_tipo\({VAR},\s*(corto|mediano|largo)\)', objetivo)
+        if m and variables.get(m.group(1)) == 'meta':
+            condiciones.append(Condicion(f'meta_{m.group(2)}', '==', True))
+            continue
+
+        no_soportada(objetivo)
+
+    return condiciones
+
+
+ATOMO = r"('(?:[^']|'')*'|[a-z]\w*)"
+
+
+def cargar_reglas(archivo=PROLOG_FILE):
+    """Devuelve las reglas recommend/2 del archivo, en el orden en que aparecen"""
+    with open(archivo, encoding='utf-8') as f:
+        fuente = f.read()
+
+    metadatos = {}
+    clausulas = []
+    for clausula in _clausulas(fuente):
+        cabeza, _, cuerpo = clausula.partition(':-')
+        m = re.fullmatch(rf"\s*regla\(\s*{ATOMO}\s*,\s*{ATOMO}\s*,\s*{ATOMO}\s*,\s*{ATOMO}\s*\)\s*", cabeza)
+        if m and not cuerpo:
+            regla_id, categoria, prioridad, texto = (_atomo(g) for g in m.groups())
+            metadatos[regla_id] = (texto, categoria, prioridad)
+            continue
+        m = re.fullmatch(rf"\s*recommend\(\s*([A-Z_]\w*)\s*,\s*{ATOMO}\s*\)\s*", cabeza)
+        if m:
+            clausulas.append((m.group(1), _atomo(m.group(2)), ' '.join(cuerpo.split()) or 'true'))
+
+    reglas = []
+    for perfil, regla_id, cuerpo in clausulas:
+        if regla_id not in metadatos:
+            raise ReglaNoSoportada(f'La regla {regla_id} no tiene metadatos regla/4')
+        texto, categoria, prioridad = metadatos[regla_id]
+        condiciones = _traducir_cuerpo(perfil, cuerpo, regla_id)
+        reglas.append(Regla(len(reglas), regla_id, texto, categoria, prioridad, condiciones))
+    return reglas
@@ -0,0 +1,105 @@
+"""
+Compresión y validación condicional de las respuestas HTTP
+Compartido por los backends Flask y servidor_async.py. Las respuestas JSON
+se comprimen con brotli (si está instalado) o gzip según Accept-Encoding;
+las pequeñas se envían tal cual porque comprimirlas cuesta más de lo que
+ahorran. Los recursos que solo cambian con la versión de la base
+(/api/reglas, /api/ejemplo) llevan un ETag débil para responder 304 a un
+If-None-Match; el ETag es débil porque el contenido es el mismo con o sin
+compresión.
+
+COMPRESION=0 desactiva la compresión y COMPRESION_MINIMO fija el tamaño
+mínimo en bytes.
+"""
+
+import gzip
+import hashlib
+import os
+
+import metricas
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+COMPRESION = os.environ.get('COMPRESION', '1') != '0'
+COMPRESION_MINIMO = int(os.environ.get('COMPRESION_MINIMO', '512'))
+NIVEL_GZIP = 5
+CALIDAD_BROTLI = 4
+
+# Un recurso versionado (/api/reglas?version=...) no cambia nunca
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+# Sin versión en la URL el cliente lo guarda pero revalida con el ETag
+CACHE_REVALIDAR = 'no-cache'
+
+
+def _aceptadas(accept_encoding):
+    """{codificación: q} de una cabecera Accept-Encoding"""
+    aceptadas = {}
+    for parte in (accept_encoding or '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        if not nombre:
+            continue
+        q = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith('q='):
+            try:
+                q = float(parametro[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding, tamano):
+    """'br', 'gzip' o None para un cuerpo de `tamano` bytes"""
+    if not COMPRESION or tamano < COMPRESION_MINIMO:
+        return None
+    aceptadas = _aceptadas(accept_encoding)
+    comodin = aceptadas.get('*', 0)
+    for codificacion in (('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)):
+        if aceptadas.get(codificacion, comodin) > 0:
+            return codificacion
+    return None
+
+
+def comprimir(cuerpo, codificacion):
+    with metricas.etapa('compresion'):
+        if codificacion == 'br':
+            return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+        return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+
+
+def comprimir_flask(response, accept_encoding):
+    """after_request de Flask: comprime la respuesta si el cliente lo acepta"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    cuerpo = response.get_data()
+    codificacion = elegir_codificacion(accept_encoding, len(cuerpo))
+    if codificacion is not None:
+        response.set_data(comprimir(cuerpo, codificacion))
+        response.headers['Content-Encoding'] = codificacion
+    return response
+
+
+def etag_debil(*partes):
+    """Valor de ETag débil (W/"...") a partir de una versión o un contenido"""
+    resumen = hashlib.sha256('\0'.join(str(p) for p in partes).encode()).hexdigest()[:16]
+    return f'W/"{resumen}"'
+
+
+def coincide_etag(if_none_match, etag):
+    """Comparación débil de If-None-Match (lista separada por comas, o *)"""
+    if not if_none_match:
+        return False
+    valor = etag[2:] if etag.startswith('W/') else etag
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato == '*' or (candidato[2:] if candidato.startswith('W/') else candidato) == valor:
+            return True
+    return False
@@ -0,0 +1,190 @@
+"""
+Análisis de sensibilidad (what-if) de las reglas para un perfil
+Para cada regla de asistente_finanzas.pl devuelve si se dispara y, por cada
+condición, el valor de cada campo del perfil en el que la condición cambia
+de estado dejando fijos los demás campos. Así la interfaz puede actualizar
+las recomendaciones mientras el usuario mueve un control, sin volver a
+consultar al servidor. Los límites salen de las comparaciones que reglas.py
+lee del propio archivo Prolog; no hay umbrales escritos a mano.
+"""
+
+from reglas import (
+    cargar_reglas, condiciones_evaluadas, evaluar_condicion, valor_caracteristica,
+    PORCENTAJES, BOOLEANAS, PROLOG_FILE
+)
+
+# Negación de cada comparador y su inverso al despejar un divisor positivo
+NEGACION = {'<': '>=', '>': '=<', '=<': '>', '>=': '<', '=:=': '=\\=', '=\\=': '=:='}
+INVERSO = {'<': '>', '>': '<', '=<': '>=', '>=': '=<', '=:=': '=:=', '=\\=': '=\\='}
+
+# Plazos de plazo_tipo/2 tal como los consulta recommend/2
+LIMITES_METAS = {
+    'meta_corto': [('<', 12)],
+    'meta_mediano': [('>=', 12), ('=<', 60)],
+}
+
+
+def _redondear(valor):
+    return round(valor, 6) if isinstance(valor, float) else valor
+
+
+def _limite(campo, operador, umbral, actual):
+    return {'campo': campo, 'operador': operador, 'umbral': _redondear(umbral), 'actual': actual}
+
+
+def limites_condicion(cond, perfil):
+    """
+    Límites de una condición expresados sobre campos del perfil: la condición
+    se cumple si y solo si `campo operador umbral`, con los demás campos fijos.
+    Un límite con `umbral` None indica que el campo no puede cambiar el
+    resultado (por ejemplo, un porcentaje cuando el ingreso es 0).
+    """
+    nombre = cond.caracteristica
+    if nombre in PORCENTAJES:
+        parte, total = PORCENTAJES[nombre]
+        p, t = perfil[parte], perfil[total]
+        limites = []
+        # 100·p/t OP v  <=>  p OP v·t/100   (con t > 0)
+        if t > 0:
+            limites.append(_limite(parte, cond.operador, cond.valor * t / 100, p))
+        else:
+            limites.append(_limite(parte, cond.operador, None, p))
+        # 100·p OP v·t  <=>  t OP' 100·p/v  (con t > 0; el sentido se invierte si v > 0)
+        if cond.valor != 0 and 100 * p / cond.valor > 0:
+            operador = INVERSO[cond.operador] if cond.valor > 0 else cond.operador
+            limites.append(_limite(total, operador, 100 * p / cond.valor, t))
+        else:
+            limites.append(_limite(total, cond.operador, None, t))
+        return limites
+    if nombre == 'gastos_superan_ingresos':
+        gasto, ingreso = perfil['gasto_total'], perfil['ingreso']
+        if cond.valor:
+            return [_limite('gasto_total', '>', ingreso, gasto), _limite('ingreso', '<', gasto, ingreso)]
+        return [_limite('gasto_total', '=<', ingreso, gasto), _limite('ingreso', '>=', gasto, ingreso)]
+    if nombre in BOOLEANAS:
+        # Condiciones sobre la lista de metas: basta con una meta que cumpla
+        metas = perfil.get('metas')
+        if nombre == 'metas_vacias':
+            return [{'campo': 'metas', 'operador': '==', 'umbral': [], 'actual': metas}]
+        if nombre == 'meta_largo':
+            return [{'campo': 'metas', 'operador': 'no_vacia', 'umbral': None, 'actual': metas}]
+        return [
+            {'campo': 'metas[].meses', 'operador': operador, 'umbral': umbral, 'alguna': True,
+             'actual': [m.get('meses') for m in (metas if isinstance(metas, list) else []) if isinstance(m, dict)]}
+            for operador, umbral in LIMITES_METAS[nombre]
+        ]
+    actual = perfil[nombre]
+    if cond.operador == '\\+':
+        return [_limite(nombre, '==', False, actual)]
+    if cond.operador == '==':
+        valor = {'true': True, 'false': False}.get(cond.valor, cond.valor)
+        return [_limite(nombre, '==', valor, actual)]
+    return [_limite(nombre, cond.operador, cond.valor, actual)]
+
+
+def _texto(valor):
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    return str(valor)
+
+
+def _descripciones(regla_id, limites, dispara):
+    """Textos de los cambios que encienden o apagan la regla a través de una condición"""
+    verbo = 'deja de dispararse' if dispara else 'se dispara'
+    metas = [l for l in limites if l.get('alguna')]
+    if metas:
+        # Los plazos de una condición sobre metas se cumplen en la misma meta
+        if dispara:
+            rango = ' o '.join(f"{NEGACION[l['operador']]} {l['umbral']}" for l in metas)
+            return [f"{regla_id} {verbo} si todas las metas tienen meses {rango}"]
+        rango = ' y '.join(f"{l['operador']} {l['umbral']}" for l in metas)
+        return [f"{regla_id} {verbo} con alguna meta de meses {rango}"]
+    textos = []
+    for limite in limites:
+        operador, umbral = limite['operador'], limite['umbral']
+        if operador == 'no_vacia':
+            textos.append(f"{regla_id} {verbo} con metas {'vacía' if dispara else 'no vacía'}")
+            continue
+        if umbral is None:
+            continue
+        if dispara:
+            operador = NEGACION.get(operador, '!=')
+        textos.append(f"{regla_id} {verbo} con {limite['campo']} {operador} {_texto(umbral)}")
+    return textos
+
+
+def _condicion(cond, perfil, valores):
+    """
+    Estado de una condición. Las que Prolog no llega a evaluar (una anterior
+    de la cláusula falla) se evalúan aparte si se puede; si les falta el
+    campo, `cumple` es None y no tienen límites.
+    """
+    if cond in valores:
+        cumple = valores[cond]
+    else:
+        try:
+            cumple = evaluar_condicion(cond, perfil)
+        except (ValueError, TypeError):
+            cumple = None
+    try:
+        actual = _redondear(valor_caracteristica(cond.caracteristica, perfil)) \
+            if cond.caracteristica in PORCENTAJES else None
+        limites = limites_condicion(cond, perfil) if cumple is not None else []
+    except (KeyError, ValueError, TypeError):
+        # Campo sin valor numérico que Prolog no necesita (p. ej. con ingreso 0)
+        actual, limites = None, []
+    return {
+        'caracteristica': cond.caracteristica,
+        'operador': cond.operador,
+        'valor': cond.valor,
+        'actual': actual,
+        'cumple': cumple,
+        'limites': limites
+    }
+
+
+def analizar(reglas, perfil):
+    """
+    Reglas con su estado actual y los límites de cada condición. Para una regla
+    que se dispara, cruzar cualquier límite la apaga; para una que no, solo
+    se puede encender con un campo si es la única condición que falla
+    (`faltan` == 1). Lanza ValueError si Prolog rechazaría el perfil; los
+    campos que Prolog no lee (tiene_seguro_vida sin dependientes) pueden faltar.
+    """
+    valores = condiciones_evaluadas(reglas, perfil)
+    resultado = []
+    for regla in reglas:
+        condiciones = [_condicion(cond, perfil, valores) for cond in regla.condiciones]
+        faltan = sum(1 for c in condiciones if c['cumple'] is not True)
+        dispara = faltan == 0
+        cambios = []
+        for c in condiciones:
+            if dispara or (faltan == 1 and c['cumple'] is False):
+                cambios.extend(_descripciones(regla.id, c['limites'], dispara))
+        resultado.append({
+            'id': regla.id,
+            'categoria': regla.categoria,
+            'prioridad': regla.prioridad,
+            'dispara': dispara,
+            'constante': not regla.condiciones,
+            'faltan': faltan,
+            'condiciones': condiciones,
+            'cambios': cambios
+        })
+    return resultado
+
+
+_reglas = None
+
+
+def analizar_perfil(perfil, reglas=None):
+    """
+    analizar() con las reglas dadas (las de una versión de la base) o con las
+    de asistente_finanzas.pl, leídas una sola vez
+    """
+    global _reglas
+    if reglas is None:
+        if _reglas is None:
+            _reglas = cargar_reglas(PROLOG_FILE)
+        reglas = _reglas
+    return analizar(reglas, perfil)
@@ -0,0 +1,520 @@
+"""
+Servidor Flask del sistema experto, con el motor de evaluación intercambiable
+La validación, categorización, endpoints y perfil de ejemplo están una sola
+vez; cómo se evalúa Prolog queda detrás de la interfaz de motores.py
+(pyswip embebido, pool de procesos `swipl` o el motor nativo NumPy). Al
+arrancar se elige el motor más rápido que pasa la prueba de conformidad, o
+el que fije MOTOR; la elección y su latencia se informan en /api/health.
+Los eventos de cada petición van a la bitácora estructurada (bitacora.py)
+y las peticiones con X-Traza, o muestreadas, dejan una traza completa en
+/api/admin/trazas (trazas.py).
+Ejecutar: python servidor.py
+"""
+
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from flask_cors import CORS
+import json
+import os
+import atexit
+from arranque import verificar_swipl, get_swipl_cmd, swipl_detectado
+from pool_swipl import ErrorPool, TimeoutConsulta
+from motores import SelectorMotor, MotorOcupado, PYSWIP_AVAILABLE, PROLOG_TIMEOUT
+from perfiles import validar_perfil, EJEMPLO_PERFIL
+from lotes import (
+    leer_perfiles, en_bloques, lineas_bloque, error_lote, linea_ndjson,
+    ErrorEntradaLote, LOTE_TAMANO, MIMETYPE_NDJSON
+)
+from cache_recomendaciones import cache
+from categorias import categorizar_recomendaciones, recomendaciones_de_ids, recomendaciones_compactas
+from sensibilidad import analizar_perfil
+from proyecciones import responder as responder_proyecciones
+from sesiones import sesiones, ErrorSesion, ids_disparadas
+import flujo
+from recarga import BaseConocimiento, CABECERA_VERSION
+from admision import ControlAdmision, Rechazo, plazo_cabecera, CABECERA_PLAZO
+from respuestas_http import comprimir_flask, etag_debil, coincide_etag, CACHE_INMUTABLE, CACHE_REVALIDAR
+import metricas
+import trazas
+from bitacora import bitacora
+
+app = Flask(__name__)
+CORS(app, expose_headers=[CABECERA_VERSION, 'Retry-After', 'ETag', trazas.CABECERA_TRAZA_ID])
+
+# Ruta al archivo Prolog
+PROLOG_FILE = "asistente_finanzas.pl"
+
+# Motor para /api/recomendaciones/batch: 'prolog' (el elegido) o 'vectorizado' (NumPy)
+MOTOR_LOTES = os.environ.get('MOTOR_LOTES', 'prolog')
+
+# El motor de cada versión de la base lo crea el selector; se recarga en caliente
+selector = SelectorMotor()
+base = BaseConocimiento(PROLOG_FILE, crear_motor=selector, cerrar_motor=lambda motor: motor.cerrar())
+base.al_cambiar(cache.vaciar)
+atexit.register(base.cerrar)
+
+# Peticiones admitidas a la vez (en curso o esperando al motor) y endpoints que pasan por el control
+admision = ControlAdmision()
+CON_ADMISION = {'get_recomendaciones', 'get_recomendaciones_sesion', 'get_recomendaciones_flujo', 'get_recomendaciones_batch'}
+
+def ejecutar_motor(perfil_dict, version, timeout=PROLOG_TIMEOUT):
+    """Recomendaciones (textos) de un perfil con el motor de la versión; lanza ErrorPool si falla"""
+    if version.motor is None:
+        raise ErrorPool('Ningún motor de evaluación disponible')
+    return recomendaciones_de_ids(version.motor.consultar(perfil_dict, timeout), version.tabla)
+
+def error_motor(e):
+    """Respuesta HTTP para un error del motor"""
+    if isinstance(e, TimeoutConsulta):
+        return jsonify({
+            'error': f'Tiempo agotado: {str(e)}'
+        }), 504
+    if isinstance(e, MotorOcupado):
+        return jsonify({
+            'error': f'Servidor ocupado: {str(e)}'
+        }), 503
+    bitacora.error('error_motor', error=str(e))
+    return jsonify({
+        'error': f'Error ejecutando Prolog: {str(e)}'
+    }), 500
+
+def estado_error_motor(e):
+    """Código HTTP de error_motor(), para el evento de error del flujo"""
+    if isinstance(e, TimeoutConsulta):
+        return 504
+    if isinstance(e, MotorOcupado):
+        return 503
+    return 500
+
+def estado_motor():
+    version = base.vigente()
+    return version.motor.estado() if version is not None and version.motor is not None else None
+
+metricas.registrar_pool(estado_motor)
+metricas.registrar_cache(cache)
+metricas.registrar_admision(admision)
+
+@app.before_request
+def iniciar_traza():
+    # Antes de la admisión, para que también quede la traza de un rechazo
+    if request.endpoint != 'get_trazas':
+        g.traza, g.traza_token = trazas.iniciar(request.endpoint, request.headers.get(trazas.CABECERA_TRAZA))
+
+@app.before_request
+def admitir_peticion():
+    # El plazo corre desde la llegada; sin cabecera cada consulta tiene SWIPL_TIMEOUT
+    g.plazo = plazo_cabecera(request.headers.get(CABECERA_PLAZO))
+    if request.endpoint in CON_ADMISION:
+        admision.admitir(g.plazo)
+        g.admitida = True
+
+@app.teardown_request
+def liberar_peticion(_error):
+    if g.pop('admitida', False):
+        admision.liberar()
+
+@app.teardown_request
+def terminar_traza(_error):
+    # En las respuestas por streaming (lotes) corre antes de enviar el cuerpo, que queda fuera de la traza
+    traza = g.pop('traza', None)
+    if traza is not None:
+        trazas.terminar(traza, g.traza_token, g.get('estado_respuesta'))
+
+@app.errorhandler(Rechazo)
+def rechazar_peticion(rechazo):
+    return jsonify({
+        'error': str(rechazo)
+    }), rechazo.estado, rechazo.cabeceras()
+
+@app.after_request
+def contar_peticion(response):
+    metricas.contar_peticion(request.endpoint or 'desconocido', response.status_code)
+    if 'version_reglas' in g:
+        response.headers[CABECERA_VERSION] = g.version_reglas
+    if g.get('traza') is not None:
+        g.estado_respuesta = response.status_code
+        response.headers[trazas.CABECERA_TRAZA_ID] = g.traza.id
+    return response
+
+@app.after_request
+def comprimir_respuesta(response):
+    return comprimir_flask(response, request.headers.get('Accept-Encoding'))
+
+def no_modificado(etag, cache_control):
+    """Respuesta 304 si el cliente ya tiene la representación con `etag`, o None"""
+    if coincide_etag(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+        return response
+    return None
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metricas.registro.exponer(), mimetype=metricas.MIMETYPE_PROMETHEUS)
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Verifica que el servidor esté funcionando e informa el motor elegido y su latencia"""
+    version = base.vigente()
+    prolog_file_ok = os.path.exists(PROLOG_FILE)
+    motor_ok = version is None or version.motor is not None
+
+    return jsonify({
+        'status': 'ok' if prolog_file_ok and motor_ok else 'error',
+        'message': 'Servidor Flask funcionando correctamente' if motor_ok else 'Ningún motor de evaluación disponible',
+        'swipl_disponible': verificar_swipl(),
+        'pyswip_instalado': PYSWIP_AVAILABLE,
+        'archivo_prolog_encontrado': prolog_file_ok,
+        'swipl_path_detectado': swipl_detectado(),
+        'motor': selector.estado(version.motor if version is not None else None),
+        'base_conocimiento': base.estado(),
+        'cache': cache.estadisticas(),
+        'sesiones': sesiones.estado(),
+        'admision': admision.estado(),
+        'bitacora': bitacora.estado(),
+        'trazas': trazas.buffer.estado()
+    })
+
+@app.route('/api/admin/trazas', methods=['GET'])
+def get_trazas():
+    """
+    Trazas guardadas: el índice, `?id=` para una completa o `?completo=1`
+    para volcarlas todas. Requiere X-Admin-Token si TRAZA_TOKEN está definido.
+    """
+    if not trazas.autorizado(request.headers.get(trazas.CABECERA_TOKEN), request.remote_addr):
+        return jsonify({
+            'error': 'No autorizado'
+        }), 403
+    estado, cuerpo = trazas.consultar(request.args)
+    return jsonify(cuerpo), estado
+
+@app.route('/api/recomendaciones', methods=['POST'])
+def get_recomendaciones():
+    """
+    Obtiene recomendaciones financieras. Con `?formato=compacto` devuelve solo
+    [id, prioridad] por recomendación; los textos están en /api/reglas.
+    """
+    formato = request.args.get('formato', 'completo')
+    if formato not in ('completo', 'compacto'):
+        return jsonify({
+            'error': f'Formato desconocido: {formato}'
+        }), 400
+
+    try:
+        # Obtener datos del request
+        with metricas.etapa('parseo_json'):
+            data = request.json
+        trazas.anotar(perfil=data)
+
+        # Validar datos requeridos
+        error = validar_perfil(data)
+        if error:
+            return jsonify({
+                'error': error
+            }), 400
+
+        # Evaluar con el motor, salvo que un perfil equivalente ya esté en la caché;
+        # toda la petición se resuelve con la misma versión de la base
+        with base.usar() as version:
+            g.version_reglas = version.id
+            try:
+                recomendaciones = cache.obtener(
+                    data, lambda perfil: ejecutar_motor(perfil, version, g.plazo.restante(PROLOG_TIMEOUT)), version=version
+                )
+            except ErrorPool as e:
+                return error_motor(e)
+            bitacora.info('recomendaciones', total=len(recomendaciones), version=version.id)
+
+            if formato == 'compacto':
+                return jsonify({
+                    'success': True,
+                    'total': len(recomendaciones),
+                    'reglas': recomendaciones_compactas(recomendaciones, version.tabla),
+                    'version_reglas': version.id,
+                    'diccionario': f'/api/reglas?version={version.id}'
+                })
+
+            # Categorizar
+            categorized = categorizar_recomendaciones(recomendaciones, version.tabla)
+
+        return jsonify({
+            'success': True,
+            'total': len(recomendaciones),
+            'recomendaciones': recomendaciones,
+            'categorizadas': categorized,
+            'version_reglas': version.id
+        })
+
+    except Exception as e:
+        bitacora.error('error_endpoint', endpoint=request.endpoint, error=str(e))
+        return jsonify({
+            'error': f'Error procesando solicitud: {str(e)}'
+        }), 500
+
+@app.route('/api/recomendaciones/sesion', methods=['POST'])
+def get_recomendaciones_sesion():
+    """
+    Recomendaciones incrementales: un perfil completo abre una sesión y
+    {"sesion": id, "cambios": {...}} reevalúa solo las reglas que dependen
+    de los campos cambiados. Responde las recomendaciones agregadas y
+    eliminadas respecto de la evaluación anterior (ver sesiones.py).
+    """
+    try:
+        anterior, perfil, cambiados = sesiones.preparar(request.get_json(silent=True))
+    except ErrorSesion as e:
+        return jsonify({
+            'error': str(e)
+        }), e.estado
+    with base.usar() as version:
+        g.version_reglas = version.id
+        try:
+            incremental = sesiones.incremental(anterior, cambiados, perfil, version)
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'error': f'Perfil no evaluable: {str(e)}'
+            }), 400
+        if incremental is not None:
+            return jsonify(sesiones.responder(anterior, perfil, version, *incremental))
+        try:
+            recomendaciones = cache.obtener(
+                perfil, lambda p: ejecutar_motor(p, version, g.plazo.restante(PROLOG_TIMEOUT)), version=version
+            )
+        except ErrorPool as e:
+            return error_motor(e)
+        disparadas = ids_disparadas(recomendaciones, version.tabla)
+        return jsonify(sesiones.responder(anterior, perfil, version, disparadas))
+
+@app.route('/api/recomendaciones/flujo', methods=['POST'])
+def get_recomendaciones_flujo():
+    """
+    Las recomendaciones de un perfil como Server-Sent Events: cada una en
+    cuanto se dispara su regla, las de prioridad alta primero, y al final un
+    evento `resumen` igual a la respuesta de /api/recomendaciones (ver flujo.py)
+    """
+    data = request.get_json(silent=True)
+    error = validar_perfil(data)
+    if error:
+        return jsonify({
+            'error': error
+        }), 400
+    trazas.anotar(perfil=data)
+    plazo = g.plazo
+
+    def generar():
+        with base.usar() as version:
+            enviadas = []
+            yield from flujo.previa(data, version, enviadas)
+            try:
+                recomendaciones = cache.obtener(
+                    data, lambda perfil: ejecutar_motor(perfil, version, plazo.restante(PROLOG_TIMEOUT)), version=version
+                )
+            except ErrorPool as e:
+                bitacora.error('error_motor', error=str(e))
+                yield flujo.evento_error(f'Error ejecutando Prolog: {str(e)}', estado_error_motor(e))
+                return
+            yield from flujo.cierre(recomendaciones, version, enviadas)
+
+    # Como en el lote, el lugar en la admisión se libera al terminar de enviar
+    respuesta = Response(stream_with_context(generar()), mimetype=flujo.MIMETYPE_SSE, headers=flujo.CABECERAS_SSE)
+    if g.pop('admitida', False):
+        respuesta.call_on_close(admision.liberar)
+    return respuesta
+
+@app.route('/api/recomendaciones/batch', methods=['POST'])
+def get_recomendaciones_batch():
+    """
+    Evalúa un lote de perfiles (arreglo JSON o NDJSON) y devuelve una línea
+    NDJSON por perfil a medida que se resuelve. Cada bloque de LOTE_TAMANO
+    perfiles se envía al motor en una sola consulta, o al motor vectorizado
+    si se pide `?motor=vectorizado`. Con X-Deadline-Ms el plazo cubre el lote
+    entero: los bloques que ya no caben se informan como error sin evaluarlos.
+    """
+    motor = request.args.get('motor', MOTOR_LOTES)
+    if motor not in ('prolog', 'vectorizado'):
+        return jsonify({
+            'error': f'Motor desconocido: {motor}'
+        }), 400
+    if motor == 'vectorizado':
+        try:
+            base.actual().vectorizado()
+        except Exception as e:
+            return jsonify({
+                'error': f'Motor vectorizado no disponible: {str(e)}'
+            }), 400
+
+    try:
+        perfiles = leer_perfiles(request)
+    except ErrorEntradaLote as e:
+        return jsonify({
+            'error': str(e)
+        }), 400
+
+    plazo = g.plazo
+
+    def evaluar_con(version):
+        # Un solo intercambio con el motor por bloque; la caché evita enviar los perfiles ya conocidos
+        def evaluar(pendientes):
+            return [
+                (None if ids is None else recomendaciones_de_ids(ids, version.tabla), error)
+                for ids, error in version.motor.consultar_lote(pendientes, plazo.restante(PROLOG_TIMEOUT))
+            ]
+        return evaluar
+
+    def generar():
+        # El lote entero se evalúa con una sola versión de la base, aunque se recargue a mitad
+        with base.usar() as version:
+            def categorizar(recomendaciones):
+                return categorizar_recomendaciones(recomendaciones, version.tabla)
+            for bloque in en_bloques(perfiles, LOTE_TAMANO):
+                if motor == 'vectorizado':
+                    yield from lineas_bloque(bloque, version.vectorizado().evaluar_bloque, categorizar)
+                    continue
+                if plazo.vencido() or version.motor is None:
+                    motivo = 'Plazo vencido: perfil no evaluado' if version.motor else 'Ningún motor de evaluación disponible'
+                    for indice, perfil, error in bloque:
+                        yield linea_ndjson(error_lote(indice, perfil, error or motivo))
+                    continue
+                validos = [perfil for _, perfil, error in bloque if not error]
+                try:
+                    resultados = cache.evaluar_bloque(validos, evaluar_con(version), version=version)
+                except ErrorPool as e:
+                    # No se pudo reservar el motor o el bloque falló entero: se informa cada perfil
+                    for indice, perfil, _ in bloque:
+                        yield linea_ndjson(error_lote(indice, perfil, f'Error ejecutando Prolog: {e}'))
+                    continue
+                yield from lineas_bloque(bloque, lambda _: resultados, categorizar)
+
+    # El lugar en la admisión se libera al terminar de enviar el lote, no al salir de la vista
+    respuesta = Response(stream_with_context(generar()), mimetype=MIMETYPE_NDJSON)
+    if g.pop('admitida', False):
+        respuesta.call_on_close(admision.liberar)
+    return respuesta
+
+@app.route('/api/sensibilidad', methods=['POST'])
+def get_sensibilidad():
+    """
+    Para un perfil, devuelve cada regla con su estado y los valores de cada
+    campo en los que se enciende o se apaga (sin consultar al motor)
+    """
+    data = request.get_json(silent=True)
+    error = validar_perfil(data)
+    if error:
+        return jsonify({
+            'error': error
+        }), 400
+    version = base.actual()
+    g.version_reglas = version.id
+    try:
+        with metricas.etapa('sensibilidad'):
+            reglas = analizar_perfil(data, version.reglas)
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'error': f'Perfil no evaluable: {str(e)}'
+        }), 400
+    return jsonify({
+        'success': True,
+        'reglas': reglas,
+        'version_reglas': version.id
+    })
+
+@app.route('/api/proyecciones', methods=['POST'])
+def get_proyecciones():
+    """
+    Proyecciones mes a mes de un perfil o de un lote (fondo de emergencia,
+    pago de deuda actual frente al mínimo y avance de metas); `?meses=N`
+    agrega la serie de los próximos N meses
+    """
+    estado, cuerpo = responder_proyecciones(request.get_json(silent=True), request.args.get('meses'))
+    return jsonify(cuerpo), estado
+
+@app.route('/api/reglas', methods=['GET'])
+def get_reglas():
+    """
+    Diccionario id -> texto, categoría y prioridad de la versión vigente, para
+    el formato compacto. Con `?version=<id>` la respuesta es inmutable.
+    """
+    version = base.actual()
+    g.version_reglas = version.id
+    pedida = request.args.get('version')
+    if pedida is not None and pedida != version.id:
+        return jsonify({
+            'error': f'La versión {pedida} de las reglas ya no está disponible',
+            'version_reglas': version.id
+        }), 404
+    etag = etag_debil('reglas', version.id)
+    cache_control = CACHE_INMUTABLE if pedida is not None else CACHE_REVALIDAR
+    response = no_modificado(etag, cache_control)
+    if response is None:
+        response = jsonify(version.tabla.diccionario(version.id))
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+# El perfil de ejemplo es fijo durante la vida del proceso
+ETAG_EJEMPLO = etag_debil('ejemplo', json.dumps(EJEMPLO_PERFIL, sort_keys=True))
+
+@app.route('/api/ejemplo', methods=['GET'])
+def get_ejemplo():
+    """Obtiene un perfil de ejemplo (admite If-None-Match)"""
+    response = no_modificado(ETAG_EJEMPLO, CACHE_REVALIDAR)
+    if response is not None:
+        return response
+
+    response = jsonify({
+        'success': True,
+        'perfil': dict(EJEMPLO_PERFIL)
+    })
+    response.headers['ETag'] = ETAG_EJEMPLO
+    response.headers['Cache-Control'] = CACHE_REVALIDAR
+    return response
+
+def main(titulo='🚀 Iniciando servidor Flask'):
+    print("=" * 50)
+    print(titulo)
+    print("=" * 50)
+
+    # Verificar requisitos
+    if not verificar_swipl():
+        print("⚠️  ADVERTENCIA: No se encuentra SWI-Prolog")
+        print("   Asegúrate de que 'swipl' esté en el PATH o configura la variable de entorno SWIPL_CMD")
+    else:
+        print(f"✓ SWI-Prolog encontrado: {get_swipl_cmd()}")
+
+    if not os.path.exists(PROLOG_FILE):
+        print(f"⚠️  ADVERTENCIA: No se encuentra {PROLOG_FILE}")
+        print(f"   Asegúrate de que el archivo esté en: {os.path.abspath('.')}")
+    else:
+        print(f"✓ Archivo Prolog encontrado: {PROLOG_FILE}")
+        # Elegir el motor (conformidad + benchmark) antes de aceptar peticiones
+        version = base.actual()
+        print(f"✓ Base de conocimiento cargada desde: {os.path.basename(version.artefacto.ruta)} ({version.artefacto.tipo}, versión {version.id})")
+        for nombre, candidato in selector.candidatos.items():
+            if candidato.get('disponible'):
+                marca = '✓' if candidato.get('conforme') else '✗'
+                print(f"   {marca} {nombre:<12} p50 {candidato['p50_ms']} ms  p95 {candidato['p95_ms']} ms")
+            else:
+                print(f"   ℹ️  {nombre:<12} no disponible: {candidato['error']}")
+        if base.intervalo > 0:
+            print(f"✓ Recarga en caliente: se revisa {PROLOG_FILE} cada {base.intervalo:g}s (KB_RECARGA)")
+
+    print("\nEndpoints disponibles:")
+    print("  GET  /api/health          - Estado del servidor y motor elegido")
+    print("  POST /api/recomendaciones - Obtener recomendaciones")
+    print("  POST /api/recomendaciones/sesion - Reevaluación incremental (solo los campos cambiados)")
+    print("  POST /api/recomendaciones/flujo - Recomendaciones por streaming (Server-Sent Events)")
+    print("  POST /api/recomendaciones/batch - Lote de perfiles (JSON/NDJSON -> NDJSON)")
+    print("  POST /api/sensibilidad    - Límites de cada regla para un perfil (what-if)")
+    print("  POST /api/proyecciones    - Proyección de fondo, deuda y metas (perfil o lote)")
+    print("  GET  /api/reglas          - Diccionario de reglas de la versión vigente (formato compacto)")
+    print("  GET  /api/ejemplo         - Obtener perfil de ejemplo")
+    print("  GET  /api/metrics         - Métricas (formato Prometheus)")
+    print("  GET  /api/admin/trazas    - Trazas de peticiones (cabecera X-Traza o TRAZA_MUESTREO)")
+    print("=" * 50)
+    print()
+
+    # Sin el recargador de Flask: duplicaría el proceso y la elección del motor
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
+
+if __name__ == '__main__':
+    main()
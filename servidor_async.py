@@ -0,0 +1,652 @@
+"""
+Servidor asíncrono (ASGI) con el mismo contrato que servidor.py
+Expone los mismos endpoints sobre asyncio y elige el motor igual que
+servidor.py (motores.SelectorMotor). El motor `subproceso` es aquí
+MotorAsync: las peticiones esperan a Prolog en pipes no bloqueantes
+(pool_async.py), por lo que un solo proceso sostiene miles de consultas en
+curso sin un hilo por petición; pyswip y el motor vectorizado se esperan en
+un hilo. Cada petición tiene un plazo (SWIPL_TIMEOUT o la cabecera
+X-Deadline-Ms, el menor); al vencer se responde 504 y se cancela Prolog.
+Las consultas pasan por el control de admisión (admision.py): con la cola
+llena o sin tiempo para empezar se rechazan con 429/503 y Retry-After. Un
+cuerpo mayor que CUERPO_MAX_BYTES (LOTE_MAX_BYTES en los lotes) recibe 413.
+Como en servidor.py, los eventos van a la bitácora (bitacora.py) y las
+peticiones con X-Traza, o muestreadas, dejan su traza en /api/admin/trazas.
+
+Ejecutar: python servidor_async.py   (requiere uvicorn)
+o con cualquier servidor ASGI: hypercorn servidor_async:app
+"""
+
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+
+from arranque import verificar_swipl, swipl_detectado
+from pool_swipl import ErrorPool, TimeoutConsulta
+from motores import SelectorMotor, MotorAsync, MotorOcupado, MOTORES
+from perfiles import validar_perfil, EJEMPLO_PERFIL
+from lotes import (
+    ErrorEntradaLote, es_ndjson, perfiles_cuerpo, leer_ndjson_async, en_bloques_async,
+    error_lote, linea_ndjson, lineas_bloque, LOTE_TAMANO, MIMETYPE_NDJSON
+)
+from cache_recomendaciones import cache
+from categorias import categorizar_recomendaciones, recomendaciones_de_ids, recomendaciones_compactas
+from sensibilidad import analizar_perfil
+from proyecciones import responder as responder_proyecciones
+from sesiones import sesiones, ErrorSesion, ids_disparadas
+import flujo
+from recarga import BaseConocimiento, CABECERA_VERSION
+from admision import ControlAdmision, Rechazo, plazo_cabecera, CABECERA_PLAZO
+from respuestas_http import (
+    elegir_codificacion, comprimir, etag_debil, coincide_etag, CACHE_INMUTABLE, CACHE_REVALIDAR
+)
+import metricas
+import trazas
+from bitacora import bitacora
+try:
+    import uvicorn
+    UVICORN_AVAILABLE = True
+except ImportError:
+    uvicorn = None
+    UVICORN_AVAILABLE = False
+
+PROLOG_FILE = "asistente_finanzas.pl"
+
+# Motor para /api/recomendaciones/batch: 'prolog' (el elegido) o 'vectorizado' (NumPy)
+MOTOR_LOTES = os.environ.get('MOTOR_LOTES', 'prolog')
+PROLOG_TIMEOUT = float(os.environ.get('SWIPL_TIMEOUT', '15'))
+# Tamaño máximo del cuerpo (413 si se supera): el de cualquier endpoint y el
+# de un lote, que en NDJSON se procesa a medida que llega y no se junta entero
+CUERPO_MAX = int(os.environ.get('CUERPO_MAX_BYTES', str(1024 * 1024)))
+LOTE_MAX = int(os.environ.get('LOTE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+CABECERAS_CORS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'content-type, ' + CABECERA_PLAZO.lower().encode() + b', '
+     + trazas.CABECERA_TRAZA.lower().encode() + b', ' + trazas.CABECERA_TOKEN.lower().encode()),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-expose-headers', CABECERA_VERSION.lower().encode() + b', retry-after, etag, '
+     + trazas.CABECERA_TRAZA_ID.lower().encode()),
+]
+
+# Bucle de eventos del servidor: los pools asíncronos de cada versión viven en él
+_bucle = None
+
+
+def motor_async(version):
+    """Motor `subproceso` de este servidor: el pool asíncrono en el bucle del servidor"""
+    return MotorAsync(version, _bucle)
+
+
+# El motor de cada versión de la base lo crea el selector; se recarga en caliente
+selector = SelectorMotor(motores=dict(MOTORES, subproceso=motor_async))
+base = BaseConocimiento(PROLOG_FILE, crear_motor=selector, cerrar_motor=lambda motor: motor.cerrar())
+base.al_cambiar(cache.vaciar)
+
+
+async def version_vigente():
+    """
+    Construye la primera versión fuera del bucle de eventos (qcompile y la
+    elección del motor pueden tardar)
+    """
+    global _bucle
+    if _bucle is None:
+        _bucle = asyncio.get_running_loop()
+    if base.vigente() is None:
+        await asyncio.to_thread(base.actual)
+    return base.vigente()
+
+
+def estado_motor():
+    version = base.vigente()
+    return version.motor.estado() if version is not None and version.motor is not None else None
+
+
+async def consultar_motor(version, perfil, timeout):
+    """Recomendaciones (textos) de un perfil con el motor de la versión; lanza ErrorPool si falla"""
+    if version.motor is None:
+        raise ErrorPool('Ningún motor de evaluación disponible')
+    return recomendaciones_de_ids(await version.motor.consultar_async(perfil, timeout), version.tabla)
+
+
+def error_motor(e):
+    """(estado, mensaje) de la respuesta HTTP para un error del motor"""
+    if isinstance(e, TimeoutConsulta):
+        return 504, f'Tiempo agotado: {e}'
+    if isinstance(e, MotorOcupado):
+        return 503, f'Servidor ocupado: {e}'
+    bitacora.error('error_motor', error=str(e))
+    return 500, f'Error ejecutando Prolog: {e}'
+
+
+# Peticiones admitidas a la vez (en curso o esperando un trabajador)
+admision = ControlAdmision()
+
+
+class Peticion:
+    """Lo que los manejadores usan de una petición HTTP"""
+
+    def __init__(self, scope):
+        self.cabeceras = dict(scope.get('headers') or [])
+        consulta = parse_qs((scope.get('query_string') or b'').decode('latin-1'))
+        self.consulta = {nombre: valores[0] for nombre, valores in consulta.items()}
+        # Lo fija app() al llegar la petición, antes de leer el cuerpo
+        self.plazo = None
+        self.cliente = (scope.get('client') or ('',))[0]
+        self.cuerpo = b''
+        # Con NDJSON en un endpoint de lotes: las líneas del cuerpo a medida que llegan
+        self.lineas = None
+
+    def cabecera(self, nombre):
+        valor = self.cabeceras.get(nombre.lower().encode())
+        return None if valor is None else valor.decode('latin-1')
+
+
+def no_modificado(peticion, etag, cache_control):
+    """Respuesta 304 si el cliente ya tiene la representación con `etag`, o None"""
+    if coincide_etag(peticion.cabecera('If-None-Match'), etag):
+        return 304, None, {'ETag': etag, 'Cache-Control': cache_control}
+    return None
+
+
+# --------- Manejadores ---------
+
+async def health_check(peticion):
+    version = base.vigente()
+    prolog_file_ok = os.path.exists(PROLOG_FILE)
+    motor_ok = version is None or version.motor is not None
+    return 200, {
+        'status': 'ok' if prolog_file_ok and motor_ok else 'error',
+        'message': 'Servidor ASGI funcionando correctamente' if motor_ok else 'Ningún motor de evaluación disponible',
+        'swipl_disponible': verificar_swipl(),
+        'archivo_prolog_encontrado': prolog_file_ok,
+        'swipl_path_detectado': swipl_detectado(),
+        'motor': selector.estado(version.motor if version is not None else None),
+        'base_conocimiento': base.estado(),
+        'cache': cache.estadisticas(),
+        'sesiones': sesiones.estado(),
+        'admision': admision.estado(),
+        'bitacora': bitacora.estado(),
+        'trazas': trazas.buffer.estado()
+    }
+
+
+async def get_trazas(peticion):
+    if not trazas.autorizado(peticion.cabecera(trazas.CABECERA_TOKEN), peticion.cliente):
+        return 403, {'error': 'No autorizado'}
+    return trazas.consultar(peticion.consulta)
+
+
+async def get_recomendaciones(peticion):
+    formato = peticion.consulta.get('formato', 'completo')
+    if formato not in ('completo', 'compacto'):
+        return 400, {'error': f'Formato desconocido: {formato}'}
+    try:
+        with metricas.etapa('parseo_json'):
+            data = json.loads(peticion.cuerpo) if peticion.cuerpo else None
+    except ValueError as e:
+        return 400, {'error': f'JSON inválido: {e}'}
+    trazas.anotar(perfil=data)
+
+    error = validar_perfil(data)
+    if error:
+        return 400, {'error': error}
+
+    await version_vigente()
+
+    # Toda la petición se resuelve con la versión vigente al recibirla
+    with base.usar() as version:
+        async def consultar(perfil):
+            restante = peticion.plazo.restante(PROLOG_TIMEOUT)
+            return await consultar_motor(version, perfil, restante)
+
+        try:
+            recomendaciones = await cache.obtener_async(data, consultar, version=version)
+        except ErrorPool as e:
+            estado, mensaje = error_motor(e)
+            return estado, {'error': mensaje}
+        bitacora.info('recomendaciones', total=len(recomendaciones), version=version.id)
+
+        if formato == 'compacto':
+            return 200, {
+                'success': True,
+                'total': len(recomendaciones),
+                'reglas': recomendaciones_compactas(recomendaciones, version.tabla),
+                'version_reglas': version.id,
+                'diccionario': f'/api/reglas?version={version.id}'
+            }
+        return 200, {
+            'success': True,
+            'total': len(recomendaciones),
+            'recomendaciones': recomendaciones,
+            'categorizadas': categorizar_recomendaciones(recomendaciones, version.tabla),
+            'version_reglas': version.id
+        }
+
+
+async def get_recomendaciones_sesion(peticion):
+    try:
+        data = json.loads(peticion.cuerpo) if peticion.cuerpo else None
+    except ValueError as e:
+        return 400, {'error': f'JSON inválido: {e}'}
+    try:
+        anterior, perfil, cambiados = sesiones.preparar(data)
+    except ErrorSesion as e:
+        return e.estado, {'error': str(e)}
+
+    await version_vigente()
+    with base.usar() as version:
+        try:
+            incremental = sesiones.incremental(anterior, cambiados, perfil, version)
+        except (ValueError, TypeError) as e:
+            return 400, {'error': f'Perfil no evaluable: {e}'}
+        if incremental is not None:
+            return 200, sesiones.responder(anterior, perfil, version, *incremental)
+
+        async def consultar(p):
+            restante = peticion.plazo.restante(PROLOG_TIMEOUT)
+            return await consultar_motor(version, p, restante)
+
+        try:
+            recomendaciones = await cache.obtener_async(perfil, consultar, version=version)
+        except ErrorPool as e:
+            estado, mensaje = error_motor(e)
+            return estado, {'error': mensaje}
+        disparadas = ids_disparadas(recomendaciones, version.tabla)
+        return 200, sesiones.responder(anterior, perfil, version, disparadas)
+
+
+async def get_recomendaciones_flujo(peticion):
+    try:
+        data = json.loads(peticion.cuerpo) if peticion.cuerpo else None
+    except ValueError as e:
+        return 400, {'error': f'JSON inválido: {e}'}
+    error = validar_perfil(data)
+    if error:
+        return 400, {'error': error}
+    trazas.anotar(perfil=data)
+    await version_vigente()
+
+    async def generar():
+        with base.usar() as version:
+            enviadas = []
+            for evento in flujo.previa(data, version, enviadas):
+                yield evento
+
+            async def consultar(perfil):
+                restante = peticion.plazo.restante(PROLOG_TIMEOUT)
+                return await consultar_motor(version, perfil, restante)
+
+            try:
+                recomendaciones = await cache.obtener_async(data, consultar, version=version)
+            except ErrorPool as e:
+                estado, mensaje = error_motor(e)
+                yield flujo.evento_error(mensaje, estado)
+                return
+            for evento in flujo.cierre(recomendaciones, version, enviadas):
+                yield evento
+
+    return 200, Flujo(generar(), flujo.MIMETYPE_SSE), dict(flujo.CABECERAS_SSE)
+
+
+async def get_recomendaciones_batch(peticion):
+    """
+    Lote de perfiles (arreglo JSON o NDJSON) con una línea NDJSON por perfil,
+    como en servidor.py. Con NDJSON cada bloque se evalúa en cuanto llegan
+    sus líneas, sin esperar el resto del cuerpo. Los bloques pasan por la
+    caché y por `consultar_lote_async` del motor, o por el motor vectorizado
+    con `?motor=vectorizado`.
+    """
+    motor = peticion.consulta.get('motor', MOTOR_LOTES)
+    if motor not in ('prolog', 'vectorizado'):
+        return 400, {'error': f'Motor desconocido: {motor}'}
+    await version_vigente()
+    if motor == 'vectorizado':
+        try:
+            await asyncio.to_thread(base.actual().vectorizado)
+        except Exception as e:
+            return 400, {'error': f'Motor vectorizado no disponible: {str(e)}'}
+    if peticion.lineas is not None:
+        perfiles = leer_ndjson_async(peticion.lineas)
+    else:
+        try:
+            perfiles = perfiles_cuerpo(peticion.cuerpo)
+        except ErrorEntradaLote as e:
+            return 400, {'error': str(e)}
+    plazo = peticion.plazo
+
+    async def generar():
+        # El lote entero se evalúa con una sola versión de la base, aunque se recargue a mitad
+        with base.usar() as version:
+            def categorizar(recomendaciones):
+                return categorizar_recomendaciones(recomendaciones, version.tabla)
+
+            async def evaluar(pendientes):
+                resultados = await version.motor.consultar_lote_async(pendientes, plazo.restante(PROLOG_TIMEOUT))
+                return [(None if ids is None else recomendaciones_de_ids(ids, version.tabla), error)
+                        for ids, error in resultados]
+
+            try:
+                async for bloque in en_bloques_async(perfiles, LOTE_TAMANO):
+                    if motor == 'vectorizado':
+                        evaluado = await asyncio.to_thread(version.vectorizado().evaluar_bloque,
+                                                           [perfil for _, perfil, error in bloque if not error])
+                        for linea in lineas_bloque(bloque, lambda _: evaluado, categorizar):
+                            yield linea
+                        continue
+                    if plazo.vencido() or version.motor is None:
+                        motivo = 'Plazo vencido: perfil no evaluado' if version.motor else 'Ningún motor de evaluación disponible'
+                        for indice, perfil, error in bloque:
+                            yield linea_ndjson(error_lote(indice, perfil, error or motivo))
+                        continue
+                    validos = [perfil for _, perfil, error in bloque if not error]
+                    try:
+                        resultados = await cache.evaluar_bloque_async(validos, evaluar, version=version)
+                    except ErrorPool as e:
+                        # No se pudo reservar el motor o el bloque falló entero: se informa cada perfil
+                        for indice, perfil, _ in bloque:
+                            yield linea_ndjson(error_lote(indice, perfil, f'Error ejecutando Prolog: {e}'))
+                        continue
+                    for linea in lineas_bloque(bloque, lambda _: resultados, categorizar):
+                        yield linea
+            except Rechazo as r:
+                # El cuerpo superó LOTE_MAX a mitad del envío: el estado 200 ya salió
+                yield linea_ndjson({'success': False, 'error': str(r), 'estado': r.estado})
+
+    return 200, Flujo(generar(), MIMETYPE_NDJSON)
+
+
+async def get_sensibilidad(peticion):
+    try:
+        data = json.loads(peticion.cuerpo) if peticion.cuerpo else None
+    except ValueError as e:
+        return 400, {'error': f'JSON inválido: {e}'}
+    error = validar_perfil(data)
+    if error:
+        return 400, {'error': error}
+    version = await version_vigente()
+    try:
+        with metricas.etapa('sensibilidad'):
+            reglas = analizar_perfil(data, version.reglas)
+    except (ValueError, TypeError) as e:
+        return 400, {'error': f'Perfil no evaluable: {e}'}
+    return 200, {'success': True, 'reglas': reglas, 'version_reglas': version.id}
+
+
+async def get_proyecciones(peticion):
+    try:
+        data = json.loads(peticion.cuerpo) if peticion.cuerpo else None
+    except ValueError as e:
+        return 400, {'error': f'JSON inválido: {e}'}
+    # Un lote grande es cálculo puro: fuera del bucle de eventos
+    return await asyncio.to_thread(responder_proyecciones, data, peticion.consulta.get('meses'))
+
+
+async def get_metrics(peticion):
+    return 200, TextoPlano(metricas.registro.exponer(), metricas.MIMETYPE_PROMETHEUS)
+
+
+async def get_reglas(peticion):
+    version = await version_vigente()
+    pedida = peticion.consulta.get('version')
+    if pedida is not None and pedida != version.id:
+        return 404, {'error': f'La versión {pedida} de las reglas ya no está disponible',
+                     'version_reglas': version.id}
+    etag = etag_debil('reglas', version.id)
+    cache_control = CACHE_INMUTABLE if pedida is not None else CACHE_REVALIDAR
+    return no_modificado(peticion, etag, cache_control) or (
+        200, version.tabla.diccionario(version.id), {'ETag': etag, 'Cache-Control': cache_control}
+    )
+
+
+# El perfil de ejemplo es fijo durante la vida del proceso
+ETAG_EJEMPLO = etag_debil('ejemplo', json.dumps(EJEMPLO_PERFIL, sort_keys=True))
+
+
+async def get_ejemplo(peticion):
+    cabeceras = {'ETag': ETAG_EJEMPLO, 'Cache-Control': CACHE_REVALIDAR}
+    return no_modificado(peticion, ETAG_EJEMPLO, CACHE_REVALIDAR) or (200, {
+        'success': True,
+        'perfil': dict(EJEMPLO_PERFIL)
+    }, cabeceras)
+
+
+# Manejadores que consultan a Prolog y pasan por el control de admisión
+CON_ADMISION = {get_recomendaciones, get_recomendaciones_sesion, get_recomendaciones_flujo, get_recomendaciones_batch}
+
+# Manejadores de lotes: su cuerpo puede ser de hasta LOTE_MAX y, en NDJSON, se lee por líneas
+CUERPO_EN_FLUJO = {get_recomendaciones_batch}
+
+RUTAS = {
+    ('GET', '/api/health'): health_check,
+    ('POST', '/api/recomendaciones'): get_recomendaciones,
+    ('POST', '/api/recomendaciones/sesion'): get_recomendaciones_sesion,
+    ('POST', '/api/recomendaciones/flujo'): get_recomendaciones_flujo,
+    ('POST', '/api/recomendaciones/batch'): get_recomendaciones_batch,
+    ('POST', '/api/sensibilidad'): get_sensibilidad,
+    ('POST', '/api/proyecciones'): get_proyecciones,
+    ('GET', '/api/reglas'): get_reglas,
+    ('GET', '/api/ejemplo'): get_ejemplo,
+    ('GET', '/api/metrics'): get_metrics,
+    ('GET', '/api/admin/trazas'): get_trazas,
+}
+
+metricas.registrar_pool(estado_motor)
+metricas.registrar_cache(cache)
+metricas.registrar_admision(admision)
+
+
+class TextoPlano(str):
+    """Respuesta que se envía tal cual (no JSON) con su content-type"""
+
+    def __new__(cls, texto, tipo):
+        obj = super().__new__(cls, texto)
+        obj.tipo = tipo
+        return obj
+
+
+# --------- Aplicación ASGI ---------
+
+def _excedido(limite):
+    return Rechazo(413, f'El cuerpo de la petición supera {limite} bytes')
+
+
+async def _leer_cuerpo(receive, limite=CUERPO_MAX):
+    """El cuerpo entero (None si el cliente se desconecta); Rechazo 413 si supera `limite`"""
+    partes = []
+    recibidos = 0
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'http.disconnect':
+            return None
+        parte = mensaje.get('body', b'')
+        recibidos += len(parte)
+        if recibidos > limite:
+            raise _excedido(limite)
+        partes.append(parte)
+        if not mensaje.get('more_body'):
+            return b''.join(partes)
+
+
+async def _lineas_cuerpo(receive, limite=LOTE_MAX):
+    """
+    Las líneas del cuerpo a medida que llegan, sin juntarlo entero. Rechazo
+    413 si el cuerpo supera `limite` o una línea supera CUERPO_MAX.
+    """
+    pendiente = b''
+    recibidos = 0
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'http.disconnect':
+            return
+        parte = mensaje.get('body', b'')
+        recibidos += len(parte)
+        if recibidos > limite:
+            raise _excedido(limite)
+        *lineas, pendiente = (pendiente + parte).split(b'\n')
+        for linea in lineas:
+            yield linea
+        if len(pendiente) > CUERPO_MAX:
+            raise Rechazo(413, f'Una línea del lote supera {CUERPO_MAX} bytes')
+        if not mensaje.get('more_body'):
+            if pendiente:
+                yield pendiente
+            return
+
+
+class Flujo:
+    """Respuesta que se genera mientras se envía: un iterador asíncrono de texto"""
+
+    def __init__(self, eventos, tipo):
+        self.eventos = eventos
+        self.tipo = tipo
+
+
+async def _enviar_flujo(send, estado, datos, extra=None):
+    """Envía cada fragmento en cuanto se genera (sin compresión ni content-length)"""
+    cabeceras = [(b'content-type', datos.tipo.encode())]
+    for nombre, valor in (extra or {}).items():
+        cabeceras.append((nombre.lower().encode(), valor.encode()))
+    await send({'type': 'http.response.start', 'status': estado, 'headers': cabeceras + CABECERAS_CORS})
+    try:
+        async for fragmento in datos.eventos:
+            await send({'type': 'http.response.body', 'body': fragmento.encode('utf-8'), 'more_body': True})
+    except Exception as e:
+        # El estado ya se envió: el error va como último evento
+        bitacora.error('error_endpoint', error=str(e))
+        error = flujo.evento_error(f'Error procesando solicitud: {str(e)}', 500)
+        await send({'type': 'http.response.body', 'body': error.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _responder(send, estado, datos, extra=None, aceptar=None):
+    tipo = b'application/json'
+    if isinstance(datos, TextoPlano):
+        cuerpo, tipo = datos.encode('utf-8'), datos.tipo.encode()
+    else:
+        cuerpo = b'' if datos is None else json.dumps(datos, ensure_ascii=False).encode('utf-8')
+    cabeceras = [(b'content-type', tipo), (b'vary', b'accept-encoding')]
+    codificacion = elegir_codificacion(aceptar, len(cuerpo)) if estado >= 200 and estado != 304 else None
+    if codificacion is not None:
+        cuerpo = comprimir(cuerpo, codificacion)
+        cabeceras.append((b'content-encoding', codificacion.encode()))
+    cabeceras.append((b'content-length', str(len(cuerpo)).encode()))
+    if isinstance(datos, dict) and 'version_reglas' in datos:
+        cabeceras.append((CABECERA_VERSION.lower().encode(), datos['version_reglas'].encode()))
+    for nombre, valor in (extra or {}).items():
+        cabeceras.append((nombre.lower().encode(), valor.encode()))
+    await send({'type': 'http.response.start', 'status': estado, 'headers': cabeceras + CABECERAS_CORS})
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            try:
+                await version_vigente()
+            except Exception as e:
+                bitacora.error('base_no_cargada', error=str(e))
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            base.cerrar()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    metodo = scope['method']
+    if metodo == 'OPTIONS':
+        await _responder(send, 204, None)
+        return
+    manejador = RUTAS.get((metodo, scope['path']))
+    if manejador is None:
+        await _responder(send, 404, {'error': 'Ruta no encontrada'})
+        return
+
+    peticion = Peticion(scope)
+    aceptar = peticion.cabecera('Accept-Encoding')
+    admitida = False
+    estado, extra = None, None
+    traza, traza_token = (None, None) if manejador is get_trazas else trazas.iniciar(
+        manejador.__name__, peticion.cabecera(trazas.CABECERA_TRAZA)
+    )
+    try:
+        # El plazo corre desde la llegada; una cabecera inválida es un Rechazo (400)
+        peticion.plazo = plazo_cabecera(peticion.cabecera(CABECERA_PLAZO))
+        limite = LOTE_MAX if manejador in CUERPO_EN_FLUJO else CUERPO_MAX
+        largo = peticion.cabecera('Content-Length')
+        if largo is not None and largo.isdigit() and int(largo) > limite:
+            raise _excedido(limite)
+        if manejador in CON_ADMISION:
+            admision.admitir(peticion.plazo)
+            admitida = True
+        if manejador in CUERPO_EN_FLUJO and es_ndjson(peticion.cabecera('Content-Type')):
+            # El manejador consume el cuerpo mientras responde
+            peticion.lineas = _lineas_cuerpo(receive, limite)
+        else:
+            peticion.cuerpo = await _leer_cuerpo(receive, limite)
+            if peticion.cuerpo is None:
+                return
+        # (estado, datos) o (estado, datos, cabeceras adicionales)
+        estado, datos, *resto = await manejador(peticion)
+        extra = resto[0] if resto else None
+        if isinstance(datos, Flujo):
+            # El cuerpo se evalúa al enviarlo: la admisión y la traza cubren el envío
+            if traza is not None:
+                extra = dict(extra or {}, **{trazas.CABECERA_TRAZA_ID: traza.id})
+            metricas.contar_peticion(manejador.__name__, estado)
+            await _enviar_flujo(send, estado, datos, extra)
+            return
+    except Rechazo as r:
+        estado, datos, extra = r.estado, {'error': str(r)}, r.cabeceras()
+    except asyncio.CancelledError:
+        # El cliente se desconectó: la cancelación ya liberó el trabajador
+        raise
+    except Exception as e:
+        bitacora.error('error_endpoint', endpoint=manejador.__name__, error=str(e))
+        estado, datos = 500, {'error': f'Error procesando solicitud: {str(e)}'}
+    finally:
+        if admitida:
+            admision.liberar()
+        trazas.terminar(traza, traza_token, estado)
+    if traza is not None:
+        extra = dict(extra or {}, **{trazas.CABECERA_TRAZA_ID: traza.id})
+    metricas.contar_peticion(manejador.__name__, estado)
+    await _responder(send, estado, datos, extra, aceptar)
+
+
+if __name__ == '__main__':
+    print("=" * 50)
+    print("🚀 Iniciando servidor ASGI (asyncio)")
+    print("=" * 50)
+    if not verificar_swipl():
+        print("⚠️  ADVERTENCIA: No se encuentra SWI-Prolog")
+        print("   Asegúrate de que 'swipl' esté en el PATH o configura la variable de entorno SWIPL_CMD")
+    print(f"✓ Motor elegido al arrancar entre {', '.join(selector.motores)} (MOTOR; plazo máximo {PROLOG_TIMEOUT}s, cabecera {CABECERA_PLAZO})")
+    print(f"✓ Admisión: hasta {admision.maximo or 'sin límite de'} peticiones a la vez (ADMISION_COLA)")
+    print("\nEndpoints disponibles:")
+    print("  GET  /api/health          - Estado del servidor y motor elegido")
+    print("  POST /api/recomendaciones - Obtener recomendaciones")
+    print("  POST /api/recomendaciones/sesion - Reevaluación incremental (solo los campos cambiados)")
+    print("  POST /api/recomendaciones/flujo - Recomendaciones por streaming (Server-Sent Events)")
+    print("  POST /api/recomendaciones/batch - Lote de perfiles (JSON/NDJSON -> NDJSON)")
+    print("  POST /api/sensibilidad    - Límites de cada regla para un perfil (what-if)")
+    print("  POST /api/proyecciones    - Proyección de fondo, deuda y metas (perfil o lote)")
+    print("  GET  /api/reglas          - Diccionario de reglas de la versión vigente (formato compacto)")
+    print("  GET  /api/ejemplo         - Obtener perfil de ejemplo")
+    print("  GET  /api/metrics         - Métricas (formato Prometheus)")
+    print("  GET  /api/admin/trazas    - Trazas de peticiones (cabecera X-Traza o TRAZA_MUESTREO)")
+    print("=" * 50)
+    if not UVICORN_AVAILABLE:
+        print("✗ uvicorn no está instalado: pip install uvicorn")
+        print("   o ejecuta con otro servidor ASGI, por ejemplo: hypercorn servidor_async:app")
+        raise SystemExit(1)
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,216 @@
+"""
+Sesiones de reevaluación incremental
+El formulario suele reenviar el mismo perfil con uno o dos campos cambiados.
+La primera petición se evalúa completa (Prolog, a través de la caché) y el
+servidor guarda por unos minutos el perfil y el conjunto de reglas
+disparadas. Las siguientes envían solo {"sesion": id, "cambios": {...}}: se
+reevalúan en Python únicamente las reglas cuyas condiciones leen alguno de
+los campos cambiados (las condiciones compiladas de reglas.py, las mismas
+del motor vectorizado) y la respuesta lleva solo las recomendaciones
+agregadas y las eliminadas. Si entre tanto se publicó otra versión de la
+base, el perfil se vuelve a evaluar completo y se responde igualmente la
+diferencia.
+
+Las sesiones viven en la memoria del proceso: con varios procesos detrás de
+un balanceador, una sesión desconocida responde 404 y el cliente reenvía el
+perfil completo. SESION_TTL fija los segundos de inactividad y SESION_MAX el
+número máximo de sesiones (se descartan las menos recientes).
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import metricas
+from perfiles import validar_perfil
+from reglas import campos_de, evaluar_condicion
+
+SESION_TTL = float(os.environ.get('SESION_TTL', '900'))
+SESION_MAX = int(os.environ.get('SESION_MAX', '10000'))
+
+
+class ErrorSesion(Exception):
+    """La petición de sesión no se puede atender: `estado` HTTP"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class Sesion:
+    """Último perfil evaluado de un cliente y las reglas que disparó"""
+
+    def __init__(self, id, perfil, disparadas, version):
+        self.id = id
+        self.perfil = perfil
+        self.disparadas = disparadas
+        self.version = version
+        self.usada = time.monotonic()
+
+
+def _distinto(anterior, nuevo):
+    # 1 y true son iguales en Python pero no para Prolog
+    return type(anterior) is not type(nuevo) or anterior != nuevo
+
+
+def indice_dependencias(reglas):
+    """
+    Cláusulas de cada id de regla y, por campo del perfil, los ids de las
+    reglas con alguna condición que lee ese campo
+    """
+    clausulas, dependientes = {}, {}
+    for regla in reglas:
+        clausulas.setdefault(regla.id, []).append(regla.condiciones)
+        for cond in regla.condiciones:
+            for campo in campos_de(cond.caracteristica):
+                dependientes.setdefault(campo, set()).add(regla.id)
+    return clausulas, dependientes
+
+
+class AlmacenSesiones:
+    """Sesiones con caducidad por inactividad y desalojo LRU"""
+
+    def __init__(self, ttl=SESION_TTL, maximo=SESION_MAX):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.creadas = 0
+        self.incrementales = 0
+        self.completas = 0
+        self.expiradas = 0
+        self._sesiones = OrderedDict()
+        self._indice = (None, None)
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora):
+        while self._sesiones:
+            sesion = next(iter(self._sesiones.values()))
+            if ahora - sesion.usada < self.ttl and len(self._sesiones) <= self.maximo:
+                break
+            self._sesiones.popitem(last=False)
+            self.expiradas += 1
+
+    def obtener(self, sesion_id):
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            sesion = self._sesiones.get(sesion_id)
+            if sesion is not None:
+                sesion.usada = ahora
+                self._sesiones.move_to_end(sesion_id)
+            return sesion
+
+    def preparar(self, data):
+        """
+        Interpreta el cuerpo de la petición: un perfil completo (sesión nueva)
+        o {"sesion": id, "cambios": {...}}. Devuelve (sesion anterior o None,
+        perfil resultante, campos cambiados). Lanza ErrorSesion.
+        """
+        if isinstance(data, dict) and 'sesion' in data:
+            sesion = self.obtener(data['sesion'])
+            if sesion is None:
+                raise ErrorSesion(404, 'Sesión desconocida o expirada: envía el perfil completo')
+            cambios = data.get('cambios', {})
+            if not isinstance(cambios, dict):
+                raise ErrorSesion(400, '"cambios" debe ser un objeto JSON')
+            cambiados = {
+                campo for campo, valor in cambios.items()
+                if campo not in sesion.perfil or _distinto(sesion.perfil[campo], valor)
+            }
+            perfil = dict(sesion.perfil, **cambios)
+        else:
+            sesion, perfil, cambiados = None, data, None
+        error = validar_perfil(perfil)
+        if error:
+            raise ErrorSesion(400, error)
+        return sesion, perfil, cambiados
+
+    def _dependencias(self, version):
+        version_id, indice = self._indice
+        if version_id != version.id:
+            indice = indice_dependencias(version.reglas)
+            self._indice = (version.id, indice)
+        return indice
+
+    def incremental(self, sesion, cambiados, perfil, version):
+        """
+        Reglas disparadas por `perfil` reevaluando solo las que dependen de
+        los campos cambiados, o None si la sesión es de otra versión de la
+        base (hay que evaluar completo). Devuelve (disparadas, evaluadas).
+        Lanza ValueError si Prolog rechazaría el perfil.
+        """
+        if sesion is None or sesion.version != version.id:
+            return None
+        clausulas, dependientes = self._dependencias(version)
+        afectadas = set().union(*(dependientes.get(campo, ()) for campo in cambiados))
+        with metricas.etapa('sesion_incremental'):
+            encendidas = {
+                regla_id for regla_id in afectadas
+                if any(all(evaluar_condicion(cond, perfil) for cond in condiciones)
+                       for condiciones in clausulas[regla_id])
+            }
+        return (sesion.disparadas - afectadas) | encendidas, len(afectadas)
+
+    def responder(self, sesion, perfil, version, disparadas, evaluadas=None):
+        """
+        Guarda el nuevo estado de la sesión (o crea una) y arma la respuesta
+        con las recomendaciones agregadas y eliminadas. `evaluadas` es None
+        si el perfil se evaluó completo.
+        """
+        anteriores = sesion.disparadas if sesion is not None else frozenset()
+        with self._lock:
+            if sesion is None:
+                sesion = Sesion(secrets.token_urlsafe(16), perfil, disparadas, version.id)
+                self._sesiones[sesion.id] = sesion
+                self.creadas += 1
+            else:
+                sesion.perfil, sesion.disparadas, sesion.version = perfil, disparadas, version.id
+                self._sesiones[sesion.id] = sesion
+                self._sesiones.move_to_end(sesion.id)
+            if evaluadas is None:
+                self.completas += 1
+            else:
+                self.incrementales += 1
+            self._purgar(time.monotonic())
+
+        reglas = version.tabla.reglas
+        agregadas = sorted(disparadas - anteriores, key=lambda regla_id: reglas[regla_id].texto)
+        return {
+            'success': True,
+            'sesion': sesion.id,
+            'completa': evaluadas is None,
+            'reglas_evaluadas': len(reglas) if evaluadas is None else evaluadas,
+            'total': len(disparadas),
+            'agregadas': [
+                {
+                    'id': regla_id,
+                    'text': reglas[regla_id].texto,
+                    'category': reglas[regla_id].categoria,
+                    'priority': reglas[regla_id].prioridad
+                }
+                for regla_id in agregadas
+            ],
+            'eliminadas': sorted(anteriores - disparadas),
+            'version_reglas': version.id
+        }
+
+    def estado(self):
+        return {
+            'activas': len(self._sesiones),
+            'maximo': self.maximo,
+            'ttl_segundos': self.ttl,
+            'creadas': self.creadas,
+            'incrementales': self.incrementales,
+            'completas': self.completas,
+            'expiradas': self.expiradas
+        }
+
+
+def ids_disparadas(recomendaciones, tabla):
+    """Conjunto de ids de las recomendaciones (textos) de una evaluación completa"""
+    return {regla_id for regla_id in tabla.ids(recomendaciones) if regla_id is not None}
+
+
+# Instancia compartida por el proceso
+sesiones = AlmacenSesiones()
@@ -0,0 +1,83 @@
+"""
+Control de admisión y plazos (admision.py)
+Un X-Deadline-Ms no finito se rechaza con 400, un plazo vencido con 503 y
+una cola llena con 429; los dos últimos llevan Retry-After.
+"""
+
+import time
+
+import pytest
+
+from admision import ControlAdmision, Plazo, Rechazo, plazo_cabecera
+
+
+@pytest.mark.parametrize('valor', ['nan', 'NaN', 'inf', '-inf', b'nan', b'Infinity', 'diez', '', b'\xff'])
+def test_cabecera_no_finita_es_400(valor):
+    with pytest.raises(Rechazo) as rechazo:
+        plazo_cabecera(valor)
+    assert rechazo.value.estado == 400
+    assert rechazo.value.cabeceras() == {}
+
+
+def test_cabecera_valida():
+    assert plazo_cabecera(None).limite is None
+    assert plazo_cabecera('250').segundos == 0.25
+    assert plazo_cabecera(b'1500').segundos == 1.5
+    # Un plazo negativo equivale a uno ya vencido
+    assert plazo_cabecera('-20').segundos == 0
+    assert plazo_cabecera('-20').vencido()
+
+
+def test_plazo_restante():
+    assert Plazo().restante(30) == 30
+    assert not Plazo().vencido(10)
+    plazo = Plazo(60)
+    assert plazo.restante(5) == 5
+    assert 59 < plazo.restante(120) <= 60
+    assert Plazo(0).restante(30) == 0
+
+
+def test_plazo_vencido_es_503_con_retry_after():
+    control = ControlAdmision(maximo=4, reintentar=2.5, plazo_minimo=0.005)
+    for plazo in (Plazo(0), Plazo(0.001), plazo_cabecera('-1')):
+        with pytest.raises(Rechazo) as rechazo:
+            control.admitir(plazo)
+        assert rechazo.value.estado == 503
+        assert rechazo.value.cabeceras() == {'Retry-After': '3'}
+    vencido = Plazo(0.01)
+    time.sleep(0.02)
+    with pytest.raises(Rechazo):
+        control.admitir(vencido)
+    assert control.en_curso == 0
+    assert control.estado()['rechazadas'] == {'cola_llena': 0, 'plazo_vencido': 4}
+
+
+def test_cola_llena_es_429_con_retry_after():
+    control = ControlAdmision(maximo=2, reintentar=0.2)
+    control.admitir(Plazo())
+    with control.entrar(Plazo(30)):
+        with pytest.raises(Rechazo) as rechazo:
+            control.admitir(Plazo())
+    assert rechazo.value.estado == 429
+    # Retry-After nunca es menor que un segundo
+    assert rechazo.value.cabeceras() == {'Retry-After': '1'}
+    # Al salir del bloque se libera el lugar
+    control.admitir(Plazo())
+    assert control.en_curso == 2
+    assert control.estado()['admitidas'] == 3
+    assert control.estado()['rechazadas']['cola_llena'] == 1
+
+
+def test_entrar_libera_con_excepcion():
+    control = ControlAdmision(maximo=1)
+    with pytest.raises(RuntimeError):
+        with control.entrar(Plazo()):
+            raise RuntimeError('fallo')
+    assert control.en_curso == 0
+
+
+def test_sin_limite():
+    control = ControlAdmision(maximo=0)
+    for _ in range(100):
+        control.admitir(Plazo())
+    assert control.en_curso == 100
@@ -0,0 +1,63 @@
+"""
+Lectura del cuerpo en servidor_async.py
+Las líneas NDJSON de un lote salen a medida que llegan los mensajes
+http.request, y un cuerpo que supera su límite es un Rechazo 413.
+"""
+
+import asyncio
+
+import pytest
+
+from admision import Rechazo
+from lotes import leer_ndjson_async, en_bloques_async
+import servidor_async
+
+
+def _receive(trozos):
+    mensajes = [{'type': 'http.request', 'body': trozo, 'more_body': i < len(trozos) - 1}
+                for i, trozo in enumerate(trozos)]
+
+    async def receive():
+        return mensajes.pop(0)
+    return receive
+
+
+async def _todas(iterable):
+    return [elemento async for elemento in iterable]
+
+
+def test_lineas_cortadas_entre_mensajes():
+    receive = _receive([b'{"a": 1}\n{"b"', b': 2}\n\n{"c": 3}'])
+    lineas = asyncio.run(_todas(servidor_async._lineas_cuerpo(receive, 1000)))
+    assert lineas == [b'{"a": 1}', b'{"b": 2}', b'', b'{"c": 3}']
+
+
+def test_lineas_se_entregan_antes_del_final():
+    recibidos = []
+
+    async def receive():
+        recibidos.append(1)
+        return {'type': 'http.request', 'body': b'{"a": 1}\n', 'more_body': True}
+
+    async def primera():
+        return await servidor_async._lineas_cuerpo(receive, 1000).__anext__()
+    assert asyncio.run(primera()) == b'{"a": 1}'
+    assert len(recibidos) == 1
+
+
+def test_cuerpo_excedido():
+    with pytest.raises(Rechazo) as rechazo:
+        asyncio.run(servidor_async._leer_cuerpo(_receive([b'x' * 600, b'x' * 600]), 1000))
+    assert rechazo.value.estado == 413
+    with pytest.raises(Rechazo) as rechazo:
+        asyncio.run(_todas(servidor_async._lineas_cuerpo(_receive([b'{}\n' * 400, b'{}\n' * 400]), 2000)))
+    assert rechazo.value.estado == 413
+
+
+def test_bloques_ndjson_incrementales():
+    receive = _receive([b'{"ingreso": 1}\n' * 3, b'no es json\n' + b'{"ingreso": 2}\n' * 2])
+    perfiles = leer_ndjson_async(servidor_async._lineas_cuerpo(receive, 10000))
+    bloques = asyncio.run(_todas(en_bloques_async(perfiles, 4)))
+    assert [len(bloque) for bloque in bloques] == [4, 2]
+    assert [indice for bloque in bloques for indice, _, _ in bloque] == list(range(6))
+    assert bloques[0][3][2].startswith('JSON inválido')
@@ -0,0 +1,178 @@
+"""
+Equivalencia entre los evaluadores de reglas y Prolog
+reglas.py (escalar) y motor_vectorizado.py deben aceptar y rechazar los
+mismos perfiles que recomendaciones_ids/2 y disparar las mismas reglas,
+incluidos los campos opcionales omitidos y las metas que no son objetos.
+La comparación con SWI-Prolog se omite si no hay swipl instalado.
+"""
+
+import pytest
+
+from arranque import Artefacto, swipl_detectado
+from cache_recomendaciones import CacheRecomendaciones
+from perfiles import EJEMPLO_PERFIL, perfiles_muestra
+from recarga import VersionBase
+from reglas import cargar_reglas, evaluar_reglas, PROLOG_FILE
+
+np = pytest.importorskip('numpy')
+from motor_vectorizado import MotorVectorizado  # noqa: E402
+
+REGLAS = cargar_reglas()
+
+
+def _perfil(**cambios):
+    perfil = dict(EJEMPLO_PERFIL)
+    for campo, valor in cambios.items():
+        if valor is OMITIDO:
+            del perfil[campo]
+        else:
+            perfil[campo] = valor
+    return perfil
+
+
+OMITIDO = object()
+
+# (perfil, lo acepta Prolog)
+CASOS = {
+    'sin_dependientes_sin_seguro_vida': (_perfil(dependientes=False, tiene_seguro_vida=OMITIDO), True),
+    'sin_auto_sin_seguro_auto': (_perfil(posee_auto=False, tiene_seguro_auto=OMITIDO), True),
+    'dependientes_sin_seguro_vida': (_perfil(dependientes=True, tiene_seguro_vida=OMITIDO), False),
+    'auto_sin_seguro_auto': (_perfil(posee_auto=True, tiene_seguro_auto=OMITIDO), False),
+    'registra_gastos_nulo': (_perfil(registra_gastos=None), False),
+    'registra_gastos_texto': (_perfil(registra_gastos='false'), True),
+    'metas_no_objeto': (_perfil(metas=[5]), True),
+    'metas_mixtas': (_perfil(metas=['casa', {'tipo': 'auto', 'meses': 24}, None]), True),
+    'meta_sin_meses': (_perfil(metas=[{'tipo': 'auto'}]), False),
+    'meta_meses_texto': (_perfil(metas=[{'tipo': 'auto', 'meses': 'doce'}]), False),
+    'metas_no_lista': (_perfil(metas=7), True),
+    'sin_metas': (_perfil(metas=OMITIDO), False),
+    'ingreso_cero_ahorro_texto': (_perfil(ingreso=0, ahorro_mensual='nada'), True),
+    'ingreso_texto': (_perfil(ingreso='15000'), False),
+    'sin_testamento_campo': (_perfil(tiene_testamento=OMITIDO), False),
+}
+
+
+def _vectorizado(perfiles):
+    return MotorVectorizado(REGLAS).evaluar_ids(perfiles)
+
+
+def _escalar(perfil):
+    try:
+        return evaluar_reglas(REGLAS, perfil), None
+    except (ValueError, TypeError) as e:
+        return None, str(e)
+
+
+def _normalizar(resultado):
+    ids, error = resultado
+    return sorted(ids) if error is None else 'error'
+
+
+@pytest.mark.parametrize('nombre', sorted(CASOS))
+def test_casos_limite(nombre):
+    perfil, aceptado = CASOS[nombre]
+    escalar = _escalar(perfil)
+    vectorizado = _vectorizado([perfil])[0]
+    assert (escalar[1] is None) == aceptado, escalar
+    assert _normalizar(escalar) == _normalizar(vectorizado)
+
+
+def test_perfiles_omitidos_no_disparan_la_regla():
+    perfil, _ = CASOS['sin_dependientes_sin_seguro_vida']
+    ids, _ = _escalar(perfil)
+    assert 'dependientes_sin_seguro_vida' not in ids
+    ids, _ = _escalar(CASOS['metas_no_objeto'][0])
+    assert 'sin_metas' not in ids and 'meta_largo_plazo' not in ids
+
+
+def test_muestra_escalar_igual_a_vectorizado():
+    perfiles = perfiles_muestra(500, semilla=7)
+    vectorizados = _vectorizado(perfiles)
+    for perfil, vectorizado in zip(perfiles, vectorizados):
+        assert _normalizar(_escalar(perfil)) == _normalizar(vectorizado), perfil
+
+
+def test_prueba_del_selector_cubre_los_casos_limite():
+    # La conformidad de SelectorMotor debe ver los perfiles donde los motores pueden divergir
+    from motores import SelectorMotor
+    perfiles = SelectorMotor(muestras=40).perfiles_prueba()
+    assert any('tiene_seguro_vida' not in perfil or 'tiene_seguro_auto' not in perfil for perfil in perfiles)
+    assert any(not isinstance(meta, dict) for perfil in perfiles for meta in perfil['metas'])
+
+
+def test_vectorizado_rechaza_solo_el_perfil_fuera_de_float():
+    perfiles = [_perfil(ingreso=10 ** 400), _perfil(), _perfil(vivienda=-10 ** 400),
+                _perfil(metas=[{'tipo': 'casa', 'meses': 10 ** 400}])]
+    vectorizados = _vectorizado(perfiles)
+    assert [error is None for _, error in vectorizados] == [False, True, False, False]
+    for perfil, vectorizado in zip(perfiles, vectorizados):
+        assert _normalizar(_escalar(perfil)) == _normalizar(vectorizado), perfil
+
+
+def test_cache_acepta_campos_opcionales_omitidos():
+    cache = CacheRecomendaciones(capacidad=16)
+    version = VersionBase(Artefacto(PROLOG_FILE, 'fuente', '0' * 64, None, PROLOG_FILE), REGLAS)
+    clave = lambda perfil: cache.clave(perfil, version)
+    for nombre in ('sin_dependientes_sin_seguro_vida', 'sin_auto_sin_seguro_auto', 'metas_no_objeto'):
+        assert clave(CASOS[nombre][0]) is not None, nombre
+    # Sin dependientes tiene_seguro_vida no se lee: omitirlo comparte la entrada
+    omitido = clave(CASOS['sin_dependientes_sin_seguro_vida'][0])
+    assert omitido == clave(_perfil(dependientes=False, tiene_seguro_vida=True))
+    assert omitido != clave(_perfil(dependientes=True, tiene_seguro_vida=True))
+    assert clave(CASOS['registra_gastos_nulo'][0]) is None
+    # Un perfil que Prolog rechaza va al motor y cuenta como omitido
+    perfil = CASOS['registra_gastos_nulo'][0]
+    assert cache.obtener(perfil, lambda p: ['motor'], version=version) == ['motor']
+    assert cache.estadisticas()['omitidos'] == 1
+
+
+def test_cache_omite_valores_fuera_de_float():
+    cache = CacheRecomendaciones(capacidad=16)
+    version = VersionBase(Artefacto(PROLOG_FILE, 'fuente', '0' * 64, None, PROLOG_FILE), REGLAS)
+    for perfil in (_perfil(vivienda=10 ** 400), _perfil(ingreso=10 ** 400), _perfil(metas=[{'tipo': 'casa', 'meses': 10 ** 400}])):
+        assert _escalar(perfil)[0] is None, perfil
+        assert cache.clave(perfil, version) is None
+        assert cache.obtener(perfil, lambda p: ['motor'], version=version) == ['motor']
+    assert cache.estadisticas()['omitidos'] == 3
+
+
+@pytest.mark.skipif(swipl_detectado() is None, reason='SWI-Prolog no está instalado')
+def test_igual_a_prolog():
+    from pool_swipl import TrabajadorSwipl
+    perfiles = [perfil for perfil, _ in CASOS.values()] + perfiles_muestra(300, semilla=3)
+    trabajador = TrabajadorSwipl(swipl_detectado(), PROLOG_FILE)
+    try:
+        prolog = trabajador.consultar_lote(perfiles, 60)
+    finally:
+        trabajador.detener()
+    vectorizados = _vectorizado(perfiles)
+    for perfil, esperado, vectorizado in zip(perfiles, prolog, vectorizados):
+        assert _normalizar(_escalar(perfil)) == _normalizar(esperado), perfil
+        assert _normalizar(vectorizado) == _normalizar(esperado), perfil
+
+
+@pytest.mark.parametrize('valor', ['halt', None, 1, 0, 'si', [], {}])
+def test_booleanos_solo_true_o_false(valor):
+    from perfiles import validar_perfil
+    assert validar_perfil(_perfil(registra_gastos=valor)) is not None
+    assert validar_perfil(_perfil(dependientes=False, tiene_seguro_vida=valor)) is not None
+
+
+def test_booleanos_validos():
+    from perfiles import validar_perfil
+    for valor in (True, False, 'true', 'false'):
+        assert validar_perfil(_perfil(registra_gastos=valor, tiene_testamento=valor)) is None
+    assert validar_perfil(_perfil(dependientes=False, tiene_seguro_vida=OMITIDO)) is None
+
+
+@pytest.mark.skipif(swipl_detectado() is None, reason='SWI-Prolog no está instalado')
+def test_prolog_no_ejecuta_booleanos():
+    from pool_swipl import TrabajadorSwipl
+    trabajador = TrabajadorSwipl(swipl_detectado(), PROLOG_FILE)
+    try:
+        # "halt" en un campo booleano es un error del perfil, no termina el trabajador
+        resultados = trabajador.consultar_lote([_perfil(registra_gastos='halt'), _perfil()], 60)
+    finally:
+        trabajador.detener()
+    assert resultados[0][0] is None and 'type_error' in resultados[0][1]
+    assert resultados[1][1] is None
@@ -0,0 +1,51 @@
+"""
+Elección de motor (motores.SelectorMotor)
+Sin ningún motor Prolog, la conformidad se verifica contra reglas.py: un
+motor que difiere se descarta aunque sea el más rápido.
+"""
+
+import pytest
+
+from arranque import Artefacto
+from motores import Motor, SelectorMotor
+from recarga import VersionBase
+from reglas import cargar_reglas, PROLOG_FILE
+
+pytest.importorskip('numpy')
+from motores import MotorNativo  # noqa: E402
+
+REGLAS = cargar_reglas()
+
+
+class MotorSinReglas(Motor):
+    """Responde al instante sin disparar ninguna regla"""
+
+    nombre = 'sin_reglas'
+    prolog = False
+
+    def __init__(self, version):
+        pass
+
+    def consultar(self, perfil, timeout=None):
+        return []
+
+
+def _version():
+    return VersionBase(Artefacto(PROLOG_FILE, 'fuente', '0' * 64, None, PROLOG_FILE), REGLAS)
+
+
+def test_sin_prolog_compara_con_reglas_py():
+    selector = SelectorMotor(muestras=30, rondas=1,
+                             motores={'sin_reglas': MotorSinReglas, 'vectorizado': MotorNativo})
+    motor = selector.elegir(_version())
+    assert isinstance(motor, MotorNativo)
+    estado = selector.estado()
+    assert estado['referencia'] == 'reglas.py'
+    assert estado['candidatos']['vectorizado']['conforme'] is True
+    assert estado['candidatos']['sin_reglas']['conforme'] is False
+
+
+def test_sin_motor_conforme_no_elige():
+    selector = SelectorMotor(muestras=10, rondas=1, motores={'sin_reglas': MotorSinReglas})
+    assert selector.elegir(_version()) is None
+    assert selector.estado()['nombre'] is None
@@ -0,0 +1,134 @@
+"""
+Proyecciones (proyecciones.py)
+Las fórmulas cerradas de amortización deben coincidir con una simulación
+mes a mes; también los casos sin tasa, con un pago que no cubre el interés y
+las metas sin monto.
+"""
+
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+import proyecciones  # noqa: E402
+from proyecciones import meses_amortizacion, saldo_amortizado, proyectar_minimo, proyectar  # noqa: E402
+
+PERFIL = {
+    'gasto_total': 10000,
+    'ahorro_mensual': 1000,
+    'meses_fondo': 1,
+    'deudas_total': 1500,
+    'tasa_interes_apr': 36.0,
+    'saldo_deuda': 20000,
+    'metas': []
+}
+
+
+def _meses_pago_fijo(saldo, tasa, pago, maximo=10000):
+    meses = 0
+    while saldo > 1e-9:
+        saldo = saldo * (1 + tasa) - pago
+        meses += 1
+        if meses > maximo:
+            return None
+    return meses
+
+
+def _meses_pago_minimo(saldo, tasa, pct=proyecciones.PAGO_MINIMO_PCT, piso=proyecciones.PAGO_MINIMO_PISO):
+    meses = 0
+    while saldo > 1e-9:
+        interes = saldo * tasa
+        pago = min(max(interes + pct / 100 * saldo, piso), saldo + interes)
+        saldo = saldo + interes - pago
+        meses += 1
+    return meses
+
+
+CASOS_AMORTIZACION = [
+    (20000, 36.0, 1500),
+    (5000, 18.0, 250),
+    (120000, 12.5, 1300),
+    (999.99, 60.0, 100),
+    (300, 24.0, 300),
+]
+
+
+@pytest.mark.parametrize('saldo, apr, pago', CASOS_AMORTIZACION)
+def test_amortizacion_igual_a_mes_a_mes(saldo, apr, pago):
+    tasa = apr / 1200
+    cerrada = meses_amortizacion(np.array([saldo]), np.array([tasa]), np.array([pago]))[0]
+    assert math.ceil(cerrada - proyecciones.EPSILON) == _meses_pago_fijo(saldo, tasa, pago)
+
+
+@pytest.mark.parametrize('saldo, apr, pago', CASOS_AMORTIZACION)
+def test_saldo_amortizado_igual_a_mes_a_mes(saldo, apr, pago):
+    tasa = apr / 1200
+    restante = saldo
+    for mes in range(1, 13):
+        restante = max(restante * (1 + tasa) - pago, 0)
+        cerrado = saldo_amortizado(np.array([saldo]), np.array([tasa]), np.array([pago]), np.array([mes]))[0]
+        assert cerrado == pytest.approx(restante, abs=1e-6)
+
+
+@pytest.mark.parametrize('saldo, apr', [(20000, 36.0), (5000, 18.0), (150, 24.0), (80000, 0.0)])
+def test_pago_minimo_igual_a_mes_a_mes(saldo, apr):
+    tasa = apr / 1200
+    meses, _, _ = proyectar_minimo(np.array([float(saldo)]), np.array([tasa]))
+    assert math.ceil(meses[0] - proyecciones.EPSILON) == _meses_pago_minimo(saldo, tasa)
+
+
+def test_tasa_cero():
+    meses = meses_amortizacion(np.array([1000.0]), np.array([0.0]), np.array([300.0]))
+    assert meses[0] == pytest.approx(1000 / 300)
+    (proyeccion, error), = proyectar([dict(PERFIL, tasa_interes_apr=0, saldo_deuda=3000, deudas_total=1000)])
+    assert error is None
+    assert proyeccion['deuda']['pago_actual'] == {'pago': 1000, 'meses': 3, 'intereses': 0}
+
+
+def test_pago_que_no_cubre_el_interes():
+    # 36 % anual sobre 100 000 son 3 000 al mes: con 1 500 la deuda nunca baja
+    (proyeccion, error), = proyectar([dict(PERFIL, saldo_deuda=100000, deudas_total=1500)])
+    assert error is None
+    deuda = proyeccion['deuda']
+    assert deuda['pago_actual']['meses'] is None
+    assert deuda['pago_actual']['intereses'] is None
+    assert deuda['meses_ahorrados'] is None
+    assert deuda['pago_minimo']['meses'] is not None
+
+
+def test_sin_saldo_no_hay_deuda():
+    perfil = dict(PERFIL)
+    del perfil['saldo_deuda']
+    (proyeccion, _), = proyectar([perfil], meses=6)
+    assert proyeccion['deuda'] is None
+    assert set(proyeccion['serie']) == {'fondo'}
+
+
+def test_metas_sin_monto():
+    metas = [{'tipo': 'casa', 'meses': 24}, {'tipo': 'fondo_emergencia', 'meses': 12}]
+    (proyeccion, error), = proyectar([dict(PERFIL, metas=metas)])
+    assert error is None
+    casa, fondo = proyeccion['metas']
+    # Sin monto no hay progreso que medir
+    assert casa['monto'] is None and casa['progreso'] is None and casa['alcanzable'] is None
+    assert casa['aporte_mensual'] == 500 and casa['ahorro_al_plazo'] == 12000
+    # El fondo de emergencia sin monto apunta a 6 meses de gasto
+    assert fondo['monto'] == 6 * PERFIL['gasto_total'] - PERFIL['meses_fondo'] * PERFIL['gasto_total']
+    assert fondo['plazo'] == 'mediano'
+
+
+def test_fondo_de_emergencia():
+    (proyeccion, _), = proyectar([PERFIL])
+    objetivos = {o['meses_gasto']: o for o in proyeccion['fondo_emergencia']['objetivos']}
+    assert objetivos[3] == {'meses_gasto': 3, 'faltante': 20000, 'meses': 20}
+    assert objetivos[6] == {'meses_gasto': 6, 'faltante': 50000, 'meses': 50}
+
+
+def test_errores_por_perfil():
+    resultados = proyectar([PERFIL, 'no', dict(PERFIL, ahorro_mensual='mucho'), dict(PERFIL, saldo_deuda=-1)])
+    assert [error is None for _, error in resultados] == [True, False, False, False]
+    estado, cuerpo = proyecciones.responder(dict(PERFIL, ahorro_mensual=None))
+    assert estado == 400
+    assert proyecciones.responder(PERFIL, 'x')[0] == 400
+    estado, cuerpo = proyecciones.responder({'perfiles': [PERFIL, 'no']})
+    assert estado == 200 and 'error' in cuerpo['proyecciones'][1]
@@ -0,0 +1,139 @@
+"""
+Puntuación masiva (puntuar.py)
+Conversión de las celdas de CSV a los tipos del perfil y reanudación de una
+ejecución interrumpida: las partes ya escritas se saltan, salvo con
+--reiniciar o si la entrada cambió.
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import pytest
+
+from perfiles import EJEMPLO_PERFIL
+from puntuar import convertir_valor, fila_a_perfil, preparar_salida, MANIFIESTO
+
+
+def _fila(**cambios):
+    fila = {campo: json.dumps(valor) if isinstance(valor, list) else str(valor)
+            for campo, valor in EJEMPLO_PERFIL.items()}
+    fila.update(cambios)
+    return fila
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('true', True), ('TRUE', True), (' Sí ', True), ('si', True), ('1', True), ('y', True),
+    ('false', False), ('No', False), ('0', False), (' f ', False),
+])
+def test_booleanos(texto, esperado):
+    assert convertir_valor('booleano', texto) is esperado
+
+
+@pytest.mark.parametrize('texto', ['', 'quizá', '2', 'verdadero', 'none'])
+def test_booleano_invalido(texto):
+    with pytest.raises(ValueError):
+        convertir_valor('booleano', texto)
+
+
+def test_numeros():
+    assert convertir_valor('numero', '15000') == 15000
+    assert type(convertir_valor('numero', '15000')) is int
+    # Con punto decimal sigue siendo float, como en el JSON original
+    assert type(convertir_valor('numero', '15000.0')) is float
+    assert convertir_valor('numero', ' 0.5 ') == 0.5
+    assert convertir_valor('numero', '-3') == -3
+    assert convertir_valor('numero', '1e3') == 1000
+    with pytest.raises(ValueError):
+        convertir_valor('numero', 'mil')
+    with pytest.raises(ValueError):
+        convertir_valor('numero', '1,000')
+
+
+def test_valores_de_parquet_no_se_convierten():
+    # Parquet ya trae tipos: solo se convierten las celdas de texto
+    assert convertir_valor('booleano', True) is True
+    assert convertir_valor('numero', 3) == 3
+    assert convertir_valor('json', [{'tipo': 'auto', 'meses': 24}]) == [{'tipo': 'auto', 'meses': 24}]
+    assert convertir_valor('texto', ' basic ') == 'basic'
+
+
+def test_fila_a_perfil():
+    perfil, error = fila_a_perfil(_fila(metas='[{"tipo": "auto", "meses": 24}]'))
+    assert error is None
+    assert perfil == dict(EJEMPLO_PERFIL, metas=[{'tipo': 'auto', 'meses': 24}])
+
+
+def test_fila_celdas_vacias_se_omiten():
+    perfil, error = fila_a_perfil(_fila(dependientes='False', tiene_seguro_vida='', nivel_conocimiento=''))
+    assert error is None
+    assert 'tiene_seguro_vida' not in perfil and 'nivel_conocimiento' not in perfil
+    # Un campo requerido vacío lo rechaza validar_perfil
+    perfil, error = fila_a_perfil(_fila(ingreso=''))
+    assert error and 'ingreso' in error
+
+
+def test_fila_con_celda_invalida():
+    assert fila_a_perfil(_fila(registra_gastos='tal vez')) == (None, "Campo registra_gastos: booleano inválido: 'tal vez'")
+    perfil, error = fila_a_perfil(_fila(ingreso='mucho'))
+    assert perfil is None and error.startswith('Campo ingreso:')
+    perfil, error = fila_a_perfil(_fila(metas='[{'))
+    assert perfil is None and error.startswith('Campo metas:')
+
+
+def test_preparar_salida_reanuda(tmp_path):
+    salida = str(tmp_path / 'salida')
+    huella = {'entrada': 'clientes.csv', 'bloque': 10}
+    preparar_salida(salida, huella, False)
+    with open(os.path.join(salida, MANIFIESTO), encoding='utf-8') as f:
+        assert json.load(f) == huella
+    parte = os.path.join(salida, 'parte-000000.csv')
+    open(parte, 'w').close()
+    # Misma entrada y configuración: las partes se conservan
+    preparar_salida(salida, dict(huella), False)
+    assert os.path.exists(parte)
+    # Otra entrada sin --reiniciar es un error y no borra nada
+    with pytest.raises(RuntimeError):
+        preparar_salida(salida, dict(huella, bloque=20), False)
+    assert os.path.exists(parte)
+    # --reiniciar descarta las partes y guarda la huella nueva
+    preparar_salida(salida, dict(huella, bloque=20), True)
+    assert not os.path.exists(parte)
+    with open(os.path.join(salida, MANIFIESTO), encoding='utf-8') as f:
+        assert json.load(f)['bloque'] == 20
+
+
+def _leer_partes(salida):
+    filas = []
+    for nombre in sorted(os.listdir(salida)):
+        if nombre.startswith('parte-'):
+            with open(os.path.join(salida, nombre), newline='', encoding='utf-8') as f:
+                filas.extend(csv.DictReader(f))
+    return filas
+
+
+def test_reanudar_salta_partes_escritas(tmp_path):
+    pytest.importorskip('numpy')
+    from puntuar import puntuar
+    entrada = tmp_path / 'clientes.csv'
+    filas = [_fila(cliente=str(i), ingreso=str(10000 + i)) for i in range(25)]
+    filas[7]['registra_gastos'] = 'tal vez'
+    with open(entrada, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(filas[0]))
+        escritor.writeheader()
+        escritor.writerows(filas)
+    salida = tmp_path / 'salida'
+    args = argparse.Namespace(entrada=str(entrada), salida=str(salida), motor='vectorizado', procesos=1,
+                              bloque=10, formato='csv', id_columna='cliente', intervalo=60, reiniciar=False)
+
+    resumen = puntuar(args)
+    assert (resumen['filas'], resumen['saltadas'], resumen['errores'], resumen['bloques']) == (25, 0, 1, 3)
+    completas = _leer_partes(salida)
+    assert [fila['id'] for fila in completas] == [str(i) for i in range(25)]
+    assert completas[7]['error'] and not completas[7]['reglas']
+
+    os.remove(salida / 'parte-000001.csv')
+    resumen = puntuar(args)
+    assert (resumen['filas'], resumen['saltadas'], resumen['bloques']) == (10, 15, 1)
+    assert _leer_partes(salida) == completas
@@ -0,0 +1,120 @@
+"""
+Compresión y validación condicional (respuestas_http.py)
+Elección entre br, gzip y sin comprimir según Accept-Encoding y el tamaño,
+y 304 cuando If-None-Match coincide con el ETag débil.
+"""
+
+import gzip
+
+import pytest
+
+import respuestas_http
+from respuestas_http import elegir_codificacion, comprimir, etag_debil, coincide_etag
+
+GRANDE = 10 * respuestas_http.COMPRESION_MINIMO
+
+
+@pytest.fixture
+def con_brotli(monkeypatch):
+    # La elección no llama a brotli: basta con declararlo disponible
+    monkeypatch.setattr(respuestas_http, 'BROTLI_AVAILABLE', True)
+
+
+@pytest.fixture
+def sin_brotli(monkeypatch):
+    monkeypatch.setattr(respuestas_http, 'BROTLI_AVAILABLE', False)
+
+
+@pytest.mark.parametrize('cabecera, esperada', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip', 'gzip'),
+    ('GZIP', 'gzip'),
+    ('*', 'br'),
+    ('*, br;q=0', 'gzip'),
+    ('*;q=0', None),
+    ('identity', None),
+    ('deflate', None),
+    ('gzip;q=0', None),
+    ('gzip;q=abc', None),
+    ('', None),
+    (None, None),
+])
+def test_elegir_con_brotli(con_brotli, cabecera, esperada):
+    assert elegir_codificacion(cabecera, GRANDE) == esperada
+
+
+@pytest.mark.parametrize('cabecera, esperada', [
+    ('gzip, deflate, br', 'gzip'),
+    ('br', None),
+    ('*', 'gzip'),
+    ('identity', None),
+])
+def test_elegir_sin_brotli(sin_brotli, cabecera, esperada):
+    assert elegir_codificacion(cabecera, GRANDE) == esperada
+
+
+def test_cuerpos_pequenos_sin_comprimir(con_brotli, monkeypatch):
+    minimo = respuestas_http.COMPRESION_MINIMO
+    assert elegir_codificacion('gzip, br', minimo - 1) is None
+    assert elegir_codificacion('gzip, br', minimo) == 'br'
+    monkeypatch.setattr(respuestas_http, 'COMPRESION', False)
+    assert elegir_codificacion('gzip, br', GRANDE) is None
+
+
+def test_comprimir_gzip():
+    cuerpo = b'{"recomendaciones": []}' * 100
+    assert gzip.decompress(comprimir(cuerpo, 'gzip')) == cuerpo
+
+
+def test_comprimir_brotli():
+    brotli = pytest.importorskip('brotli')
+    cuerpo = b'{"recomendaciones": []}' * 100
+    assert brotli.decompress(comprimir(cuerpo, 'br')) == cuerpo
+
+
+def test_etag_debil():
+    etag = etag_debil('reglas', 'abc123')
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == etag_debil('reglas', 'abc123')
+    assert etag != etag_debil('reglas', 'abc124')
+    assert etag != etag_debil('ejemplo', 'abc123')
+
+
+def test_coincide_etag():
+    etag = etag_debil('reglas', 'abc123')
+    fuerte = etag[2:]
+    assert coincide_etag(etag, etag)
+    # Comparación débil: el prefijo W/ no importa de ningún lado
+    assert coincide_etag(fuerte, etag)
+    assert coincide_etag(etag, fuerte)
+    assert coincide_etag(f'"otro", {etag}', etag)
+    assert coincide_etag('*', etag)
+    assert not coincide_etag('W/"otro"', etag)
+    assert not coincide_etag('', etag)
+    assert not coincide_etag(None, etag)
+
+
+def test_flask_304_y_compresion():
+    pytest.importorskip('flask')
+    import servidor
+    cliente = servidor.app.test_client()
+    for ruta in ('/api/reglas', '/api/ejemplo'):
+        respuesta = cliente.get(ruta)
+        assert respuesta.status_code == 200
+        etag = respuesta.headers['ETag']
+        assert 'Content-Encoding' not in respuesta.headers
+        assert 'Accept-Encoding' in respuesta.headers['Vary']
+        no_modificada = cliente.get(ruta, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        assert no_modificada.status_code == 304
+        assert no_modificada.data == b''
+        assert no_modificada.headers['ETag'] == etag
+        assert 'Content-Encoding' not in no_modificada.headers
+        assert cliente.get(ruta, headers={'If-None-Match': 'W/"otro"'}).status_code == 200
+
+    completa = cliente.get('/api/reglas').data
+    respuesta = cliente.get('/api/reglas', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers.get('Content-Encoding') == elegir_codificacion('gzip', len(completa))
+    if respuesta.headers.get('Content-Encoding') == 'gzip':
+        assert gzip.decompress(respuesta.data) == completa
@@ -0,0 +1,54 @@
+"""
+El análisis de sensibilidad acepta los mismos perfiles que Prolog
+(ver test_equivalencia.py) y marca como disparadas las mismas reglas.
+"""
+
+import pytest
+
+from perfiles import EJEMPLO_PERFIL, perfiles_muestra
+from reglas import cargar_reglas, evaluar_reglas
+from sensibilidad import analizar
+
+REGLAS = cargar_reglas()
+
+
+def _sin(perfil, campo):
+    return {k: v for k, v in perfil.items() if k != campo}
+
+
+ACEPTADOS = [
+    _sin(dict(EJEMPLO_PERFIL, dependientes=False), 'tiene_seguro_vida'),
+    _sin(dict(EJEMPLO_PERFIL, posee_auto=False), 'tiene_seguro_auto'),
+    dict(EJEMPLO_PERFIL, metas=[5, {'tipo': 'casa', 'meses': 6}]),
+    dict(EJEMPLO_PERFIL, metas=7),
+    dict(EJEMPLO_PERFIL, ingreso=0, ahorro_mensual='nada'),
+]
+
+RECHAZADOS = [
+    _sin(dict(EJEMPLO_PERFIL, dependientes=True), 'tiene_seguro_vida'),
+    dict(EJEMPLO_PERFIL, registra_gastos=None),
+    dict(EJEMPLO_PERFIL, metas=[{'tipo': 'casa'}]),
+]
+
+
+def _disparadas(analisis):
+    return sorted({regla['id'] for regla in analisis if regla['dispara']})
+
+
+@pytest.mark.parametrize('perfil', ACEPTADOS + perfiles_muestra(200, semilla=5))
+def test_acepta_lo_que_acepta_prolog(perfil):
+    assert _disparadas(analizar(REGLAS, perfil)) == evaluar_reglas(REGLAS, perfil)
+
+
+@pytest.mark.parametrize('perfil', RECHAZADOS)
+def test_rechaza_lo_que_rechaza_prolog(perfil):
+    with pytest.raises(ValueError):
+        analizar(REGLAS, perfil)
+
+
+def test_condicion_no_alcanzada_sin_limites():
+    analisis = {regla['id']: regla for regla in analizar(REGLAS, ACEPTADOS[0])}
+    regla = analisis['dependientes_sin_seguro_vida']
+    assert not regla['dispara'] and regla['cambios'] == []
+    vida = regla['condiciones'][1]
+    assert vida['cumple'] is None and vida['limites'] == []
@@ -0,0 +1,136 @@
+"""
+Sesiones de reevaluación incremental (sesiones.py)
+Reevaluar solo las reglas que dependen de los campos cambiados debe dar las
+mismas reglas disparadas que una evaluación completa, y la respuesta debe
+llevar exactamente las agregadas y las eliminadas.
+"""
+
+import random
+
+import pytest
+
+from arranque import Artefacto
+from perfiles import EJEMPLO_PERFIL, perfiles_muestra
+from recarga import VersionBase
+from reglas import cargar_reglas, evaluar_reglas, PROLOG_FILE
+from sesiones import AlmacenSesiones, ErrorSesion
+
+REGLAS = cargar_reglas()
+
+
+def _version(sha='0' * 64):
+    return VersionBase(Artefacto(PROLOG_FILE, 'fuente', sha, None, PROLOG_FILE), REGLAS)
+
+
+def _completa(perfil):
+    try:
+        return set(evaluar_reglas(REGLAS, perfil))
+    except (ValueError, TypeError):
+        return None
+
+
+def _iniciar(almacen, version, perfil):
+    sesion, perfil, _ = almacen.preparar(perfil)
+    return almacen.responder(sesion, perfil, version, _completa(perfil))
+
+
+def _cambiar(almacen, version, sesion_id, cambios):
+    sesion, perfil, cambiados = almacen.preparar({'sesion': sesion_id, 'cambios': cambios})
+    disparadas, evaluadas = almacen.incremental(sesion, cambiados, perfil, version)
+    return perfil, disparadas, almacen.responder(sesion, perfil, version, disparadas, evaluadas)
+
+
+def test_incremental_igual_a_completa():
+    version = _version()
+    almacen = AlmacenSesiones()
+    azar = random.Random(11)
+    muestra = [perfil for perfil in perfiles_muestra(200, semilla=5) if _completa(perfil) is not None]
+    respuesta = _iniciar(almacen, version, muestra[0])
+    comparados = 0
+    for otro in muestra[1:]:
+        campos = azar.sample(sorted(otro), azar.randint(1, 3))
+        cambios = {campo: otro[campo] for campo in campos}
+        sesion = almacen.obtener(respuesta['sesion'])
+        esperado = _completa(dict(sesion.perfil, **cambios))
+        if esperado is None:
+            continue
+        try:
+            perfil, disparadas, respuesta = _cambiar(almacen, version, respuesta['sesion'], cambios)
+        except ErrorSesion:
+            continue
+        assert disparadas == esperado, cambios
+        comparados += 1
+    assert comparados > 100
+
+
+def test_agregadas_y_eliminadas():
+    version = _version()
+    almacen = AlmacenSesiones()
+    perfil = dict(EJEMPLO_PERFIL, registra_gastos=True)
+    respuesta = _iniciar(almacen, version, perfil)
+    assert respuesta['completa'] and respuesta['eliminadas'] == []
+    antes = _completa(perfil)
+    assert {r['id'] for r in respuesta['agregadas']} == antes
+
+    _, disparadas, respuesta = _cambiar(almacen, version, respuesta['sesion'], {'registra_gastos': False})
+    assert not respuesta['completa']
+    assert 0 < respuesta['reglas_evaluadas'] < len(version.tabla.reglas)
+    assert {r['id'] for r in respuesta['agregadas']} == disparadas - antes
+    assert set(respuesta['eliminadas']) == antes - disparadas
+    assert respuesta['agregadas'] or respuesta['eliminadas']
+    assert respuesta['total'] == len(disparadas)
+
+    # Volver al valor anterior deshace la diferencia
+    _, _, vuelta = _cambiar(almacen, version, respuesta['sesion'], {'registra_gastos': True})
+    assert {r['id'] for r in vuelta['agregadas']} == set(respuesta['eliminadas'])
+    assert set(vuelta['eliminadas']) == {r['id'] for r in respuesta['agregadas']}
+
+
+def test_sin_cambios_reales_no_reevalua():
+    version = _version()
+    almacen = AlmacenSesiones()
+    respuesta = _iniciar(almacen, version, EJEMPLO_PERFIL)
+    _, _, respuesta = _cambiar(almacen, version, respuesta['sesion'], {'ingreso': EJEMPLO_PERFIL['ingreso']})
+    assert respuesta['reglas_evaluadas'] == 0
+    assert respuesta['agregadas'] == [] and respuesta['eliminadas'] == []
+
+
+def test_booleano_y_numero_son_distintos():
+    # 1 y true son iguales en Python pero no para Prolog: el cambio se reevalúa
+    almacen = AlmacenSesiones()
+    respuesta = _iniciar(almacen, _version(), EJEMPLO_PERFIL)
+    _, _, cambiados = almacen.preparar({'sesion': respuesta['sesion'], 'cambios': {'ingreso': float(EJEMPLO_PERFIL['ingreso'])}})
+    assert cambiados == {'ingreso'}
+
+
+def test_otra_version_evalua_completo():
+    almacen = AlmacenSesiones()
+    respuesta = _iniciar(almacen, _version(), EJEMPLO_PERFIL)
+    sesion, perfil, cambiados = almacen.preparar({'sesion': respuesta['sesion'], 'cambios': {'ingreso': 1}})
+    assert almacen.incremental(sesion, cambiados, perfil, _version('1' * 64)) is None
+
+
+def test_errores():
+    almacen = AlmacenSesiones()
+    with pytest.raises(ErrorSesion) as error:
+        almacen.preparar({'sesion': 'no-existe', 'cambios': {}})
+    assert error.value.estado == 404
+    respuesta = _iniciar(almacen, _version(), EJEMPLO_PERFIL)
+    with pytest.raises(ErrorSesion) as error:
+        almacen.preparar({'sesion': respuesta['sesion'], 'cambios': [1]})
+    assert error.value.estado == 400
+    with pytest.raises(ErrorSesion) as error:
+        almacen.preparar({'sesion': respuesta['sesion'], 'cambios': {'registra_gastos': 'halt'}})
+    assert error.value.estado == 400
+
+
+def test_caducidad_y_desalojo():
+    version = _version()
+    almacen = AlmacenSesiones(maximo=2)
+    ids = [_iniciar(almacen, version, EJEMPLO_PERFIL)['sesion'] for _ in range(3)]
+    assert almacen.obtener(ids[0]) is None
+    assert almacen.obtener(ids[2]) is not None
+    assert almacen.estado()['expiradas'] == 1
+    almacen = AlmacenSesiones(ttl=0)
+    sesion_id = _iniciar(almacen, version, EJEMPLO_PERFIL)['sesion']
+    assert almacen.obtener(sesion_id) is None
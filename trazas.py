@@ -0,0 +1,247 @@
+"""
+Trazas de peticiones individuales, bajo demanda
+Una petición se traza si trae la cabecera X-Traza (con valor 1, o con
+TRAZA_TOKEN si está definido) o si cae en el muestreo TRAZA_MUESTREO
+(fracción entre 0 y 1, 0 por defecto). La traza guarda:
+    etapas        línea de tiempo de cada metricas.etapa() de la petición
+    eventos       los eventos de la bitácora, sin muestreo
+    perfil_python las funciones con más tiempo acumulado (cProfile)
+    prolog        inferencias, CPU y predicados más llamados de cada
+                  consulta a Prolog (protocolo_json.pl con "perfilar")
+Las trazas terminadas quedan en un búfer circular en memoria (TRAZA_MAX) que
+se consulta con GET /api/admin/trazas; sin TRAZA_TOKEN ese endpoint solo
+responde a peticiones locales.
+
+cProfile perfila un hilo a la vez, así que si dos peticiones trazadas
+coinciden solo la primera lleva perfil de Python. En servidor_async el
+perfil incluye lo que el bucle de eventos atendió mientras tanto.
+"""
+
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections import deque
+
+TRAZA_MUESTREO = float(os.environ.get('TRAZA_MUESTREO', '0'))
+TRAZA_MAX = int(os.environ.get('TRAZA_MAX', '100'))
+TRAZA_TOKEN = os.environ.get('TRAZA_TOKEN', '')
+# Funciones del perfil de Python que se guardan por traza
+TRAZA_FUNCIONES = int(os.environ.get('TRAZA_FUNCIONES', '30'))
+
+CABECERA_TRAZA = 'X-Traza'
+CABECERA_TRAZA_ID = 'X-Traza-Id'
+CABECERA_TOKEN = 'X-Admin-Token'
+
+DIRECCIONES_LOCALES = ('127.0.0.1', '::1', 'localhost')
+
+_actual = contextvars.ContextVar('traza', default=None)
+_perfilador = threading.Lock()
+
+
+class Traza:
+    """Lo que se registra de una petición trazada"""
+
+    def __init__(self, endpoint, motivo):
+        self.id = secrets.token_hex(8)
+        self.endpoint = endpoint
+        self.motivo = motivo
+        self.inicio = time.time()
+        self.estado = None
+        self.duracion_ms = None
+        self.datos = {}
+        self.etapas = []
+        self.eventos = []
+        self.prolog = []
+        self.perfil_python = None
+        self._origen = time.perf_counter()
+        self._perfil = None
+
+    def etapa(self, nombre, inicio, duracion):
+        """Agrega una etapa; `inicio` es un instante de time.perf_counter()"""
+        self.etapas.append({
+            'etapa': nombre,
+            'desde_ms': round((inicio - self._origen) * 1000, 3),
+            'duracion_ms': round(duracion * 1000, 3)
+        })
+
+    def evento(self, nivel, nombre, campos):
+        self.eventos.append(dict(campos, nivel=nivel, evento=nombre,
+                                 en_ms=round((time.perf_counter() - self._origen) * 1000, 3)))
+
+    def anotar(self, **datos):
+        self.datos.update(datos)
+
+    def perfilar(self):
+        """Activa cProfile en el hilo actual si ninguna otra traza lo está usando"""
+        if not _perfilador.acquire(blocking=False):
+            self.perfil_python = 'omitido: otra petición trazada tenía el perfilador'
+            return
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError as e:
+            # Otro perfilador (un depurador, coverage) ya está activo
+            _perfilador.release()
+            self.perfil_python = f'omitido: {e}'
+            return
+        self._perfil = perfil
+
+    def terminar(self, estado=None):
+        if self._perfil is not None:
+            self._perfil.disable()
+            _perfilador.release()
+            salida = io.StringIO()
+            pstats.Stats(self._perfil, stream=salida).sort_stats('cumulative').print_stats(TRAZA_FUNCIONES)
+            self.perfil_python = salida.getvalue()
+            self._perfil = None
+        self.estado = estado
+        self.duracion_ms = round((time.perf_counter() - self._origen) * 1000, 3)
+
+    def resumen(self):
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'motivo': self.motivo,
+            'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.inicio)),
+            'estado': self.estado,
+            'duracion_ms': self.duracion_ms
+        }
+
+    def como_dict(self):
+        return dict(self.resumen(), datos=self.datos, etapas=self.etapas, eventos=self.eventos,
+                    prolog=self.prolog, perfil_python=self.perfil_python)
+
+
+class BufferTrazas:
+    """Últimas `capacidad` trazas terminadas"""
+
+    def __init__(self, capacidad=TRAZA_MAX):
+        self.capacidad = capacidad
+        self.registradas = 0
+        self._trazas = deque(maxlen=capacidad)
+        self._lock = threading.Lock()
+
+    def agregar(self, traza):
+        with self._lock:
+            self._trazas.append(traza)
+            self.registradas += 1
+
+    def obtener(self, traza_id):
+        with self._lock:
+            return next((t for t in self._trazas if t.id == traza_id), None)
+
+    def listar(self):
+        with self._lock:
+            return [t.resumen() for t in reversed(self._trazas)]
+
+    def volcar(self):
+        """Todas las trazas completas, de la más reciente a la más antigua"""
+        with self._lock:
+            return [t.como_dict() for t in reversed(self._trazas)]
+
+    def vaciar(self):
+        with self._lock:
+            self._trazas.clear()
+
+    def estado(self):
+        return {
+            'guardadas': len(self._trazas),
+            'capacidad': self.capacidad,
+            'registradas': self.registradas,
+            'muestreo': TRAZA_MUESTREO
+        }
+
+
+# Instancia compartida por el proceso
+buffer = BufferTrazas()
+
+
+def solicitada(cabecera):
+    """Motivo para trazar la petición según su cabecera X-Traza y el muestreo, o None"""
+    if cabecera and cabecera == (TRAZA_TOKEN or '1'):
+        return 'cabecera'
+    if TRAZA_MUESTREO > 0 and random.random() < TRAZA_MUESTREO:
+        return 'muestreo'
+    return None
+
+
+def iniciar(endpoint, cabecera):
+    """
+    Empieza a trazar la petición en curso si corresponde. Devuelve
+    (traza, token) para pasar a `terminar`, o (None, None).
+    """
+    motivo = solicitada(cabecera)
+    if motivo is None:
+        return None, None
+    traza = Traza(endpoint, motivo)
+    token = _actual.set(traza)
+    traza.perfilar()
+    return traza, token
+
+
+def terminar(traza, token, estado=None):
+    """Cierra la traza, la guarda en el búfer y deja de asociarla al contexto"""
+    if traza is None:
+        return
+    traza.terminar(estado)
+    buffer.agregar(traza)
+    try:
+        _actual.reset(token)
+    except (ValueError, RuntimeError):
+        # Se terminó desde otro contexto (por ejemplo otra tarea asyncio)
+        _actual.set(None)
+
+
+def actual():
+    """Traza de la petición en curso, o None"""
+    return _actual.get()
+
+
+def anotar(**datos):
+    traza = _actual.get()
+    if traza is not None:
+        traza.anotar(**datos)
+
+
+def con_perfilado(peticion):
+    """Pide a Prolog el perfil de la consulta si la petición en curso está trazada"""
+    if _actual.get() is None:
+        return peticion
+    return dict(peticion, perfilar=True)
+
+
+def registrar_prolog(respuesta):
+    """Pasa a la traza el perfil que devolvió Prolog (y lo quita de la respuesta)"""
+    perfil = respuesta.pop('perfil_prolog', None)
+    traza = _actual.get()
+    if perfil is not None and traza is not None:
+        traza.prolog.append(perfil)
+
+
+def autorizado(token, direccion):
+    """Acceso al endpoint de trazas: con TRAZA_TOKEN hace falta el token, sin él solo desde la máquina local"""
+    if TRAZA_TOKEN:
+        return secrets.compare_digest(token or '', TRAZA_TOKEN)
+    return direccion in DIRECCIONES_LOCALES
+
+
+def consultar(parametros):
+    """
+    Respuesta (estado, cuerpo) de GET /api/admin/trazas: con `id` la traza
+    completa, con `completo=1` todas completas, si no el índice
+    """
+    traza_id = parametros.get('id')
+    if traza_id:
+        traza = buffer.obtener(traza_id)
+        if traza is None:
+            return 404, {'error': f'Traza desconocida o ya descartada: {traza_id}'}
+        return 200, traza.como_dict()
+    if parametros.get('completo') == '1':
+        return 200, {'estado': buffer.estado(), 'trazas': buffer.volcar()}
+    return 200, {'estado': buffer.estado(), 'trazas': buffer.listar()}
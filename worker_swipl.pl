@@ -0,0 +1,61 @@
+/*  worker_swipl.pl
+    SWI-Prolog (7.x/8.x/9.x)
+    Bucle de consultas para los pools de trabajadores (pool_swipl.py y
+    pool_async.py). Carga la base de conocimiento una sola vez y atiende
+    peticiones JSON leídas de la entrada estándar, una por línea (ver
+    protocolo_json.pl). Cada respuesta es un objeto JSON en una sola línea.
+
+    Uso: swipl -q worker_swipl.pl -- asistente_finanzas.pl
+*/
+
+:- encoding(utf8).
+:- use_module(library(http/json)).
+:- use_module(protocolo_json).
+:- initialization(main, main).
+
+main :-
+    current_prolog_flag(argv, Argv),
+    last(Argv, Archivo),
+    use_module(Archivo),
+    set_stream(user_input, encoding(utf8)),
+    set_stream(user_output, encoding(utf8)),
+    bucle.
+
+%% Ciclo repeat/fail: cada petición libera su memoria al terminar.
+bucle :-
+    repeat,
+    leer_peticion(Peticion),
+    (   Peticion == end_of_file
+    ->  !
+    ;   responder(Peticion, Respuesta),
+        json_write_dict(user_output, Respuesta, [width(0)]),
+        nl(user_output),
+        flush_output(user_output),
+        fail
+    ).
+
+leer_peticion(Peticion) :-
+    catch(json_read_dict(user_input, Peticion,
+                         [value_string_as(atom), end_of_file(end_of_file)]),
+          E,
+          ( descartar_linea, Peticion = error_lectura(E) )).
+
+%% Tras un JSON mal formado se salta el resto de la línea para resincronizar
+descartar_linea :-
+    catch(read_line_to_string(user_input, _), _, true).
+
+%% Toda petición recibe una línea de respuesta: si atender/2 falla, Python
+%% esperaría hasta el plazo y terminaría el proceso
+responder(Peticion, Respuesta) :-
+    (   atender(Peticion, Respuesta0)
+    ->  Respuesta = Respuesta0
+    ;   Respuesta = _{error: fallo}
+    ).
+
+atender(error_lectura(E), Respuesta) :- !,
+    respuesta_error(E, Respuesta).
+atender(Peticion, Respuesta) :-
+    atender_json(Peticion, Respuesta).
+
+respuesta_error(E, _{error: Texto}) :-
+    format(atom(Texto), '~q', [E]).